@@ -0,0 +1,48 @@
+import tempfile
+from pathlib import Path
+
+import yaml
+
+from harness import Context, benchmark, measure
+
+from composo.config import ConfigCache, safe_load
+
+SIZES = {"small": 10, "medium": 1000, "large": 10000}
+
+
+def make_config(entries: int) -> str:
+    """
+    A `.composo.yaml` with the usual core keys and `entries` additional nested plugin keys.
+    """
+    lines = ["app:", "  name:", "    class: TestProj", "    package: test_proj", "    project: test-proj",
+             "author:", "  email: arand.devel@email.de", "  name: A. Rand Developer", "license: mit",
+             "plugin: synthetic", "extra:"]
+    for i in range(entries):
+        lines.extend([f"  section{i}:", f"    enabled: {str(i % 2 == 0).lower()}", f"    name: value-{i}",
+                      f"    items: [{i}, {i + 1}, {i + 2}]"])
+    return "\n".join(lines) + "\n"
+
+
+def _parse(entries: int, load):
+    def bench(ctx: Context):
+        content = make_config(entries)
+        return measure(lambda: load(content), repeat=ctx.repeat)
+    return bench
+
+
+def _cached(entries: int):
+    def bench(ctx: Context):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / ".composo.yaml"
+            path.write_text(make_config(entries))
+            cache = ConfigCache()
+            cache.load(path)
+            return measure(lambda: cache.load(path), repeat=ctx.repeat)
+    return bench
+
+
+for _name, _entries in SIZES.items():
+    # composo's loader, libyaml based where available, against the pure Python loader and a cache hit
+    benchmark(f"config.parse.{_name}")(_parse(_entries, safe_load))
+    benchmark(f"config.parse.{_name}.pure")(_parse(_entries, yaml.safe_load))
+    benchmark(f"config.cached.{_name}")(_cached(_entries))
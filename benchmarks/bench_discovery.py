@@ -0,0 +1,44 @@
+import tempfile
+from pathlib import Path
+
+from harness import Context, benchmark, measure
+
+from composo.plugins import PluginIndex, scan_plugins
+
+SIZES = (10, 100, 1000)
+
+
+def make_site_packages(root: Path, plugins: int):
+    """
+    A site-packages directory with `plugins` distributions, each exposing one composo plugin and a console script.
+    """
+    for i in range(plugins):
+        dist_info = root / f"composo_synthetic_{i}-1.0.dist-info"
+        dist_info.mkdir(parents=True)
+        (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: composo-synthetic-{i}\nVersion: 1.0\n")
+        (dist_info / "entry_points.txt").write_text(
+            f"[console_scripts]\nsynthetic-{i} = composo_synthetic_{i}:main\n\n"
+            f"[composo.plugins]\nsynthetic-{i} = composo_synthetic_{i}:init\n")
+
+
+def _discovery(size: int, indexed: bool):
+    def bench(ctx: Context):
+        with tempfile.TemporaryDirectory() as tmp:
+            site_packages = Path(tmp) / "site-packages"
+            make_site_packages(site_packages, size)
+            path = [str(site_packages)]
+            if not indexed:
+                return measure(lambda: scan_plugins(path=path), repeat=ctx.repeat)
+
+            def scan(group):
+                return scan_plugins(group, path=path)
+
+            PluginIndex(Path(tmp) / "cache", scan=scan, path=path).rebuild()
+            return measure(lambda: PluginIndex(Path(tmp) / "cache", scan=scan, path=path).plugins(),
+                           repeat=ctx.repeat, number=10)
+    return bench
+
+
+for _size in SIZES:
+    benchmark(f"discovery.scan.{_size}")(_discovery(_size, indexed=False))
+    benchmark(f"discovery.index.{_size}")(_discovery(_size, indexed=True))
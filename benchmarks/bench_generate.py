@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from harness import Context, benchmark, measure
+
+from composo.app import Composo
+from composo.files import current_writer
+
+FILES = 2000
+QUICK_FILES = 200
+
+
+class NoTyperApp:
+
+    def callback(self, **kwargs):
+        ...
+
+    def command(self, **kwargs):
+        ...
+
+
+class LargeTemplatePlugin:
+    """
+    A synthetic plugin rendering a large skeleton: nested packages with one module and one test per package.
+    """
+    files = FILES
+
+    def __init__(self, config):
+        self.config = config
+
+    def _render(self, i: int) -> str:
+        package = self.config["app"]["name"]["package"]
+        return f'"""module {i} of {package}"""\n\n' + "".join(f"VALUE_{j} = {i * j}\n" for j in range(50))
+
+    def _generate(self, root: Path):
+        writer = current_writer()
+        writer.write(".composo.yaml", f"plugin: large\napp:\n  name:\n    package: {root.name}\n",
+                     depends_on=["app.name.package"])
+        for i in range(self.files):
+            writer.write(f"src/pkg{i // 100}/module{i}.py", lambda i=i: self._render(i),
+                         depends_on=["app.name.package"])
+
+    def new(self, name):
+        self._generate(Path(name))
+
+    def init(self, path):
+        self._generate(Path(path))
+
+
+class LargeTemplateLoader:
+    def load(self):
+        return self
+
+    def init(self, config):
+        return LargeTemplatePlugin(config)
+
+
+def _composo(workdir: Path):
+    return Composo(plugins={"large": LargeTemplateLoader()}, config={"app": {"name": {"package": "bench"}}},
+                   app=NoTyperApp(), fopen=open, getcwd=lambda: str(workdir))
+
+
+def _files(ctx: Context) -> int:
+    return QUICK_FILES if ctx.quick else FILES
+
+
+@benchmark("generate.new")
+def generate_new(ctx: Context):
+    LargeTemplatePlugin.files = _files(ctx)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _composo(Path(tmp))
+        return measure(lambda: app.new("bench", plugin="large"), repeat=ctx.repeat,
+                       setup=lambda: shutil.rmtree(Path(tmp) / "bench", ignore_errors=True))
+
+
+def _init(ctx: Context, force: bool):
+    LargeTemplatePlugin.files = _files(ctx)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _composo(Path(tmp))
+        app.new("bench", plugin="large")
+        return measure(lambda: app.init(Path("bench"), force=force), repeat=ctx.repeat)
+
+
+@benchmark("generate.init.incremental")
+def generate_init_incremental(ctx: Context):
+    return _init(ctx, force=False)
+
+
+@benchmark("generate.init.force")
+def generate_init_force(ctx: Context):
+    return _init(ctx, force=True)
@@ -0,0 +1,92 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing
+from pathlib import Path
+
+from harness import Context, benchmark, measure
+
+SRC_DIR = Path(__file__).parents[1] / "src"
+MAIN = "import sys; sys.argv[0] = 'composo'; from composo.main import main; main()"
+
+
+def _environment(home: Path, src_dir: Path = SRC_DIR, bytecode: bool = True):
+    environment = {**os.environ, "PYTHONPATH": str(src_dir), "XDG_CACHE_HOME": str(home / "cache"),
+                   "XDG_CONFIG_HOME": str(home / "config")}
+    if not bytecode:
+        environment["PYTHONDONTWRITEBYTECODE"] = "1"
+    return environment
+
+
+def _startup(ctx: Context, args, cold: bool, environment: typing.Optional[typing.Mapping[str, str]] = None):
+    """
+    Time a composo invocation. Cold runs start without composo bytecode and without caches, warm runs reuse both.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        samples = []
+
+        def setup():
+            # every cold sample gets a fresh home and a copy of the sources without bytecode
+            home = Path(tmp) / f"home{len(samples)}"
+            shutil.copytree(SRC_DIR, home / "src", ignore=shutil.ignore_patterns("__pycache__"))
+            samples.append({**_environment(home, home / "src", bytecode=False), **(environment or {})})
+
+        def run():
+            subprocess.run([sys.executable, "-c", MAIN, *args], env=samples[-1], stdout=subprocess.DEVNULL)
+
+        if cold:
+            return measure(run, repeat=ctx.repeat, setup=setup)
+        samples.append({**_environment(Path(tmp) / "home"), **(environment or {})})
+        run()
+        return measure(run, repeat=ctx.repeat)
+
+
+@benchmark("startup.interpreter")
+def interpreter(ctx: Context):
+    return measure(lambda: subprocess.run([sys.executable, "-c", "pass"]), repeat=ctx.repeat)
+
+
+@benchmark("startup.cold.version")
+def cold_version(ctx: Context):
+    return _startup(ctx, ["--version"], cold=True)
+
+
+@benchmark("startup.warm.version")
+def warm_version(ctx: Context):
+    return _startup(ctx, ["--version"], cold=False)
+
+
+@benchmark("startup.cold.help")
+def cold_help(ctx: Context):
+    return _startup(ctx, ["--help"], cold=True)
+
+
+@benchmark("startup.warm.help")
+def warm_help(ctx: Context):
+    return _startup(ctx, ["--help"], cold=False)
+
+
+@benchmark("startup.cold.plugins")
+def cold_plugins(ctx: Context):
+    return _startup(ctx, ["plugins"], cold=True)
+
+
+@benchmark("startup.warm.plugins")
+def warm_plugins(ctx: Context):
+    return _startup(ctx, ["plugins"], cold=False)
+
+
+COMPLETE_PLUGIN = {"_COMPOSO_COMPLETE": "complete_bash", "COMP_WORDS": "composo new my-project --plugin ",
+                   "COMP_CWORD": "4"}
+
+
+@benchmark("startup.cold.complete")
+def cold_complete(ctx: Context):
+    return _startup(ctx, [], cold=True, environment=COMPLETE_PLUGIN)
+
+
+@benchmark("startup.warm.complete")
+def warm_complete(ctx: Context):
+    return _startup(ctx, [], cold=False, environment=COMPLETE_PLUGIN)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+from pathlib import Path
+
+from harness import Context, benchmark, measure
+
+from composo.config import LayeredConfig
+from composo.files import FileWriter
+from composo.staging import StagingTree
+from composo.templates import Context as RenderContext
+from composo.templates import TemplateEngine
+
+FILES = 5000
+QUICK_FILES = 500
+
+CONFIG = {
+    "app": {"name": {"class": "TestProj", "package": "test_proj", "project": "test-proj"}},
+    "author": {"email": "a.rand.developer@email.de", "name": "A. Rand Developer"},
+    "license": "mit",
+    "extra": {f"section{i}": {"name": f"value-{i}", "enabled": i % 2 == 0} for i in range(40)},
+}
+
+MODULE = '''"""{{ app.name.project }}: module %(i)d, by {{ author.name }} <{{ author.email }}>"""
+from {{ app.name.package }} import base
+
+
+class {{ app.name.class }}Part%(i)d(base.Part):
+    """Part %(i)d of {{ app.name.class }}, licensed under {{ license }}."""
+
+''' + "".join(f"    value_{j} = {j}\n" for j in range(40))
+
+
+def _flatten(config, prefix=""):
+    for key, value in config.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", str(value)
+
+
+def _skeleton(root: Path, files: int):
+    for i in range(files):
+        path = root / f"pkg{i // 100}" / f"module{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(MODULE % {"i": i})
+
+
+def _paths(root: Path):
+    return [os.path.join(directory, name) for directory, _, names in os.walk(root) for name in names]
+
+
+def naive(paths):
+    """
+    What plugins do without the engine: read every file and replace every config key in it.
+    """
+    replacements = [("{{ " + key + " }}", value) for key, value in _flatten(CONFIG)]
+    rendered = []
+    for path in paths:
+        with open(path) as f:
+            content = f.read()
+        for placeholder, value in replacements:
+            content = content.replace(placeholder, value)
+        rendered.append(content)
+    return rendered
+
+
+def compiled(engine: TemplateEngine, paths, config):
+    context = RenderContext(config)
+    return [engine.load(path).render(context) for path in paths]
+
+
+def _bench(kind: str):
+    def bench(ctx: Context):
+        files = QUICK_FILES if ctx.quick else FILES
+        config = LayeredConfig([("user", CONFIG)])
+        with tempfile.TemporaryDirectory() as tmp:
+            skeleton = Path(tmp) / "skeleton"
+            _skeleton(skeleton, files)
+            paths = _paths(skeleton)
+            if kind == "naive":
+                return measure(lambda: naive(paths), repeat=ctx.repeat)
+            if kind == "compiled":  # compiled once per process, e.g. in the daemon or for a batch
+                engine = TemplateEngine()
+                compiled(engine, paths, config)
+                return measure(lambda: compiled(engine, paths, config), repeat=ctx.repeat)
+            if kind == "compiled.cold":
+                return measure(lambda: compiled(TemplateEngine(), paths, config), repeat=ctx.repeat)
+            # the whole tree into a staged project, including the writer and its manifest bookkeeping
+            return measure(lambda: TemplateEngine().render_tree(
+                skeleton, writer=FileWriter(Path(tmp) / "project", config, sink=StagingTree(Path(tmp) / "project"))),
+                repeat=ctx.repeat)
+    return bench
+
+
+for _kind in ("naive", "compiled", "compiled.cold", "tree"):
+    benchmark(f"templates.{_kind}")(_bench(_kind))
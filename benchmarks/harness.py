@@ -0,0 +1,57 @@
+import statistics
+import time
+import typing
+
+BENCHMARKS: typing.Dict[str, typing.Callable[["Context"], "Stats"]] = {}
+
+
+class Stats(typing.NamedTuple):
+    min: float
+    median: float
+    mean: float
+    stdev: float
+    repeat: int
+    number: int
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        return {**self._asdict(), "unit": "s"}
+
+
+class Context(typing.NamedTuple):
+    """
+    The settings of a benchmark run.
+    """
+    repeat: int
+    quick: bool
+
+
+def benchmark(name: str):
+    """
+    Register a benchmark taking the run :class:`Context` and returning the :class:`Stats` of one operation.
+    """
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def measure(func: typing.Callable[[], typing.Any], repeat: int = 5, number: int = 1,
+            setup: typing.Optional[typing.Callable[[], typing.Any]] = None) -> Stats:
+    """
+    Time `number` calls of func `repeat` times and report the statistics of a single call.
+
+    :param func: the operation to measure
+    :param repeat: the number of samples
+    :param number: the number of calls per sample
+    :param setup: called before every sample, not measured
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return Stats(min(samples), statistics.median(samples), statistics.mean(samples),
+                 statistics.stdev(samples) if len(samples) > 1 else 0.0, repeat, number)
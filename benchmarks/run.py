@@ -0,0 +1,98 @@
+"""
+Offline benchmark suite of composo.
+
+Run the benchmarks of the working tree and store the results as JSON:
+
+    $ python benchmarks/run.py run --output results.json
+
+Compare two result files and fail if a benchmark got slower than the threshold allows:
+
+    $ python benchmarks/run.py compare baseline.json results.json --threshold 1.2
+"""
+import argparse
+import fnmatch
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "src"))
+
+from harness import BENCHMARKS, Context  # noqa: E402
+
+import bench_startup  # noqa: E402,F401
+import bench_discovery  # noqa: E402,F401
+import bench_config  # noqa: E402,F401
+import bench_generate  # noqa: E402,F401
+import bench_templates  # noqa: E402,F401
+
+from composo import get_version  # noqa: E402
+
+
+def run(args) -> int:
+    ctx = Context(repeat=args.repeat or (3 if args.quick else 7), quick=args.quick)
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.select and not any(fnmatch.fnmatch(name, pattern) for pattern in args.select):
+            continue
+        stats = bench(ctx)
+        results[name] = stats.as_dict()
+        print(f"{name:<32} median {stats.median * 1e3:10.3f} ms   min {stats.min * 1e3:10.3f} ms", file=sys.stderr)
+
+    report = {
+        "composo": get_version(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "quick": ctx.quick,
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    return 0
+
+
+def compare(args) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())["results"]
+    current = json.loads(Path(args.current).read_text())["results"]
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        ratio = current[name][args.statistic] / baseline[name][args.statistic]
+        regressed = ratio > args.threshold
+        regressions += regressed
+        print(f"{'REGRESSION' if regressed else 'ok':<10} {name:<32} {ratio:6.2f}x")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"{'missing':<10} {name}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="composo benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", "-o", help="the JSON file the results are written to, stdout by default")
+    run_parser.add_argument("--repeat", type=int, help="the number of samples per benchmark")
+    run_parser.add_argument("--quick", action="store_true", help="fewer samples and smaller synthetic inputs")
+    run_parser.add_argument("--select", "-k", action="append",
+                            help="only run the benchmarks matching this glob pattern, e.g. 'discovery.*'")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=1.2,
+                                help="the slowdown factor above which a benchmark counts as regression")
+    compare_parser.add_argument("--statistic", choices=("min", "median", "mean"), default="median")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
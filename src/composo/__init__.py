@@ -0,0 +1,10 @@
+def get_version() -> str:
+    """
+    The installed version of composo, or ``"unknown"`` when running from a source checkout.
+    """
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        return version("composo")
+    except PackageNotFoundError:
+        return "unknown"
@@ -0,0 +1,63 @@
+import contextvars
+import functools
+import inspect
+import typing
+
+from composo import tracing
+
+# asyncio is only imported once an async plugin runs, synchronous plugins do not pay for its import
+
+T = typing.TypeVar("T")
+
+
+def resolve(result: typing.Union[T, typing.Awaitable[T]]) -> T:
+    """
+    Drive the result of a plugin call to completion on an asyncio loop if the plugin method is a coroutine function,
+    the result of a synchronous plugin is returned as is.
+    """
+    if not inspect.isawaitable(result):
+        return result
+    import asyncio
+    return asyncio.run(_wait(result))
+
+
+async def _wait(awaitable: typing.Awaitable[T]) -> T:
+    return await awaitable
+
+
+async def run_blocking(func: typing.Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking callable in a worker thread without blocking the other steps of the run.
+
+    The callable runs in a copy of the current context, so it can use :func:`composo.files.current_writer`.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, func, *args, **kwargs))
+
+
+async def gather(steps: typing.Mapping[str, typing.Awaitable[typing.Any]]) -> typing.Dict[str, typing.Any]:
+    """
+    Run independent steps of an async plugin concurrently, each timed as a `plugin.step` span.
+
+    :param steps: the awaitables of the steps by step name
+    :return: the results by step name
+
+    :Example:
+
+        async def init(self, path):
+            await aio.gather({
+                "git": self.git_init(path),
+                "venv": aio.run_blocking(venv.create, path / ".venv"),
+                "files": self.render(path),
+            })
+    """
+    import asyncio
+
+    async def run_step(name: str, step: typing.Awaitable[typing.Any]):
+        with tracing.span("plugin.step", step=name):
+            return await step
+
+    results = await asyncio.gather(*(run_step(name, step) for name, step in steps.items()))
+    return dict(zip(steps, results))
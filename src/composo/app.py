@@ -1,9 +1,11 @@
+import contextlib
+import os
+import sys
 import traceback
 from enum import Enum
 from pathlib import Path
 
 from typing import Optional
-from importlib.metadata import version as get_module_version
 
 import click
 import typing
@@ -11,14 +13,43 @@ import yaml
 import typer
 from click import UsageError
 from rich.panel import Panel
+from rich.table import Table
 from typer import rich_utils
 
 from typer.core import TyperCommand as TyperCommandBase
 from typer.rich_utils import _make_rich_rext, _get_rich_console
 
+from composo import get_version as get_composo_version
+from composo import aio, completion, daemon, history, tracing
+from composo.batch import TaskResult, find_projects, map_many, run_many
+from composo.config import ConfigCache, LayeredConfig
+from composo.files import FileWriter, Manifest
+from composo.plugins import PluginIndex, PluginRecord
+from composo.skeletons import SkeletonCache
+from composo.staging import StagingTree
+from composo.steps import Steps, run_steps
+
+# the modules of features a command may not use are imported where they are used, every command pays only for its own
+if typing.TYPE_CHECKING:
+    from composo.journal import Journal
+    from composo.schema import ConfigIssue, SchemaRegistry
 
 # typer.rich_utils.STYLE_HELPTEXT = ""
 
+PROJECT_CONFIG = ".composo.yaml"
+# the arguments of new, the other keys of a batch project are config
+NEW_ARGUMENTS = ("name", "init", "output_archive", "archive_format", "resume")
+
+
+def _usage_errors() -> typing.Tuple[typing.Type[Exception], ...]:
+    # the errors of a run that the user fixes, reported without a traceback; evaluated by except clauses only once
+    # an exception is raised, so a run without errors imports none of their modules
+    from composo.journal import JournalError
+    from composo.remote import RemoteError
+    from composo.schema import ConfigError
+
+    return JournalError, ConfigError, RemoteError
+
 
 class Composo:
     """
@@ -29,14 +60,28 @@ class Composo:
         $ composo new my-project --plugin=python
     """
 
-    def __init__(self, plugins, config, app: typer.Typer, fopen: typing.Callable, getcwd: typing.Callable):
+    def __init__(self, plugins, config, app: typer.Typer, fopen: typing.Callable, getcwd: typing.Callable,
+                 plugin_index: typing.Optional[PluginIndex] = None, config_cache: typing.Optional[ConfigCache] = None,
+                 skeleton_cache: typing.Optional[SkeletonCache] = None,
+                 run_history: typing.Optional[history.RunHistory] = None,
+                 schemas: typing.Optional["SchemaRegistry"] = None):
         self.__plugins = plugins
-        self.__config = config
+        self.__config = config if isinstance(config, LayeredConfig) else LayeredConfig([("user", config)])
+        self._plugin_index = plugin_index
+        self._config_cache = ConfigCache() if config_cache is None else config_cache
+        self._skeleton_cache = skeleton_cache
+        self._run_history = run_history
+        self._schemas = schemas
+        self._plugin_modules: typing.Dict[str, typing.Any] = {}
         self._app = app
         self._open = fopen
         self._getcwd = getcwd
 
     def load_commands(self):
+        from composo import archive
+
+        CacheAction = Enum("CacheAction", names=[("stats", "stats"), ("prune", "prune")], module=__name__)
+        ArchiveFormat = Enum("ArchiveFormat", names=[(name, name) for name in archive.FORMATS], module=__name__)
         PluginsEnum = Enum(
             "PluginsEnum",
             names=[(name, name) for name in self.__plugins.keys()],
@@ -52,12 +97,25 @@ class Composo:
                     "-v",
                     help="Print version and exit.",
                 ),
+                profile: bool = typer.Option(
+                    False,
+                    "--profile",
+                    envvar="COMPOSO_PROFILE",
+                    help="Time the phases of the run and print a summary to stderr.",
+                ),
+                trace_file: Optional[Path] = typer.Option(
+                    None,
+                    "--trace-file",
+                    envvar="COMPOSO_TRACE_FILE",
+                    dir_okay=False,
+                    help="Profile the run and write a Chrome trace event file, e.g. for Perfetto.",
+                ),
         ) -> None:
             """
             Composo cmdline tool for bootstrapping projects.
             """
             if version:
-                typer.echo(f"composo {get_module_version('composo')}")
+                typer.echo(f"composo {get_composo_version()}")
                 raise typer.Exit()
             elif ctx.invoked_subcommand is None:
                 rich_utils.rich_format_error(UsageError("Missing command", ctx=ctx))
@@ -71,6 +129,10 @@ Create a new project named "my-project" with the plugin "python" without initial
 Create a new project named "my-project" with the plugin "python" and initialize it
 
     [dim]$ composo new my-project --plugin=python --init[/dim]
+
+Stream an initialized project as archive to another host without writing it to disk
+
+    [dim]$ composo new my-project --init --output-archive - | ssh build-host tar -xz[/dim]
 """
 
         class TyperCommand(TyperCommandBase):
@@ -109,7 +171,16 @@ Create a new project named "my-project" with the plugin "python" and initialize
         def new(ctx: typer.Context, name: str = typer.Argument(..., help="the NAME of the project to be created"),
                 plugin: Optional[PluginsEnum] = typer.Option(get_plugin(), help="the name of the plugin to be used"),
                 init: Optional[bool] = typer.Option(False, help="whether the project is initialized directly"),
-                dry_run: Optional[bool] = typer.Option(False, help="use dry run or not")):
+                dry_run: Optional[bool] = typer.Option(False, help="use dry run or not"),
+                output_archive: Optional[str] = typer.Option(None, metavar="PATH",
+                                                             help="stream the project into a tar.gz or zip archive "
+                                                                  "instead of a directory, '-' for stdout"),
+                archive_format: Optional[ArchiveFormat] = typer.Option(None, help="the format of the archive, by "
+                                                                                  "the suffix of PATH by default"),
+                resume: Optional[bool] = typer.Option(False, help="continue an interrupted run, skipping the work "
+                                                                  "it finished"),
+                offline: Optional[bool] = typer.Option(False, help="use only cached remote templates, fetch "
+                                                                   "nothing")):
             """
             Create a new project named NAME
 
@@ -120,9 +191,56 @@ Create a new project named "my-project" with the plugin "python" and initialize
                 rich_utils.rich_format_error(
                     UsageError("No installed plugins could be found, please install a composo plugin", ctx=ctx))
                 raise typer.Exit(1)
-            else:
-                self.new(name=name, plugin=plugin.value, init=init, dry_run=dry_run)
-                raise typer.Exit()
+            try:
+                self.new(name=name, plugin=plugin.value, init=init, dry_run=dry_run, output_archive=output_archive,
+                         archive_format=archive_format.value if archive_format is not None else None, resume=resume,
+                         offline=offline)
+            except _usage_errors() as exc:
+                rich_utils.rich_format_error(UsageError(str(exc), ctx=ctx))
+                raise typer.Exit(1)
+            raise typer.Exit()
+
+        epilog_batch = """
+Create the projects listed in "projects.yaml" with four processes
+
+    [dim]$ composo new-batch projects.yaml --jobs 4[/dim]
+
+The entries of [dim]defaults[/dim] apply to every project, each project can override them:
+
+[dim red]
+    defaults:
+      plugin: python
+      init: true
+    projects:
+      - name: service-a
+      - name: service-b
+        plugin: shell
+        license: apache
+[/]
+"""
+
+        @self._app.command(name="new-batch", epilog=epilog_batch, cls=TyperCommand)
+        def new_batch(ctx: typer.Context,
+                      manifest: Path = typer.Argument(..., help="the MANIFEST listing the projects to be created",
+                                                      exists=True, file_okay=True, dir_okay=False, readable=True),
+                      jobs: int = typer.Option(1, "--jobs", "-j", min=1,
+                                               help="the number of projects created in parallel"),
+                      dry_run: Optional[bool] = typer.Option(False, help="use dry run or not"),
+                      offline: Optional[bool] = typer.Option(False, help="use only cached remote templates, fetch "
+                                                                         "nothing")):
+            """
+            Create all projects listed in the MANIFEST
+
+            The config and the plugins are loaded once, then JOBS processes create the projects.
+            A failing project does not abort the others, an invalid config aborts all of them before any is created.
+            """
+            try:
+                results = self.new_many(self.load_manifest(manifest), jobs=jobs, dry_run=dry_run, offline=offline)
+            except _usage_errors() as exc:
+                rich_utils.rich_format_error(UsageError(str(exc), ctx=ctx))
+                raise typer.Exit(1)
+            self._print_results(results, title="new-batch")
+            raise typer.Exit(0 if all(result.ok for result in results) else 1)
 
         epilog_init = """
 
@@ -175,31 +293,245 @@ An example [dim].composo.yaml[/dim] file would be:
                                              readable=True,
                                              # resolve_path=True
                                              ),
-                 dry_run: Optional[bool] = typer.Option(False, help="use dry run or not")):
+                 dry_run: Optional[bool] = typer.Option(False, help="use dry run or not"),
+                 force: Optional[bool] = typer.Option(False, help="rewrite all files, even those that are up to date"),
+                 recursive: Optional[bool] = typer.Option(False, "--recursive", "-r",
+                                                          help="initialize every project found below PATH"),
+                 jobs: int = typer.Option(1, "--jobs", "-j", min=1,
+                                          help="the number of projects initialized in parallel with --recursive"),
+                 resume: Optional[bool] = typer.Option(False, help="continue an interrupted run, skipping the work "
+                                                                   "it finished"),
+                 rollback: Optional[bool] = typer.Option(False, help="undo an interrupted run instead"),
+                 offline: Optional[bool] = typer.Option(False, help="use only cached remote templates, fetch "
+                                                                    "nothing")):
             """
             Initialize the project in the given PATH or the current working directory
+
+            An interrupted run, e.g. killed by a timeout, leaves a journal of its work in the project. It is continued
+            with --resume or undone with --rollback. With --recursive, every config is validated before any project is
+            initialized.
             """
+            if rollback:
+                projects = find_projects(path) if recursive else [path]
+                undone = [project for project in projects if self.rollback(project)]
+                typer.echo(f"rolled back {len(undone)} interrupted run{'s' if len(undone) != 1 else ''}")
+                raise typer.Exit()
+            if recursive:
+                try:
+                    results = self.init_recursive(path, jobs=jobs, force=force, dry_run=dry_run, resume=resume,
+                                                  offline=offline)
+                except _usage_errors() as exc:
+                    rich_utils.rich_format_error(UsageError(str(exc), ctx=ctx))
+                    raise typer.Exit(1)
+                self._print_results(results, title="init")
+                raise typer.Exit(0 if all(result.ok for result in results) else 1)
+
             code = 0
             try:
-                self.init(path, dry_run=dry_run)
+                self.init(path, force=force, dry_run=dry_run, resume=resume, offline=offline)
             except FileNotFoundError:
                 code = 1
                 rich_utils.rich_format_error(
                     UsageError(f"Invalid value for '[PATH]': Directory '{path}' must contain '.composo.yaml'", ctx=ctx))
-            finally:
-                typer.Exit(code)
+            except _usage_errors() as exc:
+                code = 1
+                rich_utils.rich_format_error(UsageError(str(exc), ctx=ctx))
+            raise typer.Exit(code)
+
+        @self._app.command(name="plugins")
+        def list_plugins(rebuild_index: Optional[bool] = typer.Option(False, help="rescan the installed distributions "
+                                                                                  "and rewrite the plugin index")):
+            """
+            List the installed plugins
+            """
+            table = Table("plugin", "entry point", "distribution", "version")
+            for record in sorted(self.plugins(rebuild_index=rebuild_index)):
+                table.add_row(record.name, record.value, record.dist, record.version)
+            _get_rich_console().print(table)
+
+        @self._app.command(name="cache")
+        def cache(action: CacheAction = typer.Argument(..., help="show the size of the skeleton cache or prune it"),
+                  max_size: Optional[int] = typer.Option(None, min=0,
+                                                         help="prune down to this many bytes, the configured limit "
+                                                              "by default"),
+                  prune_all: Optional[bool] = typer.Option(False, "--all", help="remove every cached skeleton")):
+            """
+            Show the stats of the rendered skeleton cache or prune it
+
+            Files of new projects that do not depend on the project name are cached, a later new with the same
+            plugin and config only renders the name dependent files.
+            """
+            if self._skeleton_cache is None:
+                rich_utils.rich_format_error(UsageError("No cache_dir is configured"))
+                raise typer.Exit(1)
+            if action.value == "prune":
+                freed = self._skeleton_cache.prune(0 if prune_all else max_size)
+                typer.echo(f"freed {freed} bytes")
+            stats = self._skeleton_cache.stats()
+            table = Table("location", "entries", "objects", "bytes", "limit")
+            table.add_row(str(stats.path), str(stats.entries), str(stats.objects), str(stats.size),
+                          str(stats.max_size))
+            _get_rich_console().print(table)
+
+        @self._app.command(name="stats")
+        def stats(command: Optional[str] = typer.Option(None, help="only the runs of this command"),
+                  plugin: Optional[str] = typer.Option(None, help="only the runs of this plugin"),
+                  threshold: float = typer.Option(history.DEFAULT_THRESHOLD, min=1.0,
+                                                  help="the slowdown of the median run after a plugin upgrade that "
+                                                       "is reported as regression"),
+                  min_runs: int = typer.Option(history.DEFAULT_MIN_RUNS, min=1,
+                                               help="the runs needed before and after an upgrade to compare them")):
+            """
+            Show the latency percentiles of the recorded runs per command and plugin
+
+            Every run of new, new-batch, init, plugins and cache is recorded in the run history under the
+            cache_dir. Commands that became slower with the latest upgrade of their plugin are flagged.
+            """
+            if self._run_history is None:
+                rich_utils.rich_format_error(UsageError("No cache_dir is configured or the history is disabled"))
+                raise typer.Exit(1)
+            records = [record for record in self._run_history.records()
+                       if command in (None, record.get("command")) and plugin in (None, record.get("plugin"))]
+            self.print_stats(records, threshold=threshold, min_runs=min_runs)
+
+        @self._app.command(name="daemon")
+        def run_daemon(socket_path: Optional[Path] = typer.Option(None, "--socket", dir_okay=False,
+                                                                  help="the socket to listen on"),
+                       idle_timeout: float = typer.Option(daemon.DEFAULT_IDLE_TIMEOUT, min=0,
+                                                          help="the idle seconds after which the daemon shuts down"),
+                       stop: Optional[bool] = typer.Option(False, help="shut down the running daemon")):
+            """
+            Serve the new and init calls of the cli from a warm process
+
+            While the daemon runs, the cli forwards new, new-batch and init to it and falls back to running them
+            itself otherwise. The daemon shuts down when it has been idle or the installed plugins changed.
+            """
+            if stop:
+                raise typer.Exit(0 if daemon.stop(socket_path) else 1)
+            self.serve(socket_path, idle_timeout=idle_timeout)
 
     def __call__(self, *args, **kwargs):
         self.load_commands()
+        if os.environ.get(completion.COMPLETION_ENV):
+            # this completion is answered by typer, the next ones from the index
+            self.save_completion_index()
         self._app()
 
+    def save_completion_index(self, path: typing.Optional[str] = None):
+        """
+        Write the commands, options and plugins of the cli for :mod:`composo.completion`.
+
+        :param path: the location of the index, the default cache dir by default
+        """
+        with tracing.span("completion.index"):
+            completion.save_index(completion.describe(typer.main.get_command(self._app)), path)
+
+    def dispatch(self, args: typing.Sequence[str]):
+        """
+        Run a command line with the already loaded commands.
+
+        :param args: the command line arguments without the program name
+        """
+        with history.recording_args(args, lambda: self._run_history):
+            self._app(args=list(args), prog_name="composo")
+
+    def serve(self, socket_path: typing.Optional[Path] = None, idle_timeout: float = daemon.DEFAULT_IDLE_TIMEOUT):
+        """
+        Keep this app warm as daemon serving the cli over a unix socket, see :mod:`composo.daemon`.
+
+        :param socket_path: the socket to listen on
+        :param idle_timeout: the idle seconds after which the daemon shuts down
+
+        :Examples:
+
+            $ composo daemon &
+            $ composo new my-project --plugin=python
+        """
+        for plugin in self.__plugins:
+            try:
+                self._plugin_module(plugin)
+            except Exception:
+                print(traceback.format_exc())
+        daemon.serve(self.dispatch, socket_path, idle_timeout=idle_timeout)
+
     def run(self):
         self.load_commands()
         self._app()
 
+    def plugins(self, rebuild_index: bool = False) -> typing.List[PluginRecord]:
+        """
+        The installed plugins as recorded in the plugin index.
+
+        :param rebuild_index: whether the installed distributions are rescanned and the index is rewritten
+        """
+        if self._plugin_index is None:
+            return [PluginRecord(ep.name, ep.value, ep.group, "", "") for ep in self.__plugins.values()]
+        if rebuild_index:
+            return self._plugin_index.rebuild()
+        return self._plugin_index.records()
+
+    @staticmethod
+    def print_stats(records: typing.List[typing.Dict[str, typing.Any]], threshold: float = history.DEFAULT_THRESHOLD,
+                    min_runs: int = history.DEFAULT_MIN_RUNS):
+        """
+        Print the latency percentiles of the recorded runs and the regressions after plugin upgrades.
+
+        :param records: the records of the run history, see :class:`composo.history.RunHistory`
+        """
+        console = _get_rich_console()
+        if not records:
+            typer.echo("no runs recorded")
+            return
+        for title, group in (("command", lambda record: record.get("command")),
+                             ("plugin", lambda record: record.get("plugin"))):
+            table = Table(title, "runs", "failed", "p50 ms", "p95 ms", "p99 ms", title=f"latency by {title}",
+                          title_justify="left")
+            for stats in history.latencies(records, group):
+                table.add_row(stats.group, str(stats.runs), str(stats.failures), f"{stats.p50 * 1e3:.1f}",
+                              f"{stats.p95 * 1e3:.1f}", f"{stats.p99 * 1e3:.1f}")
+            console.print(table)
+        regressions = history.regressions(records, threshold=threshold, min_runs=min_runs)
+        if regressions:
+            table = Table("plugin", "command", "versions", "p50 ms before", "p50 ms after", "slowdown",
+                          title="regressions after plugin upgrades", title_justify="left")
+            for regression in regressions:
+                table.add_row(regression.plugin, regression.command,
+                              f"{regression.previous_version} -> {regression.version}",
+                              f"{regression.previous_p50 * 1e3:.1f}", f"{regression.p50 * 1e3:.1f}",
+                              f"[red]{regression.ratio:.2f}x[/]")
+            console.print(table)
+
+    @staticmethod
+    def _print_results(results: typing.List[TaskResult], title: str):
+        table = Table("project", "status", "seconds", "error", title=title, title_justify="left")
+        for result in results:
+            table.add_row(result.name, "[green]ok[/]" if result.ok else "[red]failed[/]", f"{result.duration:.2f}",
+                          result.error or "")
+        _get_rich_console().print(table)
+
+    def _plugin_module(self, plugin):
+        if plugin not in self._plugin_modules:
+            with tracing.span("plugin.import", plugin=plugin):
+                self._plugin_modules[plugin] = self.__plugins[plugin].load()
+        return self._plugin_modules[plugin]
+
+    def _installed_version(self, plugin: str) -> str:
+        if self._plugin_index is None:
+            return ""
+        return next((record.version for record in self._plugin_index.records() if record.name == plugin), "")
+
+    def _plugin_version(self, plugin: str) -> str:
+        # the installed version, and the mtime of the plugin module for plugins under development
+        version = self._installed_version(plugin)
+        try:
+            version += f"+{os.stat(self._plugin_module(plugin).__file__).st_mtime_ns}"
+        except (AttributeError, TypeError, OSError):
+            pass
+        return version
+
     def _load_plugin(self, plugin, config):
         try:
-            plugin = self.__plugins[plugin].load().init(config)
+            plugin = self._plugin_module(plugin).init(config)
             return plugin
 
         except KeyError:
@@ -207,14 +539,28 @@ An example [dim].composo.yaml[/dim] file would be:
             print(f"no plugin found with name '{plugin}', "
                   f"available plugins are: {[k for k, _ in self.__plugins.items()]}")
 
-    def new(self, name: str, plugin: str = "python", init=False, **kwargs):
+    def new(self, name: str, plugin: str = "python", init=False, output_archive: typing.Optional[str] = None,
+            archive_format: typing.Optional[str] = None, resume: bool = False, **kwargs):
         """
         Create a new project directory by the name of the chosen project name. The plugin will place
         a `.composo.yaml` file into the target directory for further configuration.
 
+        The config is validated before the plugin is loaded, see :meth:`validate`. The files that do not depend on
+        the project name are cached, see :class:`composo.skeletons.SkeletonCache`. The work of the plugin is
+        journaled in the project directory, see :class:`composo.journal.Journal`.
+
+        The `new` and `init` methods of a plugin may be coroutine functions, they are then run on an asyncio loop and
+        can run their independent steps concurrently by :func:`composo.aio.gather`. They may also return their work
+        declared as :class:`composo.steps.Steps`, which composo then runs.
+
         :param name: the name of the project to be created
         :param plugin: the name of the plugin to be used
         :param init: whether the project is initiated directly
+        :param output_archive: the path of a tar.gz or zip archive the project is streamed into instead of a
+            directory, `-` for stdout; the plugin has to write its files through
+            :func:`composo.files.current_writer`, see :func:`composo.archive.guard`
+        :param archive_format: the format of the archive, by the suffix of `output_archive` by default
+        :param resume: whether an interrupted run is continued, skipping the work it finished
         :param kwargs: additional arguments that ares used by the activated plugin
 
         :Examples:
@@ -226,19 +572,159 @@ An example [dim].composo.yaml[/dim] file would be:
             Create a new project named "my-project" with the plugin "python" and initialize it
 
             $ composo new my-project --plugin=python --init
+
+            Stream the project into an archive on stdout
+
+            $ composo new my-project --init --output-archive - > my-project.tar.gz
         """
-        config = {**self.__config, **kwargs, "plugin": plugin}
+        from composo import archive
+
+        config = self.__config.with_layer("cli", {**kwargs, "plugin": plugin})
+        self.validate(config, source=name)
         loaded_plugin = self._load_plugin(plugin, config)
-        loaded_plugin.new(name=name)
-        if init:
-            loaded_plugin.init(name)
+        history.note(plugin=plugin, plugin_version=self._installed_version(plugin))
+        root = Path(self._getcwd()) / name
+        cache_key, cached = None, 0
+        if output_archive is None:
+            writer = self._writer(root, config, journal=self._journal(root, config, "new", resume))
+            if self._skeleton_cache is not None and not writer.dry_run:
+                cache_key = self._skeleton_cache.key(f"{plugin}:new{':init' if init else ''}",
+                                                     self._plugin_version(plugin), config)
+                cached = self._skeleton_cache.restore(cache_key, writer)
+        else:
+            writer = FileWriter(root, config, manifest=Manifest(), dry_run=bool(config.resolve("dry_run")),
+                                sink=archive.open_archive(output_archive, archive_format, prefix=name))
+        output: typing.ContextManager = contextlib.nullcontext()
+        if output_archive == archive.STDOUT:  # the archive owns stdout, the plugin prints to stderr instead
+            output = contextlib.redirect_stdout(sys.stderr)
+        # a file the plugin writes around the writer would be missing from the archive
+        guarded = archive.guard(root) if output_archive is not None else contextlib.nullcontext()
+        with output, writer.activate(), guarded:
+            with tracing.span("plugin.new", plugin=plugin, name=name):
+                self._complete(loaded_plugin.new(name=name), writer)
+            if init:
+                with tracing.span("plugin.init", plugin=plugin, path=name):
+                    self._complete(loaded_plugin.init(name), writer)
+            if cache_key is not None and not cached:
+                self._skeleton_cache.store(cache_key, writer)  # type: ignore[union-attr]
+            self._print_staged(writer)
+        history.note(files=len(writer.written), size=writer.bytes_written)
+
+    @staticmethod
+    def _writer(root: Path, config: LayeredConfig, force: bool = False,
+                journal: typing.Optional["Journal"] = None) -> FileWriter:
+        # the files are staged in memory and committed once the plugin succeeded, a dry run never commits
+        return FileWriter(root, config, force=force, sink=StagingTree(root), dry_run=bool(config.resolve("dry_run")),
+                          journal=journal)
+
+    @staticmethod
+    def _journal(root: Path, config: LayeredConfig, command: str, resume: bool) -> typing.Optional["Journal"]:
+        from composo.journal import Journal
+
+        # a dry run changes nothing to resume or undo
+        if config.resolve("dry_run") or not config.resolve("journal", True):
+            return None
+        journal = Journal(root, content=bool(config.resolve("journal_content", False)))
+        journal.begin(command, resume=resume)
+        return journal
+
+    def rollback(self, path: Path = Path(".")) -> bool:
+        """
+        Undo the interrupted run of new or init in the given path, see :meth:`composo.journal.Journal.rollback`.
+
+        :return: whether there was an interrupted run
+
+        :Examples:
+
+            $ composo init ./my-project --rollback
+        """
+        from composo.journal import Journal
+
+        return Journal(Path(self._getcwd()) / Path(path)).rollback()
+
+    @staticmethod
+    def _print_staged(writer: FileWriter):
+        if not writer.dry_run:
+            return
+        table = Table("file", "bytes", "mode", title=f"dry run, nothing written to {writer.root}", title_justify="left")
+        for relative, staged in sorted(writer.sink.staged().items()):
+            if staged.data is not None:
+                size = str(len(staged.data))
+            else:
+                size = "" if staged.source is None else str(os.path.getsize(staged.source))
+            table.add_row(relative, size,
+                          "" if staged.mode is None else oct(staged.mode))
+        _get_rich_console().print(table)
+
+    @staticmethod
+    def _complete(result, writer: FileWriter):
+        # drives an async plugin call and runs the steps a plugin declared instead of doing the work itself
+        result = aio.resolve(result)
+        if isinstance(result, Steps):
+            report = run_steps(result, writer)
+            if tracing.get_tracer().profiling:
+                typer.echo(f"critical path: {' -> '.join(report.critical_path)} ({report.critical_time:.3f}s of "
+                           f"{report.wall_time:.3f}s, {len(report.skipped)} of {len(report.results)} steps up to "
+                           f"date)", err=True)
+        return result
+
+    def load_manifest(self, path: Path) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Read the projects of a batch manifest, each with the manifest defaults applied.
+
+        :param path: the location of the manifest
+        """
+        manifest = self._config_cache.load(Path(self._getcwd()) / path, self._open) or {}
+        defaults = manifest.get("defaults") or {}
+        return [{**defaults, **project} for project in manifest.get("projects") or []]
+
+    def new_many(self, projects: typing.Iterable[typing.Mapping[str, typing.Any]], jobs: int = 1,
+                 **kwargs) -> typing.List[TaskResult]:
+        """
+        Create several projects at once. The plugins are loaded once before the projects are fanned out across a
+        pool of `jobs` processes, a failing project does not abort the others.
+
+        The configs of all projects are validated first, by `jobs` processes as well, before any plugin is loaded.
 
-    def init(self, path: Path = Path("."), **kwargs):
+        :param projects: the arguments of :meth:`new` for every project, at least the `name`
+        :param jobs: the number of projects created in parallel
+        :param kwargs: additional arguments that are used for every project
+        :return: the status and timing of every project
+        :raises ConfigError: with the issues of all projects if any config is invalid
+
+        :Examples:
+
+            Create the projects listed in "projects.yaml" with four processes
+
+            $ composo new-batch projects.yaml --jobs 4
+        """
+        from composo.schema import ConfigError
+
+        projects = [{**kwargs, **project} for project in projects]
+        issues = [issue for found in map_many(self._batch_issues, projects, jobs=jobs) for issue in found]
+        if issues:
+            raise ConfigError(issues)
+        for plugin in {project.get("plugin", "python") for project in projects}:
+            if plugin in self.__plugins:
+                self._plugin_module(plugin)
+
+        return run_many(lambda project: self.new(**project), projects,
+                        names=[str(project.get("name")) for project in projects], jobs=jobs)
+
+    def init(self, path: Path = Path("."), force: bool = False, resume: bool = False, **kwargs):
         """
         Initialize the project in the given path or the current working directory
 
+        Files the plugin writes through :func:`composo.files.current_writer` are recorded in a manifest, a later init
+        only rewrites the files whose inputs in `.composo.yaml` changed. They are staged in memory and committed to
+        disk at once when the plugin succeeded, with `dry_run` they are only listed. The work of the plugin is
+        journaled in the project, an interrupted run is continued with `resume` or undone by :meth:`rollback`.
+
         :param path: the location of the project to be initialized
+        :param force: whether all files are rewritten regardless of the manifest
+        :param resume: whether an interrupted run is continued, skipping the work it finished
         :param kwargs: additional arguments that might be passed to the activated plugin
+        :raises ConfigError: if the config does not match the schemas, before the plugin is loaded
 
         :Examples:
 
@@ -280,13 +766,116 @@ An example [dim].composo.yaml[/dim] file would be:
         cwd = Path(self._getcwd())
         target_path = cwd / Path(path)
 
-        with self._open(target_path / ".composo.yaml") as f:
+        existing_config = self._read_project_config(target_path)
+
+        config = self.__config.with_layer("project", existing_config).with_layer("cli", kwargs)
+        self.validate(config, source=str(target_path / PROJECT_CONFIG))
+        plugin_name = config["plugin"]
+        plugin = self._load_plugin(plugin_name, config)
+        history.note(plugin=plugin_name, plugin_version=self._installed_version(plugin_name))
+        journal = self._journal(target_path, config, "init", resume)
+        with self._writer(target_path, config, force=force, journal=journal).activate() as writer:
+            with tracing.span("plugin.init", plugin=plugin_name, path=str(target_path)):
+                self._complete(plugin.init(target_path), writer)
+            self._print_staged(writer)
+        history.note(files=len(writer.written), size=writer.bytes_written)
+
+    def _read_project_config(self, target_path: Path):
+        from composo.schema import ConfigError, ConfigIssue
+
+        path = target_path / PROJECT_CONFIG
+        with tracing.span("config.load", path=str(path)):
             try:
-                existing_config = yaml.safe_load(f)
+                config = self._config_cache.load(path, self._open)
             except yaml.YAMLError as exc:
-                print(exc)
+                raise ConfigError([ConfigIssue(str(path), "", f"invalid YAML: {exc}")]) from exc
+        if config is not None and not isinstance(config, typing.Mapping):
+            raise ConfigError([ConfigIssue(str(path), "", f"expected a mapping, got {type(config).__name__}")])
+        return config
+
+    def config_issues(self, config: typing.Mapping[str, typing.Any], source: str) -> typing.List["ConfigIssue"]:
+        """
+        The issues of a config with the schemas of composo and of its plugin, and with the installed plugins, found
+        without importing any plugin, see :class:`composo.schema.SchemaRegistry`.
+
+        :param source: what the issues are reported for, e.g. the path of the config
+        """
+        from composo.schema import ConfigIssue, SchemaRegistry
+
+        if self._schemas is None:
+            self._schemas = SchemaRegistry()
+        with tracing.span("config.validate", source=source):
+            issues = self._schemas.validate(config, source=source)
+            plugin = config.get("plugin")
+            if plugin is None:
+                issues.append(ConfigIssue(source, "plugin", "is required"))
+            elif isinstance(plugin, str) and plugin not in self.__plugins:
+                issues.append(ConfigIssue(source, "plugin", f"no plugin found with name '{plugin}', available "
+                                                            f"plugins are: {sorted(self.__plugins)}"))
+        return issues
 
-        config = {**self.__config, **existing_config, **kwargs}
-        plugin = config["plugin"]
-        plugin = self._load_plugin(plugin, config)
-        plugin.init(target_path)
+    def validate(self, config: typing.Mapping[str, typing.Any], source: str):
+        """
+        :raises ConfigError: with every issue of the config, see :meth:`config_issues`
+        """
+        from composo.schema import ConfigError
+
+        issues = self.config_issues(config, source)
+        if issues:
+            raise ConfigError(issues)
+
+    def _project_issues(self, project: Path) -> typing.Tuple[typing.Optional[str], typing.List["ConfigIssue"]]:
+        from composo.schema import ConfigError
+
+        # the plugin and the issues of a project found by init_recursive
+        try:
+            config = self.__config.with_layer("project", self._read_project_config(project))
+        except ConfigError as exc:
+            return None, exc.issues
+        plugin = config.get("plugin")
+        return plugin if isinstance(plugin, str) else None, self.config_issues(config, str(project / PROJECT_CONFIG))
+
+    def _batch_issues(self, project: typing.Mapping[str, typing.Any]) -> typing.List["ConfigIssue"]:
+        config = {key: value for key, value in project.items() if key not in NEW_ARGUMENTS}
+        config["plugin"] = project.get("plugin", "python")
+        return self.config_issues(self.__config.with_layer("cli", config), source=f"project '{project.get('name')}'")
+
+    def init_recursive(self, root: Path = Path("."), jobs: int = 1, **kwargs) -> typing.List[TaskResult]:
+        """
+        Initialize every project below the given root, i.e. every directory containing a `.composo.yaml` file.
+
+        The projects are found in one directory walk that skips `.git`, `.venv` and `node_modules`. Their configs
+        are validated by `jobs` processes before any plugin is loaded. Every plugin is then loaded once before the
+        projects, grouped by plugin, are fanned out across a pool of `jobs` processes.
+
+        :param root: the directory to search for projects
+        :param jobs: the number of projects initialized in parallel
+        :param kwargs: additional arguments that might be passed to the activated plugins
+        :return: the status and timing of every project
+        :raises ConfigError: with the issues of all projects if any config is invalid
+
+        :Examples:
+
+            Re-initialize all projects of a monorepo with eight processes
+
+            $ composo init --recursive ./monorepo --jobs 8
+        """
+        from composo.schema import ConfigError
+
+        root_path = Path(self._getcwd()) / Path(root)
+        found = find_projects(root_path)
+        checked = map_many(self._project_issues, found, jobs=jobs)
+        issues = [issue for _, project_issues in checked for issue in project_issues]
+        if issues:
+            raise ConfigError(issues)
+        groups: typing.Dict[str, typing.List[Path]] = {}
+        for project, (plugin, _) in zip(found, checked):
+            groups.setdefault(str(plugin), []).append(project)
+
+        for plugin in groups:
+            if plugin in self.__plugins:
+                self._plugin_module(plugin)
+
+        projects = [project for plugin in sorted(groups) for project in groups[plugin]]
+        return run_many(lambda project: self.init(project, **kwargs), projects,
+                        names=[str(project.relative_to(root_path)) for project in projects], jobs=jobs)
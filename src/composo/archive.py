@@ -0,0 +1,266 @@
+import contextlib
+import contextvars
+import io
+import os
+import sys
+import threading
+import time
+import typing
+from pathlib import Path
+
+from composo import streams
+from composo.files import MANIFEST_FILE, Manifest
+from composo.staging import StagedFile
+
+TAR_GZ = "tar.gz"
+ZIP = "zip"
+FORMATS = (TAR_GZ, ZIP)
+STDOUT = "-"
+
+
+def archive_format(output: str, format: typing.Optional[str] = None) -> str:
+    """
+    The format of an archive, given explicitly or by the suffix of its path, tar.gz by default.
+    """
+    if format is not None:
+        if format not in FORMATS:
+            raise ValueError(f"unknown archive format '{format}', supported are {FORMATS}")
+        return format
+    return ZIP if output.lower().endswith(".zip") else TAR_GZ
+
+
+class _ArchiveMember(io.BytesIO):
+    def __init__(self, sink: "ArchiveSink", relative: str):
+        super().__init__()
+        self._sink = sink
+        self._relative = relative
+
+    def close(self):
+        if not self.closed:
+            self._sink.write(self._relative, self.getvalue())
+        super().close()
+
+
+class ArchiveError(Exception):
+    """
+    A plugin wrote a file of the project around the writer while the project is streamed into an archive.
+    """
+
+
+class ArchiveSink:
+    """
+    Writes the files of a project into a tar.gz or zip archive instead of a directory, without touching the disk.
+
+    The files are staged like in a :class:`composo.staging.StagingTree` and appended to the archive when the run
+    commits, so a later write of a file replaces the earlier one, e.g. of the `.composo.yaml` written by new and
+    again by init. Content beyond the buffer of the writer waits in its spool and is copied into the archive in
+    chunks, see :attr:`composo.files.FileWriter.spool`. The stream does not need to be seekable, e.g. the archive
+    can go to stdout.
+
+    Only the files written through :func:`composo.files.current_writer` or :meth:`open` reach the archive, a plugin
+    writing into the project with plain :func:`open` fails while the project is archived, see :func:`guard`.
+
+    :Example:
+
+        with open("my-project.tar.gz", "wb") as f:
+            sink = ArchiveSink(f, TAR_GZ, prefix="my-project")
+            writer = FileWriter(Path("my-project"), config, sink=sink, manifest=Manifest())
+            ...
+            sink.commit()
+    """
+    staging = True
+    on_disk = False
+    commits_to_disk = False
+    buffers = True
+
+    def __init__(self, stream: typing.BinaryIO, format: str = TAR_GZ, prefix: str = "",
+                 on_close: typing.Optional[typing.Callable[[bool], None]] = None):
+        """
+        :param stream: the binary stream the archive is written to
+        :param format: the format of the archive, see :data:`FORMATS`
+        :param prefix: the directory the files are placed in within the archive, e.g. the project name
+        :param on_close: called with whether the archive is complete once it has been closed
+        """
+        self.format = archive_format("", format)
+        self.prefix = prefix.strip("/")
+        self.files: typing.Dict[str, StagedFile] = {}
+        # the files in the archive, once committed
+        self.members: typing.List[str] = []
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._mtime = time.time()
+        # the cli lists the formats for every command, tarfile and zipfile are only imported to write an archive
+        import tarfile
+        import zipfile
+
+        self._tar: typing.Optional[tarfile.TarFile] = None
+        self._zip: typing.Optional[zipfile.ZipFile] = None
+        if self.format == ZIP:
+            self._zip = zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._tar = tarfile.open(fileobj=stream, mode="w|gz")
+        self._closed = False
+
+    def _name(self, relative: str) -> str:
+        return f"{self.prefix}/{relative}" if self.prefix else relative
+
+    def exists(self, relative: str) -> bool:
+        return relative in self.files
+
+    def write(self, relative: str, data: bytes, mode: typing.Optional[int] = None):
+        with self._lock:
+            previous = self.files.get(relative)
+            self.files[relative] = StagedFile(data, mode if mode is not None or previous is None else previous.mode)
+
+    def link(self, relative: str, source: typing.Union[str, Path], mode: typing.Optional[int] = None,
+             hardlink: bool = False):
+        """
+        Stage a file with the content of the source file, which is read in chunks on commit.
+        """
+        with self._lock:
+            self.files[relative] = StagedFile(None, mode, str(source))
+
+    def chmod(self, relative: str, mode: int):
+        with self._lock:
+            if relative not in self.files:
+                raise ValueError(f"'{relative}' is not a file of the archive")
+            self.files[relative] = self.files[relative]._replace(mode=mode)
+
+    def _add(self, relative: str, content: typing.BinaryIO, size: int, mode: typing.Optional[int]):
+        import tarfile
+        import zipfile
+
+        name = self._name(relative)
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, date_time=time.localtime(self._mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = (0o100000 | (0o644 if mode is None else mode)) << 16
+            info.file_size = size
+            with self._zip.open(info, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as member:
+                for chunk in iter(lambda: content.read(streams.CHUNK_SIZE), b""):
+                    member.write(chunk)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mode = 0o644 if mode is None else mode
+            info.mtime = int(self._mtime)
+            self._tar.addfile(info, content)  # type: ignore[union-attr]
+        self.members.append(relative)
+
+    def mtime(self, relative: str) -> typing.Optional[int]:
+        return None
+
+    def open(self, path: typing.Union[str, Path], mode: str = "w", encoding: typing.Optional[str] = None):
+        """
+        Open a new file of the archive for writing like :func:`open`, it is staged once closed.
+        """
+        if "w" not in mode:
+            raise ValueError("the files of an archive can only be written")
+        member = _ArchiveMember(self, Path(path).as_posix())
+        return member if "b" in mode else io.TextIOWrapper(member, encoding=encoding or "utf-8")
+
+    def save_manifest(self, manifest: Manifest):
+        self.write(MANIFEST_FILE, manifest.dumps())
+
+    def staged(self) -> typing.Dict[str, StagedFile]:
+        with self._lock:
+            return dict(self.files)
+
+    def stage(self, files: typing.Mapping[str, StagedFile]):
+        """
+        Take over files staged by a copy of this sink, e.g. in a forked process.
+        """
+        with self._lock:
+            self.files.update(files)
+
+    def _close(self, complete: bool):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            (self._zip or self._tar).close()  # type: ignore[union-attr]
+        if self._on_close is not None:
+            self._on_close(complete)
+
+    def discard(self):
+        with self._lock:
+            self.files.clear()
+        self._close(complete=False)
+
+    def commit(self):
+        """
+        Append the staged files to the archive in the order they were first written, then close it.
+        """
+        with self._lock:
+            files, self.files = self.files, {}
+        try:
+            for relative, staged in files.items():
+                if staged.data is not None:
+                    self._add(relative, io.BytesIO(staged.data), len(staged.data), staged.mode)
+                else:
+                    with open(staged.source, "rb") as f:  # type: ignore[arg-type]
+                        self._add(relative, f, os.fstat(f.fileno()).st_size, staged.mode)
+        except BaseException:
+            self._close(complete=False)
+            raise
+        self._close(complete=True)
+
+
+_archived: "contextvars.ContextVar[typing.Optional[str]]" = contextvars.ContextVar("composo_archived_root",
+                                                                                   default=None)
+_hooked = False
+
+
+def _audit(event: str, args: typing.Tuple[typing.Any, ...]):
+    if event != "open" and event != "os.mkdir":
+        return
+    root = _archived.get()
+    if root is None or not isinstance(args[0], (str, bytes, os.PathLike)):
+        return  # not archiving, or a descriptor
+    if event == "open":
+        mode, flags = args[1], args[2]
+        if not (isinstance(mode, str) and any(flag in mode for flag in "wax+")) and not (
+                flags & (os.O_WRONLY | os.O_RDWR | os.O_CREAT)):
+            return  # read only
+    path = os.path.abspath(os.fsdecode(args[0]))
+    if path == root or path.startswith(root + os.sep):
+        raise ArchiveError(f"'{path}' is written around composo.files.current_writer, the archive would miss it")
+
+
+@contextlib.contextmanager
+def guard(root: typing.Union[str, Path]):
+    """
+    Fail the writes of the current context into the project directory, e.g. by a plugin using plain :func:`open`,
+    while the project is streamed into an archive instead. Threads of steps and tasks of coroutines share the
+    context, see :mod:`composo.steps` and :mod:`composo.aio`.
+
+    :raises ArchiveError: on the first such write
+    """
+    global _hooked
+    if not _hooked:  # an audit hook cannot be removed, it is added once and idles outside of archiving runs
+        sys.addaudithook(_audit)
+        _hooked = True
+    token = _archived.set(os.path.abspath(root))
+    try:
+        yield
+    finally:
+        _archived.reset(token)
+
+
+def open_archive(output: str, format: typing.Optional[str] = None, prefix: str = "") -> ArchiveSink:
+    """
+    An archive sink writing to the given path, or to stdout for `-`. An incomplete archive file is removed.
+    """
+    format = archive_format(output, format)
+    if output == STDOUT:
+        stdout = sys.stdout.buffer
+        return ArchiveSink(stdout, format, prefix, on_close=lambda complete: stdout.flush())
+    path = os.path.abspath(output)
+    stream = open(path, "wb")
+
+    def close(complete: bool):
+        stream.close()
+        if not complete:
+            os.unlink(path)
+
+    return ArchiveSink(stream, format, prefix, on_close=close)
@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import time
+import traceback
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from composo import processes
+from composo.journal import JOURNAL_DIR
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+# the journal keeps the files an interrupted run replaced, a .composo.yaml among them
+PRUNED_DIRS = frozenset({".git", ".venv", "node_modules", JOURNAL_DIR})
+
+
+class TaskResult(typing.NamedTuple):
+    name: str
+    ok: bool
+    duration: float
+    error: typing.Optional[str] = None
+
+
+_task: typing.Optional[typing.Callable] = None
+
+
+def _set_task(task: typing.Callable):
+    global _task
+    _task = task
+
+
+def _init_worker(task: typing.Callable, workers: int):
+    _set_task(task)
+    # the commands the workers run, e.g. git init, must not exceed the CPUs together
+    processes.set_workers(workers)
+
+
+def _run_task(name: str, item) -> TaskResult:
+    start = time.perf_counter()
+    try:
+        _task(item)
+    except (Exception, SystemExit) as exc:  # a failing item must not abort the batch, Ctrl-C does
+        traceback.print_exc()
+        return TaskResult(name, False, time.perf_counter() - start, f"{type(exc).__name__}: {exc}")
+    return TaskResult(name, True, time.perf_counter() - start)
+
+
+def _fork_context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def run_many(task: typing.Callable[[T], typing.Any], items: typing.Sequence[T],
+             names: typing.Sequence[str], jobs: int = 1) -> typing.List[TaskResult]:
+    """
+    Run the task for every item and report the status and timing of each run.
+
+    With more than one job the items are fanned out across a process pool. The workers are forked, so they inherit
+    everything loaded so far, e.g. the config and the imported plugin modules, and the task does not need to be
+    picklable. Where forking is not available the items run one after another in this process.
+
+    :param task: the callable run for every item
+    :param items: the items to run the task for
+    :param names: the names the items are reported by
+    :param jobs: the maximum number of concurrently running processes
+    :return: the results in the order of the items
+    """
+    context = _fork_context()
+    if jobs <= 1 or len(items) <= 1 or context is None:
+        _set_task(task)
+        return [_run_task(name, item) for name, item in zip(names, items)]
+
+    workers = min(jobs, len(items))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(task, workers)) as pool:
+        futures = [pool.submit(_run_task, name, item) for name, item in zip(names, items)]
+        results = []
+        for name, future in zip(names, futures):
+            try:
+                results.append(future.result())
+            except Exception as exc:  # e.g. a worker killed by the OS
+                results.append(TaskResult(name, False, 0.0, f"{type(exc).__name__}: {exc}"))
+        return results
+
+
+def _call_task(item):
+    return _task(item)  # type: ignore[misc]
+
+
+def map_many(task: typing.Callable[[T], R], items: typing.Sequence[T], jobs: int = 1) -> typing.List[R]:
+    """
+    Apply the task to every item, fanned out across forked processes like :func:`run_many`. Unlike there, an
+    exception of the task propagates.
+
+    :return: the results in the order of the items
+    """
+    context = _fork_context()
+    if jobs <= 1 or len(items) <= 1 or context is None:
+        return [task(item) for item in items]
+
+    workers = min(jobs, len(items))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(task, workers)) as pool:
+        # chunks spare the many small items a round trip each
+        return list(pool.map(_call_task, items, chunksize=max(1, len(items) // (4 * workers))))
+
+
+def find_projects(root: Path, marker: str = ".composo.yaml",
+                  pruned: typing.AbstractSet[str] = PRUNED_DIRS) -> typing.List[Path]:
+    """
+    Find every directory below root, including root itself, that contains the marker file.
+
+    :param root: the directory to search
+    :param marker: the name of the file marking a project directory
+    :param pruned: the names of the directories that are not descended into
+    :return: the project directories in walk order
+    """
+    projects = []
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name == marker and entry.is_file():
+                        projects.append(Path(directory))
+                    elif entry.is_dir(follow_symlinks=False) and entry.name not in pruned:
+                        subdirs.append(entry.path)
+        except (PermissionError, FileNotFoundError):
+            continue
+        stack.extend(sorted(subdirs, reverse=True))
+    return projects
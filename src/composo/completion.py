@@ -0,0 +1,237 @@
+import os
+import sys
+import typing
+
+# Shell completion runs on every TAB press, so this module imports nothing but the standard library at the top and
+# never typer, rich, click or a plugin module while answering from the index.
+
+COMPLETION_ENV = "_COMPOSO_COMPLETE"
+INDEX_FILE_NAME = "completion.json"
+INDEX_FORMAT = 1
+SHELLS = ("bash", "zsh", "fish", "powershell", "pwsh")
+
+Candidate = typing.Tuple[str, str]
+
+
+def index_file() -> str:
+    """
+    The location of the completion index, the default cache dir of composo.
+
+    Completion has to find the index without loading the user config, so it does not follow a configured
+    `cache_dir`.
+    """
+    from appdirs import user_cache_dir
+
+    return os.path.join(user_cache_dir("composo"), INDEX_FILE_NAME)
+
+
+def fingerprint() -> typing.List[typing.Any]:
+    """
+    Changes whenever a distribution is installed or removed, or the commands of composo are edited.
+
+    Installing or removing a distribution adds or removes its metadata directory, which changes the modification
+    time of the directory on the import path. One stat per path entry is cheaper than
+    :func:`composo.plugins.path_fingerprint`, which reads every directory.
+    """
+    state: typing.List[typing.Any] = []
+    for path in sys.path + [os.path.join(os.path.dirname(__file__), "app.py")]:
+        try:
+            state.append([path, os.stat(path or ".").st_mtime_ns])
+        except OSError:
+            state.append([path, None])
+    return state
+
+
+def _param(param) -> typing.Dict[str, typing.Any]:
+    import click
+
+    record: typing.Dict[str, typing.Any] = {"help": " ".join((getattr(param, "help", None) or "").split())}
+    if isinstance(param.type, click.Choice):
+        record["choices"] = [str(choice) for choice in param.type.choices]
+    elif isinstance(param.type, click.Path):
+        record["path"] = {"files": bool(param.type.file_okay), "dirs": bool(param.type.dir_okay)}
+    if isinstance(param, click.Option):
+        record["names"] = list(param.opts) + list(param.secondary_opts)
+        record["flag"] = bool(param.is_flag or param.count)
+    return record
+
+
+def _command(command) -> typing.Dict[str, typing.Any]:
+    import click
+
+    params = [param for param in command.params if not getattr(param, "hidden", False)]
+    options = [_param(param) for param in params if isinstance(param, click.Option)]
+    options.append({"names": ["--help"], "flag": True, "help": "Show this message and exit."})
+    return {
+        "help": (command.short_help or (command.help or "").strip().split("\n")[0]).strip(),
+        "options": options,
+        "arguments": [_param(param) for param in params if isinstance(param, click.Argument)],
+    }
+
+
+def describe(group) -> typing.Dict[str, typing.Any]:
+    """
+    The commands, options, arguments and choices of the click group of the cli, as stored in the index.
+    """
+    spec = _command(group)
+    spec["commands"] = {name: _command(command) for name, command in sorted(group.commands.items())
+                        if not command.hidden}
+    return spec
+
+
+def save_index(spec: typing.Mapping[str, typing.Any], path: typing.Optional[str] = None):
+    import json
+
+    path = index_file() if path is None else str(path)
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump({"format": INDEX_FORMAT, "fingerprint": fingerprint(), "cli": spec}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # without an index completion takes the slow path
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def load_index(path: typing.Optional[str] = None) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    import json
+
+    try:
+        with open(index_file() if path is None else path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format") != INDEX_FORMAT or data.get("fingerprint") != fingerprint():
+        return None
+    return data["cli"]
+
+
+def _option(command: typing.Mapping[str, typing.Any], name: str) -> typing.Optional[typing.Mapping[str, typing.Any]]:
+    return next((option for option in command["options"] if name in option["names"]), None)
+
+
+def _paths(incomplete: str, files: bool) -> typing.List[Candidate]:
+    directory, prefix = os.path.split(incomplete)
+    try:
+        with os.scandir(os.path.expanduser(directory) or ".") as it:
+            entries = [(entry.name, entry.is_dir()) for entry in it
+                       if entry.name.startswith(prefix) and (prefix.startswith(".") or not entry.name.startswith("."))]
+    except OSError:
+        return []
+    return sorted((os.path.join(directory, name) + ("/" if is_dir else ""), "") for name, is_dir in entries
+                  if is_dir or files)
+
+
+def _values(param: typing.Mapping[str, typing.Any], incomplete: str) -> typing.List[Candidate]:
+    if "choices" in param:
+        return [(choice, "") for choice in param["choices"] if choice.startswith(incomplete)]
+    if "path" in param:
+        return _paths(incomplete, param["path"]["files"])
+    return []
+
+
+def candidates(spec: typing.Mapping[str, typing.Any], args: typing.Sequence[str], incomplete: str
+               ) -> typing.List[Candidate]:
+    """
+    The completions of the word being typed and their help texts.
+
+    :param spec: the cli as described by :func:`describe`
+    :param args: the words before the word being typed, without the program name
+    :param incomplete: the word being typed
+    """
+    command = spec
+    used: typing.Set[str] = set()
+    expects = None
+    position = 0
+    for arg in args:
+        if expects is not None:
+            expects = None
+        elif arg.startswith("-"):
+            option = _option(command, arg.split("=", 1)[0])
+            if option is not None:
+                used.update(option["names"])
+                if not option["flag"] and "=" not in arg:
+                    expects = option
+        elif command is spec and arg in spec["commands"]:
+            command = spec["commands"][arg]
+            used = set()
+        else:
+            position += 1
+
+    if expects is not None:
+        return _values(expects, incomplete)
+    if incomplete.startswith("-"):
+        return [(name, option["help"]) for option in command["options"] if not used.intersection(option["names"])
+                for name in option["names"] if name.startswith(incomplete)]
+    if command is spec:
+        return [(name, sub["help"]) for name, sub in spec["commands"].items() if name.startswith(incomplete)]
+    if position < len(command["arguments"]):
+        return _values(command["arguments"][position], incomplete)
+    return []
+
+
+def _shell(instruction: str) -> typing.Optional[str]:
+    # typer uses complete_bash, click bash_complete, source_bash and bash_source print the completion script
+    first, _, second = instruction.partition("_")
+    shell, action = (second, first) if second in SHELLS else (first, second)
+    return shell if shell in SHELLS and action == "complete" else None
+
+
+def _words(shell: str, environ: typing.Mapping[str, str]) -> typing.Tuple[typing.List[str], str]:
+    if shell == "bash":
+        words = environ.get("COMP_WORDS", "").split()
+        cword = int(environ.get("COMP_CWORD") or len(words))
+        return words[1:cword], words[cword] if cword < len(words) else ""
+    line = environ.get("_TYPER_COMPLETE_ARGS", "")
+    words = line.split()[1:]
+    if shell in ("powershell", "pwsh"):
+        return words, environ.get("_TYPER_COMPLETE_WORD_TO_COMPLETE", "")
+    if words and not line.endswith(" "):
+        return words[:-1], words[-1]
+    return words, ""
+
+
+def _format(shell: str, items: typing.List[Candidate]) -> str:
+    if shell == "bash":
+        return "\n".join(value for value, _ in items)
+    if shell == "zsh":
+        def escape(text: str) -> str:
+            return text.replace('"', '""').replace("'", "''").replace("$", "\\$").replace("`", "\\`")
+
+        if not items:
+            return "_files"
+        lines = "\n".join(f'"{escape(value)}":"{escape(help)}"' if help else f'"{escape(value)}"'
+                          for value, help in items)
+        return f"_arguments '*: :(({lines}))'"
+    if shell == "fish":
+        return "\n".join(f"{value}\t{help}" if help else value for value, help in items)
+    return "\n".join(f"{value}:::{help or ' '}" for value, help in items)
+
+
+def respond(instruction: str, environ: typing.Mapping[str, str] = os.environ, out: typing.TextIO = sys.stdout,
+            path: typing.Optional[str] = None) -> typing.Optional[int]:
+    """
+    Answer a completion request of the shell scripts typer installs from the index, without the cli stack.
+
+    :param instruction: the value of `_COMPOSO_COMPLETE`, e.g. `complete_bash`
+    :param environ: the environment holding the words of the command line
+    :param out: where the completions are printed to
+    :param path: the location of the index, see :func:`index_file`
+    :return: the exit code, or None if the request has to be answered by the cli, e.g. without a valid index
+    """
+    shell = _shell(instruction)
+    if shell is None:
+        return None
+    spec = load_index(path)
+    if spec is None:
+        return None
+    args, incomplete = _words(shell, environ)
+    items = candidates(spec, args, incomplete)
+    if shell == "fish" and environ.get("_TYPER_COMPLETE_FISH_ACTION") == "is-args":
+        return 0 if items else 1  # whether fish completes arguments instead of files
+    out.write(_format(shell, items))
+    out.write("\n")
+    return 0
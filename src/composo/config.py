@@ -0,0 +1,180 @@
+import os
+import pickle
+import typing
+from pathlib import Path
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+LIBYAML = SafeLoader is not yaml.SafeLoader
+
+
+def safe_load(stream) -> typing.Any:
+    """
+    Parse a YAML document like :func:`yaml.safe_load`, with the libyaml based loader if it is available.
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+class ConfigCache:
+    """
+    Parsed YAML configs keyed by path, mtime and size.
+
+    Every load of a cached config returns a fresh copy, so callers may modify the result. Files that cannot be
+    stat'ed, e.g. those of an injected test opener, are parsed every time.
+    """
+
+    def __init__(self):
+        self._entries: typing.Dict[str, typing.Tuple[int, int, bytes]] = {}
+
+    def load(self, path: typing.Union[str, Path], fopen: typing.Callable = open) -> typing.Any:
+        """
+        :param path: the location of the config
+        :param fopen: the callable used to open the config
+        :return: the parsed config
+        """
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            stat = None
+
+        if stat is not None:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                return pickle.loads(entry[2])
+
+        with fopen(path) as f:
+            config = safe_load(f)
+
+        if stat is not None:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, pickle.dumps(config))
+        return config
+
+    def clear(self):
+        self._entries.clear()
+
+
+_MISSING = object()
+
+
+class LayeredConfig(typing.Mapping[str, typing.Any]):
+    """
+    Read-only view of stacked config layers, e.g. the defaults, the user `config.yaml`, the project `.composo.yaml`
+    and the cli arguments, where later layers take precedence.
+
+    Nested mappings are merged deeply and lazily: looking up a mapping returns another view of the layers below
+    that key, so `vcs.git.github` of the user config survives a project config that only sets `vcs.git.url`.
+    Resolved dotted keys are memoized. A view never copies its layers, so one view can be shared by all projects
+    of a batch and be extended per project by :meth:`with_layer`.
+
+    :Example:
+
+        config = LayeredConfig([("defaults", DEFAULT_CONFIG), ("user", user_config)])
+        config = config.with_layer("project", project_config)
+        config.resolve("vcs.git.github.name")
+        config.provenance("vcs.git.github.name")  # e.g. "user"
+    """
+
+    def __init__(self, layers: typing.Iterable[typing.Tuple[str, typing.Optional[typing.Mapping]]] = ()):
+        self._layers: typing.Tuple[typing.Tuple[str, typing.Mapping], ...] = tuple(
+            (name, layer) for name, layer in layers if layer)
+        self._memo: typing.Dict[str, typing.Any] = {}
+        self._keys: typing.Optional[typing.List[str]] = None
+
+    @property
+    def layers(self) -> typing.Tuple[typing.Tuple[str, typing.Mapping], ...]:
+        return self._layers
+
+    def with_layer(self, name: str, layer: typing.Optional[typing.Mapping]) -> "LayeredConfig":
+        """
+        A new view with the given layer on top of the layers of this one.
+        """
+        if not layer:
+            return self
+        return LayeredConfig(self._layers + ((name, layer),))
+
+    def _candidates(self, key: str) -> typing.Iterator[typing.Tuple[str, typing.Any]]:
+        # the values of all layers at the dotted key, topmost first
+        parts = key.split(".")
+        for name, layer in reversed(self._layers):
+            value: typing.Any = layer
+            for part in parts:
+                if not isinstance(value, typing.Mapping) or part not in value:
+                    value = _MISSING
+                    break
+                value = value[part]
+            if value is not _MISSING:
+                yield name, value
+
+    def resolve(self, key: str, default=None):
+        """
+        Look up a dotted key like `vcs.git.github.name`.
+        """
+        try:
+            value = self._memo[key]
+        except KeyError:
+            value = self._memo[key] = self._resolve(key)
+        return default if value is _MISSING else value
+
+    def _resolve(self, key: str):
+        mappings = []
+        for name, value in self._candidates(key):
+            if not isinstance(value, typing.Mapping):
+                if not mappings:
+                    return value
+                break  # shadowed by the mappings above
+            mappings.append((name, value))
+        if not mappings:
+            return _MISSING
+        return LayeredConfig(reversed(mappings)) if len(mappings) > 1 or mappings[0][1] else {}
+
+    def provenance(self, key: str) -> typing.Optional[str]:
+        """
+        The name of the topmost layer defining the dotted key, or None if no layer does.
+        """
+        return next((name for name, _ in self._candidates(key)), None)
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        The merged config as plain nested dicts.
+        """
+        return {key: value.to_dict() if isinstance(value, LayeredConfig) else value for key, value in self.items()}
+
+    def __getitem__(self, key: str):
+        value = self.resolve(key, _MISSING) if "." not in key else self._resolve_top_level(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def _resolve_top_level(self, key: str):
+        # keys containing dots are looked up literally, not as paths
+        for _, layer in reversed(self._layers):
+            if key in layer:
+                return layer[key]
+        return _MISSING
+
+    def __iter__(self):
+        if self._keys is None:
+            self._keys = list(dict.fromkeys(key for _, layer in self._layers for key in layer))
+        return iter(self._keys)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"LayeredConfig({self.to_dict()!r})"
+
+
+def _represent_layered_config(dumper, data: LayeredConfig):
+    return dumper.represent_dict(data.to_dict())
+
+
+# plugins dump the config they are given, e.g. into the `.composo.yaml` of a new project
+for _dumper in (yaml.Dumper, yaml.SafeDumper, getattr(yaml, "CDumper", None), getattr(yaml, "CSafeDumper", None)):
+    if _dumper is not None:
+        yaml.add_representer(LayeredConfig, _represent_layered_config, Dumper=_dumper)
@@ -0,0 +1,279 @@
+import json
+import os
+import selectors
+import socket
+import socketserver
+import sys
+import typing
+from pathlib import Path
+
+# The client side of this module runs on every forwarded cli call, so only light modules are imported up here.
+
+SOCKET_ENV = "COMPOSO_DAEMON_SOCKET"
+DISABLE_ENV = "COMPOSO_NO_DAEMON"
+FORWARDED_COMMANDS = ("new", "new-batch", "init")
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+
+def default_socket_path() -> Path:
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    from appdirs import user_cache_dir
+    return Path(user_cache_dir("composo")) / "daemon.sock"
+
+
+def _interpreter() -> typing.Dict[str, typing.Any]:
+    # a daemon only serves clients of the same environment, it has the plugins of its own environment loaded
+    return {"executable": sys.executable, "prefix": sys.prefix, "path": sys.path[1:]}
+
+
+def _send(conn, message: typing.Dict[str, typing.Any]):
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def forward(args: typing.Sequence[str], socket_path: typing.Optional[Path] = None,
+            timeout: float = 0.5) -> typing.Optional[int]:
+    """
+    Run the command line in a running daemon, streaming its output to this process.
+
+    :param args: the command line arguments without the program name
+    :param socket_path: the socket of the daemon, see :func:`default_socket_path`
+    :param timeout: the time to wait for the daemon to accept the connection
+    :return: the exit code of the command, or None if no daemon could run it and it has to run in-process
+    """
+    path = default_socket_path() if socket_path is None else socket_path
+    if not path.exists():
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.settimeout(timeout)
+        conn.connect(str(path))
+        tty = sys.stdout.isatty()
+        env = dict(os.environ)
+        if tty:
+            import shutil
+            env.setdefault("COLUMNS", str(shutil.get_terminal_size().columns))
+        _send(conn, {"args": list(args), "cwd": os.getcwd(), "env": env, "interpreter": _interpreter(), "tty": tty})
+        conn.settimeout(None)
+        with conn.makefile("rb") as replies:
+            for line in replies:
+                reply = json.loads(line)
+                if "out" in reply:
+                    sys.stdout.write(reply["out"])
+                    sys.stdout.flush()
+                elif "err" in reply:
+                    sys.stderr.write(reply["err"])
+                    sys.stderr.flush()
+                elif "exit" in reply:
+                    return int(reply["exit"])
+                else:  # rejected, e.g. by a daemon whose plugins are outdated
+                    return None
+    except (OSError, ValueError):
+        return None
+    finally:
+        conn.close()
+    return None
+
+
+def stop(socket_path: typing.Optional[Path] = None) -> bool:
+    """
+    Ask a running daemon to shut down.
+
+    :return: whether a daemon was running
+    """
+    path = default_socket_path() if socket_path is None else socket_path
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(2.0)
+            conn.connect(str(path))
+            _send(conn, {"stop": True})
+            conn.recv(1024)
+    except OSError:
+        return False
+    return True
+
+
+class _StreamWriter:
+    """
+    Text stream forwarding everything written to it to the client as one reply per write.
+    """
+
+    def __init__(self, conn, stream: str, tty: bool):
+        self._conn = conn
+        self._stream = stream
+        self._tty = tty
+
+    def write(self, data: str) -> int:
+        if not isinstance(data, str):  # like any text stream, click probes for binary streams this way
+            raise TypeError(f"write() argument must be str, not {type(data).__name__}")
+        if data:
+            _send(self._conn, {self._stream: data})
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return self._tty
+
+    def fileno(self) -> int:
+        raise OSError("the output of the daemon is forwarded to the client")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self):
+        self.server.serve_client(self.request)
+
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves cli calls from a warm process: the container, the discovered plugins and the plugin modules are loaded
+    once, every request runs in a fork of the daemon.
+    """
+
+    # a stopping daemon leaves the forks to finish the commands they run
+    block_on_close = False
+
+    def __init__(self, socket_path: Path, dispatch: typing.Callable[[typing.List[str]], typing.Any],
+                 fingerprint: typing.Callable[[], str], idle_timeout: float):
+        self.dispatch = dispatch
+        self.fingerprint = fingerprint
+        self.started_fingerprint = fingerprint()
+        self.timeout = idle_timeout
+        self.stopping = False
+        # the forks decide whether the daemon stops, they tell the daemon through this pipe
+        self._stops, self._stop = os.pipe()
+        super().__init__(str(socket_path), _Handler)
+
+    def server_bind(self):
+        super().server_bind()
+        # nobody can connect before the server listens, so no other user ever reaches the socket
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        os.close(self._stops)
+        os.close(self._stop)
+
+    def handle_timeout(self):
+        super().handle_timeout()
+        if not self.active_children:
+            self.stopping = True
+
+    def serve_until_stopped(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self, selectors.EVENT_READ)
+            selector.register(self._stops, selectors.EVENT_READ)
+            while not self.stopping:
+                ready = {key.fileobj for key, _ in selector.select(self.timeout)}
+                if self._stops in ready:
+                    self.stopping = True
+                elif ready:
+                    self.handle_request()
+                else:
+                    self.handle_timeout()
+
+    def serve_client(self, conn):
+        # runs in the fork, a client that is slow to send its request only stalls its own fork
+        try:
+            conn.settimeout(5.0)
+            with conn.makefile("rb") as f:
+                line = f.readline()
+            conn.settimeout(None)
+            message = json.loads(line) if line else None
+        except (OSError, ValueError):
+            return
+        if message is None:
+            return
+
+        if message.get("stop"):
+            os.write(self._stop, b"s")
+            reply: typing.Dict[str, typing.Any] = {"stopped": True}
+        elif message.get("interpreter") != _interpreter():
+            reply = {"rejected": "the client runs in another environment"}
+        elif self.fingerprint() != self.started_fingerprint:
+            os.write(self._stop, b"s")
+            reply = {"rejected": "the installed plugins or the user config changed"}
+        else:
+            reply = {"exit": self.run_command(conn, message)}
+        try:
+            _send(conn, reply)
+        except OSError:
+            pass
+
+    def run_command(self, conn, request: typing.Dict[str, typing.Any]) -> int:
+        from composo import tracing
+        from composo.main import profiling, report_profile
+
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        if request.get("tty"):
+            os.environ.setdefault("FORCE_COLOR", "1")
+        sys.stdout = _StreamWriter(conn, "out", request.get("tty", False))  # type: ignore[assignment]
+        sys.stderr = _StreamWriter(conn, "err", request.get("tty", False))  # type: ignore[assignment]
+
+        args = request["args"]
+        profile, trace_file = profiling(args)
+        if profile:
+            tracing.enable()
+        try:
+            self.dispatch(args)
+        except SystemExit as exc:
+            return exc.code if isinstance(exc.code, int) else int(exc.code is not None)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            return 1
+        finally:
+            if profile:
+                report_profile(trace_file)
+        return 0
+
+
+def serve(dispatch: typing.Callable[[typing.List[str]], typing.Any], socket_path: typing.Optional[Path] = None,
+          idle_timeout: float = DEFAULT_IDLE_TIMEOUT, fingerprint: typing.Optional[typing.Callable[[], str]] = None):
+    """
+    Serve cli calls until the daemon has been idle for `idle_timeout` seconds, is stopped, or notices that the
+    installed plugins or the user config changed.
+
+    :param dispatch: runs a command line, e.g. :meth:`composo.app.Composo.dispatch`
+    :param socket_path: the socket to listen on, see :func:`default_socket_path`
+    :param idle_timeout: the idle time in seconds after which the daemon shuts down
+    :param fingerprint: the state whose change invalidates the daemon, the installed plugins and user config by
+        default
+    """
+    path = default_socket_path() if socket_path is None else Path(socket_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        if is_running(path):
+            raise RuntimeError(f"a composo daemon is already listening on {path}")
+        path.unlink()
+    server = DaemonServer(path, dispatch, fingerprint or installation_fingerprint, idle_timeout)
+    try:
+        server.serve_until_stopped()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def is_running(path: Path) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(str(path))
+    except OSError:
+        return False
+    return True
+
+
+def installation_fingerprint() -> str:
+    from appdirs import user_config_dir
+    from composo.plugins import path_fingerprint
+
+    try:
+        config_mtime = os.stat(Path(user_config_dir("composo")) / "config.yaml").st_mtime_ns
+    except OSError:
+        config_mtime = 0
+    return f"{path_fingerprint()}:{config_mtime}"
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import typing
+from pathlib import Path
+
+from composo import processes, tracing
+from composo.config import LayeredConfig
+from composo.staging import materialize
+
+POOL_FORMAT = 1
+DEFAULT_MAX_ENVS = 8
+BIN_DIR = "Scripts" if os.name == "nt" else "bin"
+# the files of a virtual environment that contain its absolute path
+_RELOCATED_SUFFIXES = (".pth", ".cfg")
+
+
+class SeedResult(typing.NamedTuple):
+    path: Path
+    key: str
+    # `clone` of a pooled environment or `build` of a new one
+    method: str
+    duration: float
+
+
+def env_python(env: Path) -> Path:
+    return env / BIN_DIR / ("python.exe" if os.name == "nt" else "python")
+
+
+class EnvironmentPool:
+    """
+    Pool of pre-built virtual environments under the `cache_dir`, keyed by the hash of a lockfile and the
+    interpreter, from which plugins seed the environments of new projects.
+
+    The lockfile is a pinned requirements file, e.g. from `pip-compile` or `poetry export`. The first project of a
+    lockfile builds an environment: a venv without pip, into which the pip of composo installs the locked packages
+    with `--no-index` from the wheelhouse only. Unless the pool is offline, missing wheels are fetched into the
+    wheelhouse before. The environment is then kept in the pool, and every later project with an equal lockfile
+    clones it instead: its files are materialized by reflink, hardlink (if enabled) or copy_file_range, see
+    :func:`composo.staging.materialize`, and the paths in its scripts are rewritten.
+
+    The pool keeps the `max_envs` most recently used environments. The installs need pip 22.3 or later.
+
+    :Example:
+
+        envs:
+          wheelhouse: /srv/wheels  # the local wheelhouse, `cache_dir/wheels` by default
+          offline: true            # never fetch wheels, install from the wheelhouse only
+          max_envs: 8
+          hardlink: false
+
+        pool = ioc.Services.environments(config)
+        pool.seed(project / ".venv", project / "requirements.lock")
+    """
+
+    def __init__(self, path: Path, wheelhouse: typing.Optional[Path] = None, offline: bool = False,
+                 max_envs: int = DEFAULT_MAX_ENVS, hardlink: bool = False,
+                 runner: typing.Optional[processes.ProcessRunner] = None, python: str = sys.executable):
+        self.path = Path(path)
+        self.wheelhouse = self.path.parent / "wheels" if wheelhouse is None else Path(wheelhouse)
+        self.offline = offline
+        self.max_envs = max_envs
+        self.hardlink = hardlink
+        self.runner = processes.get_runner() if runner is None else runner
+        self.python = python
+
+    @classmethod
+    def from_config(cls, config: LayeredConfig) -> typing.Optional["EnvironmentPool"]:
+        cache_dir = config.resolve("cache_dir")
+        if not cache_dir:
+            return None
+        wheelhouse = config.resolve("envs.wheelhouse")
+        return cls(Path(cache_dir) / "envs",
+                   wheelhouse=Path(wheelhouse).expanduser() if wheelhouse else None,
+                   offline=bool(config.resolve("envs.offline", False)),
+                   max_envs=int(config.resolve("envs.max_envs", DEFAULT_MAX_ENVS)),
+                   hardlink=bool(config.resolve("envs.hardlink", False)))
+
+    def key(self, lockfile: Path) -> str:
+        """
+        The key of the environments of the lockfile, for the interpreter of the pool.
+        """
+        digest = hashlib.sha256(Path(lockfile).read_bytes())
+        digest.update(f"\n{POOL_FORMAT}:{sys.implementation.name}:{platform.python_version()}:"
+                      f"{platform.machine()}:{self.python}".encode())
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    def seed(self, target: Path, lockfile: Path) -> SeedResult:
+        """
+        Create the virtual environment of a project with the locked packages.
+
+        :param target: the location of the environment, e.g. `.venv` in the project
+        :param lockfile: the pinned requirements
+        :raises composo.processes.ProcessError: if the environment cannot be built, e.g. for a missing wheel
+        """
+        if Path(target).exists() and any(Path(target).iterdir()):
+            raise FileExistsError(f"the environment {target} exists already")
+        start = time.perf_counter()
+        key = self.key(lockfile)
+        with tracing.span("envs.seed", key=key):
+            method = "clone"
+            env = self._pooled(key)
+            if env is None:
+                method = "build"
+                env = self._build(key, Path(lockfile))
+            self._clone(env, Path(target))
+        self.prune()
+        return SeedResult(Path(target), key, method, time.perf_counter() - start)
+
+    def _pooled(self, key: str) -> typing.Optional[Path]:
+        try:
+            with open(self._entry(key)) as f:
+                env = Path(json.load(f)["path"])
+        except (OSError, ValueError, KeyError):
+            return None
+        if not env_python(env).exists():
+            return None
+        os.utime(self._entry(key))  # least recently used
+        return env
+
+    def _build(self, key: str, lockfile: Path) -> Path:
+        self.path.mkdir(parents=True, exist_ok=True)
+        # built under a name of its own, concurrent builds of one key, e.g. by the workers of a batch, do not clash
+        env = self.path / f"{key}.{os.getpid()}.{time.monotonic_ns()}"
+        pip = [self.python, "-m", "pip", "--disable-pip-version-check", "--no-input"]
+        try:
+            with tracing.span("envs.build", key=key):
+                self.runner.run([self.python, "-m", "venv", "--without-pip", env], name="venv")
+                if not self.offline:
+                    self.wheelhouse.mkdir(parents=True, exist_ok=True)
+                    self.runner.run(pip + ["wheel", "--quiet", "--wheel-dir", self.wheelhouse, "--find-links",
+                                           self.wheelhouse, "-r", lockfile], name="pip")
+                self.runner.run(pip + ["--python", env_python(env), "install", "--quiet", "--no-index",
+                                       "--find-links", self.wheelhouse, "-r", lockfile], name="pip")
+        except BaseException:
+            shutil.rmtree(env, ignore_errors=True)
+            raise
+        entry = self._entry(key)
+        tmp_path = entry.with_name(f".{entry.name}.{os.getpid()}")
+        tmp_path.write_text(json.dumps({"format": POOL_FORMAT, "path": str(env), "lockfile": str(lockfile)}))
+        os.replace(tmp_path, entry)
+        return env
+
+    def _clone(self, env: Path, target: Path):
+        with tracing.span("envs.clone", target=str(target)):
+            for directory, dirs, files in os.walk(env):
+                relative = os.path.relpath(directory, env)
+                target_dir = target / relative
+                target_dir.mkdir(parents=True, exist_ok=True)
+                for name in dirs + files:
+                    source = os.path.join(directory, name)
+                    if os.path.islink(source):
+                        os.symlink(os.readlink(source), target_dir / name)
+                        if name in dirs:
+                            dirs.remove(name)  # e.g. lib64 -> lib
+                    elif name in files:
+                        materialize(source, target_dir / name, self.hardlink)
+                        if not self.hardlink:
+                            shutil.copymode(source, target_dir / name)
+            _relocate(target, env)
+
+    def entries(self) -> typing.List[typing.Tuple[float, Path]]:
+        """
+        The pooled environments by their last use, the least recently used first.
+        """
+        if not self.path.is_dir():
+            return []
+        return sorted((entry.stat().st_mtime, Path(entry.path)) for entry in os.scandir(self.path)
+                      if entry.name.endswith(".json"))
+
+    def prune(self, max_envs: typing.Optional[int] = None) -> int:
+        """
+        Remove the least recently used environments beyond max_envs.
+
+        Builds no entry refers to, e.g. of a concurrent build that lost the race for an entry or of an aborted
+        run, are removed after a day.
+
+        :param max_envs: the number of environments kept, that of the pool by default
+        :return: the number of removed environments
+        """
+        max_envs = self.max_envs if max_envs is None else max_envs
+        entries = [entry for _, entry in self.entries()]
+        evicted, kept = entries[:max(len(entries) - max_envs, 0)], entries[max(len(entries) - max_envs, 0):]
+        builds = set()
+        for entry in kept:
+            try:
+                builds.add(Path(json.loads(entry.read_text())["path"]).name)
+            except (OSError, ValueError, KeyError):
+                continue
+        for entry in evicted:
+            entry.unlink(missing_ok=True)
+        evicted_keys = {entry.stem for entry in evicted}
+        abandoned = time.time() - 24 * 3600
+        for item in os.scandir(self.path) if self.path.is_dir() else ():
+            if item.is_dir() and item.name not in builds and (
+                    item.name.split(".")[0] in evicted_keys or item.stat().st_mtime < abandoned):
+                shutil.rmtree(item.path, ignore_errors=True)
+        return len(evicted)
+
+
+def _relocate(target: Path, env: Path):
+    # scripts, activate files, pyvenv.cfg and .pth files refer to the absolute path of the environment
+    old, new = str(env).encode(), str(target.absolute()).encode()
+    old_prompt, new_prompt = f"({env.name})".encode(), f"({target.absolute().name})".encode()
+    candidates = [target / "pyvenv.cfg"] + [Path(entry.path) for entry in os.scandir(target / BIN_DIR)]
+    for site_packages in target.glob("lib*/python*/site-packages") if os.name != "nt" else [
+            target / "Lib" / "site-packages"]:
+        candidates.extend(path for path in site_packages.iterdir() if path.suffix in _RELOCATED_SUFFIXES)
+    for path in candidates:
+        if path.is_symlink() or not path.is_file():
+            continue
+        data = path.read_bytes()
+        if old not in data or b"\0" in data:
+            continue
+        mode = path.stat().st_mode
+        path.unlink()  # a hardlinked file is replaced, the pooled environment is not changed
+        path.write_bytes(data.replace(old, new).replace(old_prompt, new_prompt))
+        os.chmod(path, mode)
@@ -0,0 +1,467 @@
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import typing
+from pathlib import Path
+
+from composo import streams
+from composo.config import LayeredConfig
+
+if typing.TYPE_CHECKING:
+    from composo.journal import Journal
+
+MANIFEST_FILE = ".composo.manifest.json"
+MANIFEST_FORMAT = 1
+
+# the key a file depends on if it does not declare its inputs
+WHOLE_CONFIG = "*"
+# the keys of the command line that control a run, not what it renders; no file depends on them
+RUN_FLAGS = ("dry_run", "offline", "force", "resume", "jobs")
+
+# rendered content, or content streamed from an iterator or generator of chunks, a file object or a file path
+Content = typing.Union[str, bytes, streams.Source]
+
+
+def lookup(config: typing.Mapping, key: str, default=None):
+    """
+    Look up a dotted key like `vcs.git.github.name` in a nested config.
+    """
+    if key == WHOLE_CONFIG:
+        return config
+    if isinstance(config, LayeredConfig):
+        return config.resolve(key, default)
+    value: typing.Any = config
+    for part in key.split("."):
+        if not isinstance(value, typing.Mapping) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _plain(value):
+    return value.to_dict() if isinstance(value, LayeredConfig) else str(value)
+
+
+def value_digest(value) -> str:
+    return digest(json.dumps(value, sort_keys=True, default=_plain).encode())
+
+
+def _rendered_config(config: typing.Mapping) -> typing.Dict[str, typing.Any]:
+    # what a file that does not declare its inputs is rendered from
+    plain = config.to_dict() if isinstance(config, LayeredConfig) else dict(config)
+    return {key: value for key, value in plain.items() if key not in RUN_FLAGS}
+
+
+class Manifest:
+    """
+    The files generated into a project: for every path the content hash and the hashes of the config values the
+    file was rendered from. Plugins declaring :mod:`composo.steps` also get the inputs and outputs of every step
+    recorded.
+    """
+
+    def __init__(self, files: typing.Optional[typing.Dict[str, typing.Dict[str, typing.Any]]] = None,
+                 steps: typing.Optional[typing.Dict[str, typing.Dict[str, typing.Any]]] = None):
+        self.files = files or {}
+        self.steps = steps or {}
+
+    @classmethod
+    def load(cls, root: Path) -> "Manifest":
+        try:
+            with open(Path(root) / MANIFEST_FILE) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get("format") != MANIFEST_FORMAT:
+            return cls()
+        return cls(data.get("files"), data.get("steps"))
+
+    def dumps(self) -> bytes:
+        data: typing.Dict[str, typing.Any] = {"format": MANIFEST_FORMAT, "files": self.files}
+        if self.steps:
+            data["steps"] = self.steps
+        return json.dumps(data, indent=1, sort_keys=True).encode()
+
+    def save(self, root: Path):
+        path = Path(root) / MANIFEST_FILE
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            f.write(self.dumps())
+        os.replace(tmp_path, path)
+
+
+class DiskSink:
+    """
+    Writes every file to disk as soon as it is produced, the sink of a :class:`FileWriter` without staging.
+    """
+    staging = False
+    # whether written files are below the root of the writer right away, where plugins can run commands on them
+    on_disk = True
+    # whether the files end up below the root once committed, see FileWriter.after_commit
+    commits_to_disk = True
+    # whether written content is held in memory until the commit
+    buffers = False
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def exists(self, relative: str) -> bool:
+        return (self.root / relative).exists()
+
+    def write(self, relative: str, data: bytes, mode: typing.Optional[int] = None):
+        target = self.root / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(target, mode)
+
+    def link(self, relative: str, source: typing.Union[str, Path], mode: typing.Optional[int] = None,
+             hardlink: bool = False):
+        from composo.staging import materialize
+
+        target = self.root / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if hardlink:
+            target.unlink(missing_ok=True)
+        if materialize(source, target, hardlink) != "hardlink" and mode is not None:
+            os.chmod(target, mode)
+
+    def chmod(self, relative: str, mode: int):
+        os.chmod(self.root / relative, mode)
+
+    def mtime(self, relative: str) -> typing.Optional[int]:
+        try:
+            return os.stat(self.root / relative).st_mtime_ns
+        except OSError:
+            return None
+
+    def save_manifest(self, manifest: Manifest):
+        self.root.mkdir(parents=True, exist_ok=True)
+        manifest.save(self.root)
+
+    def staged(self) -> typing.Dict[str, typing.Any]:
+        return {}
+
+    def stage(self, files: typing.Mapping[str, typing.Any]):
+        pass
+
+    def discard(self):
+        pass
+
+    def commit(self):
+        pass
+
+
+class FileWriter:
+    """
+    Writes the files of a project on behalf of a plugin.
+
+    Every written file is recorded in the project manifest together with the config keys it depends on, so a later
+    run only rewrites the files whose inputs changed. Plugins get the writer of the current run by
+    :func:`current_writer`.
+
+    The files go to a sink, directly to disk by default. With a :class:`composo.staging.StagingTree` they are
+    staged in memory and committed at the end of a successful run, or never for a dry run. With a
+    :class:`composo.journal.Journal` the written files and finished steps are journaled as well, so an interrupted
+    run can be resumed.
+
+    Large content is streamed from a :data:`composo.streams.Source` instead of rendered into memory, see
+    :class:`composo.streams.Spool`. The staged content held in memory is capped by `files.max_buffer` bytes of the
+    config, content beyond it is spilled to the spool as well.
+
+    The writer is shared by the threads of a run, e.g. concurrent :mod:`composo.steps`: content is rendered in the
+    calling thread, the bookkeeping, the sink and the journal are updated by one thread at a time.
+
+    :Example:
+
+        writer = current_writer()
+        writer.write("README.md", lambda: render_readme(config), depends_on=["app.name.project", "author"])
+        writer.write("data/train.csv", Path(dataset), depends_on=[])
+        writer.write("data/rows.csv", (f"{row}\n" for row in rows()), depends_on=["rows"])
+    """
+
+    def __init__(self, root: Path, config: typing.Mapping, manifest: typing.Optional[Manifest] = None,
+                 force: bool = False, sink=None, dry_run: bool = False, journal: typing.Optional["Journal"] = None):
+        self.root = Path(root)
+        self.config = config
+        self.manifest = Manifest.load(self.root) if manifest is None else manifest
+        self.force = force
+        self.sink = DiskSink(self.root) if sink is None else sink
+        self.dry_run = dry_run
+        self.journal = journal
+        self.written: typing.List[str] = []
+        self.skipped: typing.List[str] = []
+        self.bytes_written = 0
+        self._had_manifest = bool(self.manifest.files or self.manifest.steps)
+        self._seen: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._steps: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        self._digests: typing.Dict[str, str] = {}
+        self._spool: typing.Optional[streams.Spool] = None
+        self._lock = threading.RLock()
+        self._after_commit: typing.List[typing.Callable[[], typing.Any]] = []
+
+    def _relative(self, path: typing.Union[str, Path]) -> str:
+        path = Path(path)
+        if path.is_absolute():
+            path = path.relative_to(self.root)
+        return path.as_posix()
+
+    def inputs(self, depends_on: typing.Optional[typing.Iterable[str]] = None) -> typing.Dict[str, str]:
+        keys = [WHOLE_CONFIG] if depends_on is None else depends_on
+        inputs = {}
+        with self._lock:
+            for key in keys:
+                if key not in self._digests:
+                    value = _rendered_config(self.config) if key == WHOLE_CONFIG else lookup(self.config, key)
+                    self._digests[key] = value_digest(value)
+                inputs[key] = self._digests[key]
+        return inputs
+
+    @property
+    def spool(self) -> streams.Spool:
+        """
+        The spool of the run, in the journal if there is one so that a resumed run finds the spooled files.
+        """
+        with self._lock:
+            if self._spool is None:
+                directory = (self.journal.path / "spool" if self.journal is not None
+                             else self.root.with_name(f".{self.root.name}.composo-spool-{os.getpid()}"))
+                self._spool = streams.Spool(directory, int(lookup(self.config, "files.max_buffer",
+                                                                  streams.DEFAULT_MAX_BUFFER)))
+            return self._spool
+
+    def _put(self, relative: str, spooled: streams.Spooled, mode: typing.Optional[int]) -> streams.Spooled:
+        # into the sink, content beyond the cap of a buffering sink waits in the spool until the commit
+        if spooled.data is not None and self.sink.buffers and not self.spool.reserve(spooled.size):
+            spooled = self.spool.spill(spooled.data, spooled.hash)
+        if spooled.data is not None:
+            self.sink.write(relative, spooled.data, mode)
+            return spooled
+        if spooled.owned and mode is not None:
+            os.chmod(spooled.path, mode)  # type: ignore[arg-type]
+        self.sink.link(relative, spooled.path, mode, hardlink=spooled.owned)
+        return spooled
+
+    def _is_current(self, entry, field: str, value, relative: str) -> bool:
+        if self.force or entry is None or entry.get(field) != value:
+            return False
+        return self.sink.exists(relative)
+
+    def write(self, path: typing.Union[str, Path], content: typing.Union[Content, typing.Callable[[], Content]],
+              depends_on: typing.Optional[typing.Iterable[str]] = None, mode: typing.Optional[int] = None) -> bool:
+        """
+        Write a file unless it is up to date.
+
+        :param path: the path of the file, relative to the project root
+        :param content: the content of the file or a callable rendering it, which is only called if the file is
+            outdated. Large content is better given as a :data:`composo.streams.Source`: an iterator or generator
+            of chunks, a file object or the path of a file, so that it is never held in memory as a whole
+        :param depends_on: the dotted config keys the content is rendered from, the whole config if not given
+        :param mode: the permission bits of the file, e.g. `0o755` for a script
+        :return: whether the file has been written
+        """
+        relative = self._relative(path)
+        inputs = self.inputs(depends_on)
+        entry = self.manifest.files.get(relative)
+        with self._lock:
+            if self._is_current(entry, "inputs", inputs, relative):
+                self._seen[relative] = entry
+                self.skipped.append(relative)
+                return False
+
+        # rendered outside of the lock, concurrent steps render concurrently
+        resumed = self.journal.verified(relative, inputs) if self.journal is not None else None
+        if resumed is not None:
+            spooled = resumed.spooled  # rendered by the interrupted run
+        else:
+            data = content() if callable(content) else content
+            if streams.is_source(data):
+                spooled = self.spool.spool(data)  # type: ignore[arg-type]
+            else:
+                data = data.encode() if isinstance(data, str) else data
+                spooled = streams.Spooled(digest(data), len(data), data)  # type: ignore[arg-type]
+        content_hash = spooled.hash
+        with self._lock:
+            written = self._seen.get(relative)
+            self._seen[relative] = {"hash": content_hash, "inputs": inputs}
+            if written is not None and written["hash"] == content_hash and relative in self.written:
+                return False  # e.g. by new and then by init of the same run
+            if self._is_current(entry, "hash", content_hash, relative):
+                self.skipped.append(relative)
+                return False
+
+            spooled = self._put(relative, spooled, mode)
+            self.written.append(relative)
+            self.bytes_written += spooled.size
+            if self.journal is not None and resumed is None:
+                self.journal.file(relative, inputs, spooled.data, mode, content_hash, spooled.path, spooled.owned)
+            return True
+
+    def after_commit(self, hook: typing.Callable[[], typing.Any]):
+        """
+        Run the hook once the files of the run are committed below the root, e.g. a command like `git init` or a
+        formatter that needs the files on disk. Hooks run in the order they were added and only if the run
+        succeeded, neither for a dry run nor for a sink whose files never reach the disk, like an archive.
+
+        Hooks are kept by the writer of the process they were added in, steps adding hooks run in threads.
+        """
+        with self._lock:
+            self._after_commit.append(hook)
+
+    def chmod(self, path: typing.Union[str, Path], mode: int):
+        """
+        Change the permission bits of a file of the project.
+        """
+        self.sink.chmod(self._relative(path), mode)
+
+    def outputs_state(self, outputs: typing.Iterable[str]) -> typing.Optional[typing.Dict[str, int]]:
+        """
+        The modification times of the given paths once written, or None if any of them does not exist.
+        """
+        state = {}
+        for output in outputs:
+            mtime = self.sink.mtime(output)
+            if mtime is None:
+                return None
+            state[output] = mtime
+        return state
+
+    def step(self, name: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        The record of a step as of the previous run, see :meth:`record_step`.
+        """
+        return self.manifest.steps.get(name)
+
+    def record_step(self, name: str, inputs: typing.Dict[str, str], outputs: typing.Iterable[str]):
+        """
+        Record the inputs and outputs of a step that ran or was up to date in this run. The state of the outputs is
+        taken when the manifest is saved, i.e. once the files are on disk.
+        """
+        with self._lock:
+            self._steps[name] = {"inputs": inputs, "outputs": list(outputs)}
+            if self.journal is not None:
+                self.journal.step(name, inputs)
+
+    def resumed_step(self, name: str, inputs: typing.Dict[str, str], outputs: typing.Iterable[str]) -> bool:
+        """
+        Whether the interrupted run finished the step with the same inputs, its journaled files are then taken over
+        and it is done once all its outputs exist.
+        """
+        if self.journal is None or self.journal.steps.get(name) != inputs:
+            return False
+        outputs = list(outputs)
+        for relative in list(self.journal.files):
+            if any(relative == output or relative.startswith(f"{output}/") for output in outputs):
+                journaled = self.journal.verified(relative)
+                if journaled is not None:
+                    with self._lock:
+                        self._put(relative, journaled.spooled, journaled.mode)
+                        self._seen[relative] = {"hash": journaled.hash, "inputs": journaled.inputs}
+                        if relative not in self.written:
+                            self.written.append(relative)
+                            self.bytes_written += journaled.size
+        return all(self.sink.exists(output) for output in outputs)
+
+    @property
+    def changes(self) -> typing.Tuple[typing.Dict[str, typing.Dict[str, typing.Any]], typing.List[str],
+                                      typing.List[str], typing.Dict[str, typing.Any]]:
+        """
+        The manifest entries, written paths, skipped paths and staged files of this run, see :meth:`merge`.
+        """
+        with self._lock:
+            return dict(self._seen), list(self.written), list(self.skipped), self.sink.staged()
+
+    def merge(self, seen: typing.Dict[str, typing.Dict[str, typing.Any]], written: typing.Iterable[str],
+              skipped: typing.Iterable[str], staged: typing.Mapping[str, typing.Any]):
+        """
+        Take over the files a copy of this writer wrote in another process.
+        """
+        with self._lock:
+            self._seen.update(seen)
+            for path in written:
+                if path not in self.written:
+                    self.written.append(path)
+                    self.bytes_written += len(getattr(staged.get(path), "data", None) or b"")
+            self.skipped.extend(path for path in skipped if path not in self.skipped)
+            self.sink.stage(staged)
+
+    def save(self, complete: bool = True):
+        """
+        Store the manifest of the files written so far.
+
+        :param complete: whether the plugin finished, only then entries of files no longer written are dropped
+        """
+        if not self._seen and not self._steps and not self._had_manifest:
+            return
+        files = self._seen if complete else {**self.manifest.files, **self._seen}
+        steps = {name: {**record, "outputs": self.outputs_state(record["outputs"])}
+                 for name, record in self._steps.items()}
+        if not complete:
+            steps = {**self.manifest.steps, **steps}
+        self.manifest = Manifest(dict(files), dict(steps))
+        self.sink.save_manifest(self.manifest)
+
+    @contextlib.contextmanager
+    def activate(self):
+        """
+        Make this the writer of the current run, then store the manifest and commit the staged files afterwards.
+
+        Staged files of a failed run are discarded, a dry run neither commits nor stores anything. The journal of the
+        run is removed once the files are committed or the plugin failed, and kept for a resume of an interrupted
+        run, e.g. by Ctrl-C, or a killed one. So is the spool, which is part of the journal.
+        """
+        token = _current_writer.set(self)
+        complete = False
+        interrupted = False
+        try:
+            yield self
+            complete = True
+        except Exception:
+            raise
+        except BaseException:
+            interrupted = True
+            raise
+        finally:
+            _current_writer.reset(token)
+            if self.dry_run or not complete:
+                self.sink.discard()
+            if self.dry_run:
+                pass
+            elif complete:
+                self.save()
+                if self.journal is not None:  # the replaced files are kept first, the commit can be undone
+                    self.journal.commit(relative for relative, staged in self.sink.staged().items()
+                                        if getattr(staged, "has_content", True))
+                self.sink.commit()
+                if self.journal is not None:
+                    self.journal.finish()
+                if self.sink.commits_to_disk:
+                    for hook in self._after_commit:
+                        hook()
+            elif not self.sink.staging:  # the files written so far are on disk
+                self.save(complete=False)
+            if self.journal is not None and not complete and not interrupted:
+                if self.sink.staging and not self.journal.committing:
+                    self.journal.finish()  # nothing changed on disk
+            if self.journal is None and self._spool is not None:
+                self._spool.remove()
+
+
+_current_writer: "contextvars.ContextVar[FileWriter]" = contextvars.ContextVar("composo_file_writer")
+
+
+def current_writer() -> FileWriter:
+    """
+    The writer of the project composo is currently generating.
+    """
+    try:
+        return _current_writer.get()
+    except LookupError:
+        raise RuntimeError("no project is being generated, the file writer is only available to plugins") from None
@@ -0,0 +1,151 @@
+import contextlib
+import os
+import sys
+import typing
+
+# A cached `--help` is printed before typer, rich or click are imported, so only light modules are imported up here.
+
+CACHE_FILE_NAME = "help.json"
+CACHE_FORMAT = 1
+# the environment rich decides the width and the colors of its output by
+TERMINAL_ENV = ("COLUMNS", "TERMINAL_WIDTH", "TERM", "COLORTERM", "NO_COLOR", "FORCE_COLOR", "PY_COLORS",
+                "GITHUB_ACTIONS", "_TYPER_FORCE_DISABLE_TERMINAL")
+
+
+def cache_file() -> str:
+    """
+    The location of the help cache, the default cache dir of composo, which is found without loading the config.
+    """
+    from appdirs import user_cache_dir
+
+    return os.path.join(user_cache_dir("composo"), CACHE_FILE_NAME)
+
+
+def terminal(environ: typing.Mapping[str, str], stream: typing.TextIO) -> str:
+    """
+    The width and color mode the help is rendered for, as part of the cache key.
+    """
+    try:
+        tty = stream.isatty()
+        columns = os.get_terminal_size(stream.fileno()).columns if tty else None
+    except (AttributeError, ValueError, OSError):
+        tty, columns = False, None
+    return "|".join([str(tty), str(columns)] + [environ.get(name, "") for name in TERMINAL_ENV])
+
+
+def _key(args: typing.Sequence[str], environ: typing.Mapping[str, str], stream: typing.TextIO) -> str:
+    return " ".join(args) + "\n" + terminal(environ, stream)
+
+
+def _load(path: str) -> typing.Dict[str, typing.Any]:
+    import json
+    from composo.completion import fingerprint
+
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("format") != CACHE_FORMAT or data.get("fingerprint") != fingerprint():
+        return {}
+    return data.get("pages", {})
+
+
+def cacheable(args: typing.Sequence[str]) -> bool:
+    """
+    Whether the command line only asks for help, `composo --help` or `composo COMMAND --help`.
+    """
+    if list(args) == ["--help"]:
+        return True
+    return len(args) == 2 and args[1] == "--help" and not args[0].startswith("-")
+
+
+def lookup(args: typing.Sequence[str], environ: typing.Mapping[str, str] = os.environ,
+           out: typing.Optional[typing.TextIO] = None, path: typing.Optional[str] = None) -> bool:
+    """
+    Print the cached help of the command line, if it is cached for this terminal and these installed versions.
+
+    :param args: the command line arguments without the program name
+    :param environ: the environment of the terminal
+    :param out: where the help is printed to, stdout by default
+    :param path: the location of the cache, see :func:`cache_file`
+    :return: whether the help has been printed
+    """
+    if not cacheable(args):
+        return False
+    out = sys.stdout if out is None else out
+    page = _load(cache_file() if path is None else path).get(_key(args, environ, out))
+    if page is None:
+        return False
+    out.write(page)
+    out.flush()
+    return True
+
+
+def store(args: typing.Sequence[str], page: str, environ: typing.Mapping[str, str] = os.environ,
+          stream: typing.Optional[typing.TextIO] = None, path: typing.Optional[str] = None):
+    """
+    Cache the help of the command line as rendered for the terminal of the stream.
+
+    The pages are invalidated with the completion index, whenever a distribution is installed or removed, see
+    :func:`composo.completion.fingerprint`.
+    """
+    import json
+    from composo.completion import fingerprint
+
+    path = cache_file() if path is None else path
+    pages = _load(path)
+    pages[_key(args, environ, sys.stdout if stream is None else stream)] = page
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump({"format": CACHE_FORMAT, "fingerprint": fingerprint(), "pages": pages}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # an uncached help is only rendered again
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+class _Tee:
+    """
+    Passes the output through to the stream and keeps a copy, rich still sees the terminal of the stream.
+    """
+
+    def __init__(self, stream: typing.TextIO):
+        self.stream = stream
+        self.parts: typing.List[str] = []
+
+    def write(self, text: str) -> int:
+        # click probes for a binary stream by writing bytes, which the text stream rejects before they are kept
+        written = self.stream.write(text)
+        self.parts.append(text)
+        return written
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def recording(args: typing.Sequence[str], path: typing.Optional[str] = None):
+    """
+    Cache the help the cli prints for the command line within the context, if it exits successfully.
+    """
+    stream = sys.stdout
+    tee = _Tee(stream)
+    sys.stdout = tee  # type: ignore[assignment]
+    code: typing.Any = 0
+    try:
+        yield
+    except SystemExit as exc:
+        code = exc.code
+        raise
+    except BaseException:
+        code = 1
+        raise
+    finally:
+        sys.stdout = stream
+        if code in (0, None) and tee.parts:
+            store(args, "".join(tee.parts), stream=stream, path=path)
@@ -0,0 +1,287 @@
+import contextlib
+import json
+import os
+import time
+import typing
+from pathlib import Path
+
+# Every cli run appends a record here, so only light modules are imported up here.
+
+HISTORY_FILE_NAME = "history.jsonl"
+DEFAULT_MAX_BYTES = 1 << 20
+DEFAULT_BACKUPS = 3
+PERCENTILES = (50, 95, 99)
+# a plugin version is a regression once its median run takes this many times longer than that of the version before
+DEFAULT_THRESHOLD = 1.25
+DEFAULT_MIN_RUNS = 3
+# commands not recorded, the daemon runs until it is stopped
+UNRECORDED_COMMANDS = ("daemon", "stats")
+
+
+class LatencyStats(typing.NamedTuple):
+    group: str
+    runs: int
+    failures: int
+    p50: float
+    p95: float
+    p99: float
+
+
+class Regression(typing.NamedTuple):
+    plugin: str
+    command: str
+    previous_version: str
+    version: str
+    previous_p50: float
+    p50: float
+
+    @property
+    def ratio(self) -> float:
+        return self.p50 / self.previous_p50 if self.previous_p50 else float("inf")
+
+
+class RunHistory:
+    """
+    Log of the runs of composo under the `cache_dir`, one JSON record per line, from which `composo stats` reports
+    the latencies of the commands and plugins.
+
+    A record holds the command, the plugin and its installed version, the total duration and that of every traced
+    phase, the number of files and bytes written and the exit code. Once the log exceeds `max_bytes` it is rotated
+    to `history.jsonl.1` and so on, keeping `backups` older logs.
+
+    :Example:
+
+        history:
+          enabled: true
+          max_bytes: 1048576
+          backups: 3
+    """
+
+    def __init__(self, path: typing.Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES,
+                 backups: int = DEFAULT_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    @classmethod
+    def from_config(cls, config) -> typing.Optional["RunHistory"]:
+        cache_dir = config.resolve("cache_dir")
+        if not cache_dir or not config.resolve("history.enabled", True):
+            return None
+        return cls(Path(cache_dir) / HISTORY_FILE_NAME,
+                   max_bytes=int(config.resolve("history.max_bytes", DEFAULT_MAX_BYTES)),
+                   backups=int(config.resolve("history.backups", DEFAULT_BACKUPS)))
+
+    def _rotated(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}")
+
+    def append(self, record: typing.Mapping[str, typing.Any]):
+        """
+        Append a record to the log, rotating it first if it would grow beyond `max_bytes`.
+        """
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(line) > self.max_bytes:
+            self._rotate()
+        # a single write of an appended line does not interleave with those of concurrent runs
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _rotate(self):
+        if self.backups < 1:
+            self.path.unlink(missing_ok=True)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(self._rotated(index), self._rotated(index + 1))
+        with contextlib.suppress(FileNotFoundError):  # rotated by a concurrent run already
+            os.replace(self.path, self._rotated(1))
+
+    def records(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        The recorded runs, the oldest first. Lines that cannot be parsed, e.g. of an interrupted write, are skipped.
+        """
+        records = []
+        for path in [self._rotated(index) for index in range(self.backups, 0, -1)] + [self.path]:
+            try:
+                with open(path, "rb") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "duration" in record:
+                    records.append(record)
+        return records
+
+
+def percentile(values: typing.Sequence[float], q: float) -> float:
+    """
+    The q-th percentile of the values, linearly interpolated between the closest ranks.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def latencies(records: typing.Iterable[typing.Mapping[str, typing.Any]],
+              group: typing.Callable[[typing.Mapping[str, typing.Any]], typing.Optional[str]]
+              ) -> typing.List[LatencyStats]:
+    """
+    The percentiles of the run durations, grouped by e.g. the command or the plugin of the records.
+
+    :param group: the group of a record, records of the group None are left out
+    """
+    groups: typing.Dict[str, typing.List[typing.Mapping[str, typing.Any]]] = {}
+    for record in records:
+        name = group(record)
+        if name is not None:
+            groups.setdefault(name, []).append(record)
+    stats = []
+    for name, members in sorted(groups.items()):
+        durations = [record["duration"] for record in members]
+        p50, p95, p99 = (percentile(durations, q) for q in PERCENTILES)
+        stats.append(LatencyStats(name, len(members), sum(1 for record in members if record.get("exit_code")),
+                                  p50, p95, p99))
+    return stats
+
+
+def regressions(records: typing.Iterable[typing.Mapping[str, typing.Any]], threshold: float = DEFAULT_THRESHOLD,
+                min_runs: int = DEFAULT_MIN_RUNS) -> typing.List[Regression]:
+    """
+    The commands whose successful runs became slower with the latest upgrade of their plugin.
+
+    The median duration of the runs with the latest version of a plugin is compared to that of the version before,
+    both need `min_runs` runs.
+    """
+    durations: typing.Dict[typing.Tuple[str, str], typing.Dict[str, typing.List[float]]] = {}
+    for record in records:
+        if record.get("exit_code") or not record.get("plugin") or record.get("plugin_version") is None:
+            continue
+        versions = durations.setdefault((record["plugin"], record["command"]), {})
+        # by the order the versions were last used in, a downgrade is compared as any other change
+        runs = versions.pop(record["plugin_version"], [])
+        runs.append(record["duration"])
+        versions[record["plugin_version"]] = runs
+    found = []
+    for (plugin, command), versions in sorted(durations.items()):
+        if len(versions) < 2:
+            continue
+        (previous_version, previous), (version, latest) = list(versions.items())[-2:]
+        if len(previous) < min_runs or len(latest) < min_runs:
+            continue
+        regression = Regression(plugin, command, previous_version, version, percentile(previous, 50),
+                                percentile(latest, 50))
+        if regression.ratio >= threshold:
+            found.append(regression)
+    return found
+
+
+class Run:
+    """
+    The record of the current run, which the commands complete by :func:`note`.
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+        self.plugin: typing.Optional[str] = None
+        self.plugin_version: typing.Optional[str] = None
+        self.files = 0
+        self.bytes = 0
+        self.time = time.time()
+        self.start = time.perf_counter()
+
+    def record(self, exit_code: int, phases: typing.Mapping[str, float]) -> typing.Dict[str, typing.Any]:
+        return {"time": round(self.time, 3), "command": self.command, "plugin": self.plugin,
+                "plugin_version": self.plugin_version, "exit_code": exit_code,
+                "duration": round(time.perf_counter() - self.start, 6),
+                "phases": {name: round(duration, 6) for name, duration in phases.items()},
+                "files": self.files, "bytes": self.bytes}
+
+
+_run: typing.Optional[Run] = None
+
+
+def note(plugin: typing.Optional[str] = None, plugin_version: typing.Optional[str] = None, files: int = 0,
+         size: int = 0):
+    """
+    Add the plugin and the written files of a project to the record of the current run, if it is recorded.
+    """
+    if _run is None:
+        return
+    if plugin is not None:
+        _run.plugin, _run.plugin_version = plugin, plugin_version
+    _run.files += files
+    _run.bytes += size
+
+
+def _exit_code(code: typing.Any) -> int:
+    # as the interpreter exits for SystemExit(code)
+    if code is None:
+        return 0
+    return code if isinstance(code, int) else 1
+
+
+@contextlib.contextmanager
+def recording(command: str, history: typing.Callable[[], typing.Optional[RunHistory]]):
+    """
+    Record the run of a command within the context, with its phases as traced by :mod:`composo.tracing`.
+
+    :param command: the name of the command
+    :param history: the log the record is appended to, called once the command ran, i.e. once the config is loaded
+    """
+    from composo import tracing
+
+    global _run
+    tracer = tracing.enable(profile=False)
+    first_span = len(tracer.spans)
+    _run = run = Run(command)
+    code = 0
+    try:
+        yield run
+    except SystemExit as exc:
+        code = _exit_code(exc.code)
+        raise
+    except BaseException:
+        code = 1
+        raise
+    finally:
+        _run = None
+        phases: typing.Dict[str, float] = {}
+        for span in tracer.spans[first_span:]:
+            phases[span.name] = phases.get(span.name, 0.0) + span.duration
+        try:
+            log = history()
+            if log is not None:
+                log.append(run.record(code, phases))
+        except Exception:
+            pass  # the history is never worth failing a run
+
+
+def recording_args(args: typing.Sequence[str], history: typing.Callable[[], typing.Optional[RunHistory]]
+                   ) -> typing.ContextManager:
+    """
+    Record the run of a command line like :func:`recording`, unless it only asks for help.
+
+    :param args: the command line arguments without the program name
+    """
+    from composo.main import HELP_OPTIONS, split_args
+
+    _, command = split_args(args)
+    if command is None or command in UNRECORDED_COMMANDS or any(arg in HELP_OPTIONS for arg in args):
+        return contextlib.nullcontext()
+    return recording(command, history)
@@ -1,19 +1,63 @@
 import os
-from importlib.metadata import entry_points
 
 import dependency_injector.providers as providers
 import dependency_injector.containers as containers
 import typer
+from appdirs import user_cache_dir
 
+from composo import history, processes, tracing
 from composo.app import Composo
+from composo.config import ConfigCache, LayeredConfig
+from composo.files import current_writer
+from composo.plugins import PLUGIN_GROUP, PluginIndex, discover_plugins, scan_plugins
+from composo.schema import SchemaRegistry, scan_schemas
+from composo.skeletons import SkeletonCache
+from composo.shell import schema as shell_schema
 from composo.shell.plugin import Shell
 
 
 class Plugins(containers.DeclarativeContainer):
-    discovered_plugins = providers.Callable(lambda name: {ep.name: ep for ep in entry_points().get(name, [])},
-                                            'composo.plugins')
+    discovered_plugins = providers.Callable(discover_plugins, PLUGIN_GROUP)
 
-    shell = providers.Factory(Shell)
+    shell = providers.Factory(Shell, runner=providers.Callable(processes.get_runner))
+
+
+def _templates():
+    from composo import templates
+
+    return templates.get_engine()
+
+
+def _environments(config):
+    from composo import envs
+
+    return envs.EnvironmentPool.from_config(config)
+
+
+def _remote(config):
+    from composo import remote
+
+    return remote.RemoteSource.from_config(config)
+
+
+class Services(containers.DeclarativeContainer):
+    """
+    The services composo offers to plugins while a project is generated.
+    """
+    files = providers.Callable(current_writer)
+
+    tracer = providers.Callable(tracing.get_tracer)
+
+    # the modules of the services are imported by the plugins using them
+    templates = providers.Callable(_templates)
+
+    processes = providers.Callable(processes.get_runner)
+
+    # called with the config of the plugin, None without a cache_dir
+    environments = providers.Callable(_environments)
+
+    # called with the config of the plugin
+    remote = providers.Callable(_remote)
 
 
 DEFAULT_CONFIG = {
@@ -28,21 +72,48 @@ DEFAULT_CONFIG = {
             }
         }
     },
-    "license": "mit"
+    "license": "mit",
+    "cache_dir": user_cache_dir("composo"),
 }
 
 
 class App(containers.DeclarativeContainer):
 
+    # the user config.yaml, loaded by composo.main
     config = providers.Configuration("config")
-    config.override(DEFAULT_CONFIG)
+
+    layered_config = providers.Callable(lambda user: LayeredConfig([("defaults", DEFAULT_CONFIG), ("user", user)]),
+                                        config)
 
     typer_app = providers.Factory(typer.Typer,
                                   rich_markup_mode="rich")
 
+    plugin_index = providers.Singleton(PluginIndex,
+                                       cache_dir=layered_config.provided.resolve.call("cache_dir"),
+                                       group=PLUGIN_GROUP,
+                                       scan=scan_plugins)
+
+    plugins = providers.Callable(lambda index: index.plugins(), plugin_index)
+
+    schemas = providers.Singleton(SchemaRegistry,
+                                  cache_dir=layered_config.provided.resolve.call("cache_dir"),
+                                  schemas={"shell": shell_schema.SCHEMA},
+                                  scan=scan_schemas)
+
+    config_cache = providers.Singleton(ConfigCache)
+
+    skeleton_cache = providers.Singleton(SkeletonCache.from_config, layered_config)
+
+    run_history = providers.Singleton(history.RunHistory.from_config, layered_config)
+
     app = providers.Factory(Composo,
-                            plugins=Plugins.discovered_plugins,
-                            config=config,
+                            plugins=plugins,
+                            plugin_index=plugin_index,
+                            config_cache=config_cache,
+                            skeleton_cache=skeleton_cache,
+                            run_history=run_history,
+                            schemas=schemas,
+                            config=layered_config,
                             fopen=open,
                             getcwd=os.getcwd,
                             app=typer_app)
@@ -0,0 +1,261 @@
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+from pathlib import Path
+
+from composo import streams
+from composo.files import digest
+
+JOURNAL_DIR = ".composo.journal"
+JOURNAL_FILE = "journal"
+JOURNAL_FORMAT = 1
+
+
+class JournalError(Exception):
+    """
+    A project holds the journal of an interrupted run, which has to be resumed or rolled back first.
+    """
+
+
+class JournaledFile(typing.NamedTuple):
+    inputs: typing.Dict[str, str]
+    hash: str
+    mode: typing.Optional[int]
+    # the content, or None for content kept in the file at source instead, or not kept at all
+    data: typing.Optional[bytes]
+    source: typing.Optional[str] = None
+    hardlink: bool = False
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else os.path.getsize(self.source)  # type: ignore[arg-type]
+
+    @property
+    def spooled(self) -> streams.Spooled:
+        return streams.Spooled(self.hash, self.size, self.data, self.source, self.hardlink)
+
+
+class Journal:
+    """
+    Write-ahead journal of a run of composo in the project directory, from which an interrupted run is resumed or
+    rolled back. The journal of a project that does not exist yet is kept next to its directory.
+
+    The writer of the run appends a record for every step that finished and for every file it wrote, each by a
+    single append to one file. A file is recorded by its hash and, if its content is in a file already, the path of
+    that file, e.g. of the spool, see :attr:`composo.files.FileWriter.spool`; content staged in memory is not
+    copied into the journal unless `content` is set, a resumed run renders it again instead. Before the staged
+    files are committed, the files they replace are hardlinked into the journal, so a commit that was cut short can
+    be undone. The journal is removed once the run committed. Every record is written as soon as the work is done,
+    so the journal survives a killed process, e.g. by a CI timeout or the OOM killer, though not a crash of the host.
+
+    A resumed run takes over the files whose kept content still matches the hash recorded and skips the steps
+    whose inputs are unchanged and whose outputs exist, see :meth:`composo.files.FileWriter.resumed_step`.
+
+    :Example:
+
+        $ composo init --resume
+        $ composo init --rollback
+
+        journal_content: true  # keep the content of every file, a resume renders nothing twice
+    """
+
+    def __init__(self, root: Path, content: bool = False):
+        """
+        :param root: the project directory
+        :param content: whether the content staged in memory is appended to the journal as well
+        """
+        self.root = Path(root)
+        self.content = content
+        # a new project is committed by renaming its directory into place, its journal is kept next to it meanwhile
+        sibling = self.root.with_name(f".{self.root.name}{JOURNAL_DIR}")
+        self.path = self.root / JOURNAL_DIR if self.root.is_dir() and not sibling.exists() else sibling
+        self.files: typing.Dict[str, JournaledFile] = {}
+        self.steps: typing.Dict[str, typing.Dict[str, str]] = {}
+        self.committing: typing.List[str] = []
+        self.created = False
+        self._fd: typing.Optional[int] = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return (self.path / JOURNAL_FILE).exists()
+
+    def _backup(self, relative: str) -> Path:
+        return self.path / "backup" / relative
+
+    def _append(self, record: typing.Dict[str, typing.Any], data: bytes = b""):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode() + data
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path / JOURNAL_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # one write per record, records of forked steps do not interleave
+            os.write(self._fd, line)
+
+    def begin(self, command: str, resume: bool = False):
+        """
+        Start the journal of a run, or continue that of the interrupted run if resuming.
+
+        The journal of an interrupted run that did not get to commit is dropped unless resuming, the project is as
+        it was before that run.
+
+        :raises JournalError: if an interrupted run was cut short while committing and the run does not resume
+        """
+        if self.exists():
+            self.load()
+            if not resume and self.committing:
+                raise JournalError(f"a run was interrupted while committing to {self.root}, resume it with "
+                                   f"--resume or undo it with --rollback")
+            if not resume:
+                self.files, self.steps = {}, {}
+                shutil.rmtree(self.path, ignore_errors=True)
+        else:
+            self.created = not self.root.exists()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._append({"op": "begin", "format": JOURNAL_FORMAT, "command": command, "created": self.created,
+                      "time": time.time(), "pid": os.getpid()})
+
+    def load(self):
+        """
+        Read the records of the journal, up to a record that a run was killed while writing.
+        """
+        with open(self.path / JOURNAL_FILE, "rb") as f:
+            journal = f.read()
+        begun = False
+        position = 0
+        while position < len(journal):
+            end = journal.find(b"\n", position)
+            if end < 0:
+                break
+            try:
+                record = json.loads(journal[position:end])
+            except ValueError:
+                break
+            position = end + 1
+            op = record.get("op")
+            if op == "begin" and not begun:
+                # the first run decides whether a rollback removes the directory
+                self.created, begun = record.get("created", False), True
+            elif op == "file":
+                data = journal[position:position + record["size"]]
+                position += record["size"]
+                if len(data) < record["size"]:
+                    break
+                self.files[record["path"]] = JournaledFile(record["inputs"], record["hash"], record.get("mode"),
+                                                           None if "source" in record else data, record.get("source"),
+                                                           record.get("hardlink", False))
+            elif op == "step":
+                self.steps[record["name"]] = record["inputs"]
+            elif op == "commit":
+                self.committing = sorted(set(self.committing).union(record["paths"]))
+
+    def verified(self, relative: str, inputs: typing.Optional[typing.Dict[str, str]] = None
+                 ) -> typing.Optional[JournaledFile]:
+        """
+        A file the interrupted run wrote, if it was rendered from the same inputs and its kept content still matches
+        the hash recorded.
+        """
+        journaled = self.files.get(relative)
+        if journaled is None or (inputs is not None and journaled.inputs != inputs):
+            return None
+        if journaled.data is None and journaled.source is None:
+            return None  # its content was not kept
+        if journaled.data is not None:
+            return journaled if digest(journaled.data) == journaled.hash else None
+        try:
+            return journaled if streams.file_digest(journaled.source) == journaled.hash else None  # type: ignore
+        except OSError:
+            return None
+
+    def file(self, relative: str, inputs: typing.Dict[str, str], data: typing.Optional[bytes],
+             mode: typing.Optional[int] = None, content_hash: typing.Optional[str] = None,
+             source: typing.Optional[str] = None, hardlink: bool = False):
+        """
+        Record a file written by the run with the file its content is kept in, or with its content if the journal
+        keeps the content.
+        """
+        kept = data if source is None and self.content else None
+        record = {"op": "file", "path": relative, "inputs": inputs,
+                  "hash": digest(data) if content_hash is None else content_hash,  # type: ignore[arg-type]
+                  "mode": mode, "size": 0 if kept is None else len(kept)}
+        if kept is None:
+            record.update(source=source, hardlink=hardlink)
+        self._append(record, kept or b"")
+
+    def step(self, name: str, inputs: typing.Dict[str, str]):
+        """
+        Record a step whose work is done.
+        """
+        self._append({"op": "step", "name": name, "inputs": inputs})
+
+    def commit(self, paths: typing.Iterable[str]):
+        """
+        Record the files about to be committed, after keeping those they replace.
+        """
+        paths = sorted(paths)
+        interrupted = set(self.committing)
+        for relative in paths:
+            backup = self._backup(relative)
+            if relative in interrupted or not (self.root / relative).is_file():
+                continue  # kept by the interrupted commit already, or a new file
+            backup.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(self.root / relative, backup)
+            except OSError:
+                shutil.copy2(self.root / relative, backup)
+        self.committing = sorted(interrupted.union(paths))
+        self._append({"op": "commit", "paths": paths})
+        os.fsync(self._fd)  # type: ignore[arg-type]
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def finish(self):
+        """
+        Remove the journal of a run that committed.
+        """
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def rollback(self) -> bool:
+        """
+        Undo the interrupted run: the files its commit replaced are restored, the files it created and its
+        temporary files are removed, and so is the project directory if the run created it.
+
+        :return: whether there was a run to undo
+        """
+        if not self.exists():
+            return False
+        self.load()
+        self.close()
+        for relative in self.committing:
+            path = self.root / relative
+            for tmp_path in path.parent.glob(f".{path.name}.composo-*"):
+                tmp_path.unlink(missing_ok=True)
+            backup = self._backup(relative)
+            if backup.exists():
+                os.replace(backup, path)
+            else:
+                path.unlink(missing_ok=True)
+                self._remove_empty(path.parent)
+        shutil.rmtree(self.path, ignore_errors=True)
+        if self.created:
+            for build in self.root.parent.glob(f".{self.root.name}.composo-*"):
+                shutil.rmtree(build, ignore_errors=True)  # the directory of a new project, before its rename
+            with contextlib.suppress(OSError):
+                self.root.rmdir()
+        return True
+
+    def _remove_empty(self, directory: Path):
+        # the directories the run created, up to the project directory
+        while directory != self.root and self.root in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                return
+            directory = directory.parent
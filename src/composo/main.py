@@ -1,21 +1,199 @@
-from pathlib import Path
+import os
+import sys
+import typing
 
-from typer.testing import CliRunner
+from composo.completion import COMPLETION_ENV
 
-from composo import ioc
-from appdirs import user_config_dir
+# Heavy modules (typer, rich, click, yaml, dependency_injector) are imported lazily inside the functions below so
+# that `composo --version`, `composo --help` and shell completion stay cheap to start.
 
-from composo.app import Composo
+VERSION_OPTIONS = ("--version", "-v")
+HELP_OPTIONS = ("--help",)
+PROFILE_OPTION = "--profile"
+TRACE_FILE_OPTION = "--trace-file"
+# root options that take a value
+VALUE_OPTIONS = (TRACE_FILE_OPTION,)
+PLUGIN_COMMANDS = ("new", "new-batch", "init", "daemon")
+ARCHIVE_OPTION = "--output-archive"
+
+
+def split_args(args: typing.Sequence[str]) -> typing.Tuple[typing.List[str], typing.Optional[str]]:
+    """
+    Split the command line into the options given before the subcommand and the subcommand itself.
+    """
+    options = []
+    takes_value = False
+    for arg in args:
+        if takes_value:
+            takes_value = False
+        elif not arg.startswith("-"):
+            return options, arg
+        else:
+            takes_value = arg in VALUE_OPTIONS
+        options.append(arg)
+    return options, None
+
+
+def needs_plugins(args: typing.Sequence[str]) -> bool:
+    """
+    Whether the given command line needs the installed plugins to be discovered.
+
+    Only the root help and the version flag can do without them. Completion that gets here writes the completion
+    index, which lists the plugins.
+    """
+    if os.environ.get(COMPLETION_ENV):
+        return True
+    options, command = split_args(args)
+    if command is None:
+        return False
+    if command != "new" and any(arg in HELP_OPTIONS for arg in args):
+        return False
+    return command in PLUGIN_COMMANDS
+
+
+def needs_config(args: typing.Sequence[str]) -> bool:
+    """
+    Whether the given command line needs the user config to be loaded.
+    """
+    if os.environ.get(COMPLETION_ENV):
+        return False
+    _, command = split_args(args)
+    return command is not None and not any(arg in HELP_OPTIONS for arg in args)
+
+
+def fast_path(args: typing.Sequence[str]) -> bool:
+    """
+    Answer the command line without importing the cli stack, if possible.
+
+    :param args: the command line arguments without the program name
+    :return: whether the command line has been handled
+    """
+    instruction = os.environ.get(COMPLETION_ENV)
+    if instruction:
+        from composo import completion
+        code = completion.respond(instruction)
+        if code:
+            sys.exit(code)
+        return code is not None
+    options, _ = split_args(args)
+    if any(arg in HELP_OPTIONS for arg in args):
+        from composo import helpcache
+        return helpcache.lookup(args)
+    if any(arg in VERSION_OPTIONS for arg in options):
+        from composo import get_version
+        print(f"composo {get_version()}")
+        return True
+    return False
+
+
+def profiling(args: typing.Sequence[str]) -> typing.Tuple[bool, typing.Optional[str]]:
+    """
+    Whether the run is profiled and where the Chrome trace goes, from the root options or the environment.
+    """
+    options, _ = split_args(args)
+    trace_file = os.environ.get("COMPOSO_TRACE_FILE") or None
+    for i, option in enumerate(options):
+        if option == TRACE_FILE_OPTION and i + 1 < len(options):
+            trace_file = options[i + 1]
+        elif option.startswith(f"{TRACE_FILE_OPTION}="):
+            trace_file = option.split("=", 1)[1]
+    profile = PROFILE_OPTION in options or os.environ.get("COMPOSO_PROFILE", "").lower() in ("1", "true", "yes")
+    return profile or trace_file is not None, trace_file
+
+
+def report_profile(trace_file: typing.Optional[str]):
+    from rich.console import Console
+    from rich.table import Table
+    from composo import tracing
+
+    tracer = tracing.get_tracer()
+    table = Table("phase", "calls", "total ms", "longest ms", title="composo profile", title_justify="left")
+    for phase in tracer.summary():
+        table.add_row(phase.name, str(phase.calls), f"{phase.total * 1e3:.1f}", f"{phase.longest * 1e3:.1f}")
+    Console(stderr=True).print(table)
+    if trace_file:
+        tracer.write_chrome_trace(trace_file)
+
+
+def _run_history():
+    from composo import ioc
+
+    return ioc.App.run_history()
+
+
+def forward(args: typing.Sequence[str]) -> typing.Optional[int]:
+    """
+    Run the command line in a running daemon, if it is a command the daemon serves.
+
+    :return: the exit code of the command, or None if it has to run in this process
+    """
+    from composo import daemon
+
+    if os.environ.get(COMPLETION_ENV) or os.environ.get(daemon.DISABLE_ENV):
+        return None
+    _, command = split_args(args)
+    if command not in daemon.FORWARDED_COMMANDS or _archives_to_stdout(args):
+        return None
+    return daemon.forward(args)
+
+
+def _archives_to_stdout(args: typing.Sequence[str]) -> bool:
+    # the daemon forwards text output only
+    return any(arg == f"{ARCHIVE_OPTION}=-" or (arg == ARCHIVE_OPTION and args[i + 1:i + 2] == ["-"])
+               for i, arg in enumerate(args))
 
 
 def main():
-    ioc.App.config.from_yaml(Path(user_config_dir("composo")) / "config.yaml")
-    app = ioc.App.app()
-    app()
+    args = sys.argv[1:]
+    if fast_path(args):
+        return
+    code = forward(args)
+    if code is not None:
+        sys.exit(code)
+
+    profile, trace_file = profiling(args)
+    if profile:
+        from composo import tracing
+        tracing.enable()
+    from composo import history
+    try:
+        with history.recording_args(args, _run_history):
+            _main(args)
+    finally:
+        if profile:
+            report_profile(trace_file)
+
+
+def _main(args: typing.Sequence[str]):
+    from composo import tracing
+
+    with tracing.span("cli.import"):
+        from pathlib import Path
+        from appdirs import user_config_dir
+        from composo import helpcache, ioc
+        from composo.config import SafeLoader
+
+    if needs_config(args):
+        with tracing.span("config.load", path="config.yaml"):
+            ioc.App.config.from_yaml(Path(user_config_dir("composo")) / "config.yaml", loader=SafeLoader)
+    if needs_plugins(args):
+        with tracing.span("plugins.discover"):
+            app = ioc.App.app()
+    else:
+        app = ioc.App.app(plugins={})
+    with tracing.span("cli.run", command=" ".join(args)):
+        if helpcache.cacheable(args):
+            with helpcache.recording(args):  # the next --help is printed from the cache
+                app()
+        else:
+            app()
 
 
 def run():
-    app: Composo = ioc.App.app()
+    from typer.testing import CliRunner
+    from composo import ioc
+
+    app = ioc.App.app()
     runner = CliRunner()
     app.load_commands()
     # result = runner.invoke(app._app, ["new", "--help"])
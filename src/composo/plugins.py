@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sys
+import typing
+from pathlib import Path
+
+from composo import tracing
+
+if typing.TYPE_CHECKING:
+    from importlib.metadata import EntryPoint
+
+PLUGIN_GROUP = "composo.plugins"
+INDEX_FILE_NAME = "plugins.json"
+INDEX_FORMAT = 1
+
+_METADATA_SUFFIXES = (".dist-info", ".egg-info", ".egg-link", ".pth")
+
+
+class PluginRecord(typing.NamedTuple):
+    name: str
+    value: str
+    group: str
+    dist: str
+    version: str
+
+    def entry_point(self) -> "EntryPoint":
+        from importlib.metadata import EntryPoint
+
+        return EntryPoint(self.name, self.value, self.group)
+
+
+def scan_plugins(group: str = PLUGIN_GROUP, path: typing.Optional[typing.Iterable[str]] = None
+                 ) -> typing.List[PluginRecord]:
+    """
+    Walk the metadata of every installed distribution and collect the entry points of the given group.
+    """
+    # importlib.metadata is imported here, shell completion only needs the fingerprint of the path
+    from importlib.metadata import distributions
+
+    records = {}
+    for dist in distributions() if path is None else distributions(path=list(path)):
+        for ep in dist.entry_points:
+            if ep.group == group and ep.name not in records:
+                records[ep.name] = PluginRecord(ep.name, ep.value, ep.group, dist.metadata["Name"] or "", dist.version)
+    return list(records.values())
+
+
+def discover_plugins(group: str = PLUGIN_GROUP) -> typing.Dict[str, "EntryPoint"]:
+    return {record.name: record.entry_point() for record in scan_plugins(group)}
+
+
+def path_fingerprint(path: typing.Optional[typing.Iterable[str]] = None) -> str:
+    """
+    Fingerprint of the import path, changes whenever a distribution is installed, removed or updated.
+
+    Takes the names and mtimes of the distribution metadata entries in every directory on the path, which needs one
+    directory scan per path entry instead of reading the metadata of every distribution.
+    """
+    digest = hashlib.sha1()
+    for entry in sys.path if path is None else path:
+        try:
+            digest.update(f"{entry}\n".encode())
+            with os.scandir(entry or ".") as it:
+                for item in it:
+                    if item.name.endswith(_METADATA_SUFFIXES):
+                        digest.update(f"{item.name}:{item.stat().st_mtime_ns}\n".encode())
+        except (NotADirectoryError, FileNotFoundError, PermissionError):
+            continue
+    return digest.hexdigest()
+
+
+class PluginIndex:
+    """
+    On-disk index of the installed composo plugins stored under the configured `cache_dir`.
+
+    The index is invalidated by :func:`path_fingerprint`, so a valid index resolves the plugins with one small file
+    read instead of a scan of all installed distributions.
+    """
+
+    def __init__(self, cache_dir: typing.Optional[typing.Union[str, Path]], group: str = PLUGIN_GROUP,
+                 scan: typing.Callable[[str], typing.List[PluginRecord]] = scan_plugins,
+                 path: typing.Optional[typing.Iterable[str]] = None):
+        self.index_file = Path(cache_dir) / INDEX_FILE_NAME if cache_dir else None
+        self.group = group
+        self._scan = scan
+        self._path = path
+        self._records: typing.Optional[typing.List[PluginRecord]] = None
+
+    def fingerprint(self) -> str:
+        return path_fingerprint(self._path)
+
+    def _read(self) -> typing.Optional[typing.List[PluginRecord]]:
+        if self.index_file is None:
+            return None
+        try:
+            with open(self.index_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (data.get("format"), data.get("group")) != (INDEX_FORMAT, self.group):
+            return None
+        if data.get("fingerprint") != self.fingerprint():
+            return None
+        return [PluginRecord(*record) for record in data["plugins"]]
+
+    def _write(self, records: typing.List[PluginRecord]):
+        if self.index_file is None:
+            return
+        data = {"format": INDEX_FORMAT, "group": self.group, "fingerprint": self.fingerprint(),
+                "plugins": [list(record) for record in records]}
+        tmp_file = self.index_file.with_name(f".{self.index_file.name}.{os.getpid()}")
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError:
+            # a read-only cache only costs the next run a rescan
+            tmp_file.unlink(missing_ok=True)
+
+    def rebuild(self) -> typing.List[PluginRecord]:
+        """
+        Rescan the installed distributions and rewrite the index.
+        """
+        with tracing.span("plugins.scan"):
+            self._records = self._scan(self.group)
+        self._write(self._records)
+        return self._records
+
+    def records(self) -> typing.List[PluginRecord]:
+        if self._records is None:
+            with tracing.span("plugins.index"):
+                self._records = self._read()
+        if self._records is None:
+            self.rebuild()
+        return self._records
+
+    def plugins(self) -> typing.Dict[str, "EntryPoint"]:
+        return {record.name: record.entry_point() for record in self.records()}
@@ -0,0 +1,190 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from composo import tracing
+
+# the exit code of a command that could not be started, as in shells
+NOT_FOUND = 127
+
+# the number of processes of a batch sharing the CPUs, each runs its own pool of commands
+_workers = 1
+
+
+def set_workers(workers: int):
+    """
+    Share the default limit of concurrent commands among the workers of a batch, called in each forked worker.
+
+    :param workers: the number of processes running at a time
+    """
+    global _workers
+    _workers = max(1, workers)
+
+
+class ProcessResult(typing.NamedTuple):
+    name: str
+    args: typing.Tuple[str, ...]
+    returncode: int
+    duration: float
+    output: str
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+class ProcessError(RuntimeError):
+    """
+    A command failed or timed out, the result holds its output.
+    """
+
+    def __init__(self, result: ProcessResult):
+        reason = "timed out" if result.timed_out else f"exited with {result.returncode}"
+        super().__init__(f"'{result.name}' {reason}: {' '.join(result.args)}")
+        self.result = result
+
+
+class ProcessRunner:
+    """
+    Runs the commands of plugins, e.g. `git init`, venv creation or formatters, on a bounded pool of threads.
+
+    Each command runs with its output streamed line by line to stderr, prefixed by the name of the command, and
+    ends in a :class:`ProcessResult` with the exit code, the duration and the whole output. Plugins submit
+    independent commands at once, at most `jobs` of them run at a time in the process. By default the CPUs are
+    shared among the workers of a batch, see :func:`set_workers`.
+
+    :Example:
+
+        from composo import processes
+
+        runner = processes.get_runner()
+        runner.run(["git", "init", "--quiet"], cwd=writer.root, timeout=30)
+        runner.run_all({"format": ["black", "."], "lint": ["ruff", "check", "."]}, cwd=writer.root)
+    """
+
+    def __init__(self, jobs: typing.Optional[int] = None, timeout: typing.Optional[float] = None,
+                 out: typing.Optional[typing.TextIO] = None):
+        """
+        :param jobs: the maximum number of concurrently running commands, the share of the CPUs by default
+        :param timeout: the default timeout of a command in seconds, none by default
+        :param out: where the output is streamed to, stderr by default
+        """
+        self._jobs = jobs
+        self.timeout = timeout
+        self._out = out
+        self._lock = threading.Lock()
+        self._pool: typing.Optional[ThreadPoolExecutor] = None
+        self._pid = 0
+
+    @property
+    def jobs(self) -> int:
+        if self._jobs:
+            return self._jobs
+        return max(1, (os.cpu_count() or 1) // _workers)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            # the threads of a pool do not survive a fork, e.g. into the workers of a batch
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="composo-process")
+                self._pid = os.getpid()
+            return self._pool
+
+    def submit(self, args: typing.Sequence[str], name: typing.Optional[str] = None,
+               cwd: typing.Optional[typing.Union[str, os.PathLike]] = None,
+               env: typing.Optional[typing.Mapping[str, str]] = None, timeout: typing.Optional[float] = None,
+               check: bool = True) -> "Future[ProcessResult]":
+        """
+        Start a command on the pool.
+
+        :param args: the command and its arguments
+        :param name: the name the output is prefixed with, the command by default
+        :param cwd: the working directory of the command
+        :param env: variables added to the environment of the command
+        :param timeout: the seconds after which the command is killed, the default of the runner by default
+        :param check: whether a failed command raises a :class:`ProcessError` instead of returning its result
+        :return: the future result of the command
+        """
+        args = tuple(str(arg) for arg in args)
+        return self._executor().submit(self._execute, args, name or os.path.basename(args[0]), cwd, env,
+                                       self.timeout if timeout is None else timeout, check)
+
+    def run(self, args: typing.Sequence[str], **kwargs) -> ProcessResult:
+        """
+        Run a command on the pool and wait for it, see :meth:`submit` for the arguments.
+        """
+        return self.submit(args, **kwargs).result()
+
+    def run_all(self, commands: typing.Mapping[str, typing.Sequence[str]], **kwargs) -> typing.List[ProcessResult]:
+        """
+        Run independent commands concurrently and wait for all of them, see :meth:`submit` for the arguments.
+
+        :param commands: the commands by their names
+        :return: the results in the order of the commands
+        """
+        futures = [self.submit(args, name=name, **kwargs) for name, args in commands.items()]
+        return [future.result() for future in futures]
+
+    def _echo(self, name: str, line: str):
+        out = sys.stderr if self._out is None else self._out
+        with self._lock:
+            out.write(f"[{name}] {line.rstrip()}\n")
+            out.flush()
+
+    def _execute(self, args: typing.Tuple[str, ...], name: str, cwd, env: typing.Optional[typing.Mapping[str, str]],
+                 timeout: typing.Optional[float], check: bool) -> ProcessResult:
+        start = time.perf_counter()
+        lines: typing.List[str] = []
+        timed_out = threading.Event()
+        with tracing.span("process.run", name=name, args=" ".join(args)):
+            try:
+                process = subprocess.Popen(args, cwd=cwd, env=None if env is None else {**os.environ, **env},
+                                           stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                           stderr=subprocess.STDOUT, text=True, errors="replace",
+                                           start_new_session=os.name == "posix")
+            except OSError as exc:
+                returncode = NOT_FOUND
+                lines.append(f"{exc}\n")
+                self._echo(name, lines[-1])
+            else:
+                def kill():
+                    timed_out.set()
+                    try:
+                        if os.name == "posix":  # with its children, which may hold the output open
+                            os.killpg(process.pid, signal.SIGKILL)
+                        else:
+                            process.kill()
+                    except ProcessLookupError:
+                        pass
+
+                timer = threading.Timer(timeout, kill) if timeout is not None else None
+                if timer is not None:
+                    timer.daemon = True
+                    timer.start()
+                try:
+                    with process:
+                        for line in process.stdout:  # type: ignore[union-attr]
+                            lines.append(line)
+                            self._echo(name, line)
+                        returncode = process.wait()
+                finally:
+                    if timer is not None:
+                        timer.cancel()
+        result = ProcessResult(name, args, returncode, time.perf_counter() - start, "".join(lines),
+                               timed_out.is_set())
+        if check and not result.ok:
+            raise ProcessError(result)
+        return result
+
+
+_runner = ProcessRunner()
+
+
+def get_runner() -> ProcessRunner:
+    return _runner
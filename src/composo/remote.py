@@ -0,0 +1,290 @@
+import hashlib
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import typing
+import urllib.parse
+from pathlib import Path
+
+from composo import streams, templates, tracing
+from composo.files import lookup
+
+REFS_FORMAT = 1
+DEFAULT_TIMEOUT = 10.0
+# idle connections kept per host
+DEFAULT_POOL_SIZE = 4
+USER_AGENT = "composo"
+
+
+class RemoteError(Exception):
+    """
+    A template could not be fetched from its remote source and is not cached either.
+    """
+
+
+class OfflineError(RemoteError):
+    """
+    A template is not cached and composo runs offline.
+    """
+
+
+class Response(typing.NamedTuple):
+    status: int
+    headers: typing.Dict[str, str]
+    body: bytes
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP connections shared by all remote sources of a process, so fetching the templates of a project
+    pays one TCP and TLS handshake per host instead of one per template.
+
+    A connection is taken from the pool for a request and put back once its response is read, up to `size` idle
+    connections per host. A request on a kept connection that the server closed meanwhile is retried once on a new
+    connection.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE):
+        self.size = size
+        self.created = 0
+        self._idle: typing.Dict[typing.Tuple[str, str], typing.List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _take(self, scheme: str, netloc: str, timeout: float) -> typing.Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            # the sockets of the parent are not shared with a forked process, e.g. a worker of a batch
+            if self._pid != os.getpid():
+                self._idle, self._pid = {}, os.getpid()
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                return connection, True
+            self.created += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=timeout), False
+        if scheme == "http":
+            return http.client.HTTPConnection(netloc, timeout=timeout), False
+        raise RemoteError(f"unsupported URL scheme '{scheme}', supported are http and https")
+
+    def _give(self, scheme: str, netloc: str, connection: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method: str, url: str, headers: typing.Optional[typing.Mapping[str, str]] = None,
+                timeout: float = DEFAULT_TIMEOUT) -> Response:
+        """
+        Send a request on a pooled connection and read the whole response.
+
+        :raises OSError: if the server cannot be reached
+        :raises http.client.HTTPException: if the response is malformed, e.g. shorter than announced
+        """
+        parts = urllib.parse.urlsplit(url)
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        while True:
+            connection, reused = self._take(parts.scheme, parts.netloc, timeout)
+            try:
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    continue  # closed by the server while idle
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._give(parts.scheme, parts.netloc, connection)
+            return Response(response.status, {name.lower(): value for name, value in response.getheaders()}, body)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class FetchCache:
+    """
+    Content-addressed cache of fetched templates: `objects/<hash[:2]>/<hash>` holds the contents, shared by all
+    URLs serving the same bytes, and `refs/<hash of the url>.json` the hash, ETag and Last-Modified of every URL.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _ref(self, url: str) -> Path:
+        return self.path / "refs" / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def _object(self, content_hash: str) -> Path:
+        return self.path / "objects" / content_hash[:2] / content_hash
+
+    def ref(self, url: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        The validators of a cached URL, None if it is not cached or its content is gone.
+        """
+        try:
+            with open(self._ref(url)) as f:
+                ref = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if ref.get("format") != REFS_FORMAT or ref.get("url") != url or not self._object(ref["hash"]).is_file():
+            return None
+        return ref
+
+    def read(self, ref: typing.Mapping[str, typing.Any]) -> bytes:
+        with open(self._object(ref["hash"]), "rb") as f:
+            return f.read()
+
+    def store(self, url: str, data: bytes, headers: typing.Mapping[str, str]) -> typing.Dict[str, typing.Any]:
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._object(content_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            streams.atomic_write(path, data)
+        ref = {"format": REFS_FORMAT, "url": url, "hash": content_hash, "etag": headers.get("etag"),
+               "last_modified": headers.get("last-modified"), "time": time.time()}
+        self._ref(url).parent.mkdir(parents=True, exist_ok=True)
+        streams.atomic_write(self._ref(url), json.dumps(ref).encode())
+        return ref
+
+
+class RemoteSource:
+    """
+    Template fragments served over HTTP, e.g. license texts and CI snippets of a team, fetched through a
+    :class:`FetchCache` under the `cache_dir`.
+
+    The first fetch of a URL in a process revalidates the cached copy by a conditional request with its ETag, so an
+    unchanged fragment costs a `304 Not Modified` on a pooled connection, see :class:`ConnectionPool`; later fetches
+    in the same process take it from memory. Offline, e.g. with `--offline`, nothing is fetched and a fragment
+    that is not cached is an error. If the server cannot be reached, the cached copy is used with a warning.
+
+    :Example:
+
+        templates:
+          url: https://templates.example.com/composo/
+          timeout: 10
+          offline: false
+
+        source = remote.RemoteSource.from_config(config)
+        writer.write("LICENSE", lambda: source.render_key("license", config), depends_on=["license", "author"])
+    """
+
+    def __init__(self, base_url: str, cache: typing.Optional[FetchCache], offline: bool = False,
+                 timeout: float = DEFAULT_TIMEOUT, pool: typing.Optional[ConnectionPool] = None):
+        """
+        :param base_url: the URL names are resolved against, names may be URLs themselves
+        :param cache: where fetched templates are kept, none without a `cache_dir`, which allows no offline runs
+        :param offline: whether only cached templates are used
+        :param timeout: the timeout of a request in seconds
+        :param pool: the connections, those shared by the process by default
+        """
+        self.base_url = base_url if not base_url or base_url.endswith("/") else f"{base_url}/"
+        self.cache = cache
+        self.offline = offline
+        self.timeout = timeout
+        self.pool = _pool if pool is None else pool
+        self._fetched: typing.Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: typing.Mapping) -> "RemoteSource":
+        cache_dir = lookup(config, "cache_dir")
+        return cls(str(lookup(config, "templates.url", "") or ""),
+                   FetchCache(Path(cache_dir) / "templates") if cache_dir else None,
+                   offline=bool(lookup(config, "offline") or lookup(config, "templates.offline")),
+                   timeout=float(lookup(config, "templates.timeout", DEFAULT_TIMEOUT)))
+
+    def url(self, name: str) -> str:
+        return urllib.parse.urljoin(self.base_url, name)
+
+    def fetch(self, name: str) -> bytes:
+        """
+        The content of a template, by its name relative to the base URL.
+
+        :raises OfflineError: if it is not cached and composo runs offline
+        :raises RemoteError: if it can neither be fetched nor is cached
+        """
+        url = self.url(name)
+        with self._lock:
+            data = self._fetched.get(url)
+        if data is None:
+            with tracing.span("remote.fetch", url=url):
+                data = self._fetch(url)
+            with self._lock:
+                self._fetched[url] = data
+        return data
+
+    def _fetch(self, url: str) -> bytes:
+        ref = self.cache.ref(url) if self.cache is not None else None
+        if self.offline:
+            if ref is None:
+                raise OfflineError(f"'{url}' is not cached and cannot be fetched offline")
+            return self.cache.read(ref)  # type: ignore[union-attr]
+        headers = {}
+        if ref is not None and ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        elif ref is not None and ref.get("last_modified"):
+            headers["If-Modified-Since"] = ref["last_modified"]
+        try:
+            response = self.pool.request("GET", url, headers, timeout=self.timeout)
+        except (OSError, http.client.HTTPException) as exc:
+            return self._cached(url, ref, str(exc) or type(exc).__name__)
+        if response.status >= 500:
+            return self._cached(url, ref, f"HTTP {response.status}")
+        if response.status == 304 and ref is not None:
+            return self.cache.read(ref)  # type: ignore[union-attr]
+        if response.status != 200:
+            raise RemoteError(f"'{url}' cannot be fetched: HTTP {response.status}")
+        if self.cache is not None:
+            self.cache.store(url, response.body, response.headers)
+        return response.body
+
+    def _cached(self, url: str, ref: typing.Optional[typing.Mapping[str, typing.Any]], error: str) -> bytes:
+        # the server is unreachable or failing
+        if ref is None:
+            raise RemoteError(f"'{url}' cannot be fetched: {error}")
+        print(f"'{url}' cannot be fetched, using the cached copy: {error}", file=sys.stderr)
+        return self.cache.read(ref)  # type: ignore[union-attr]
+
+    def text(self, name: str) -> str:
+        return self.fetch(name).decode("utf-8")
+
+    def key_name(self, key: str, config: typing.Mapping) -> str:
+        """
+        The name of the fragment a config key selects, its path joined with its value, e.g. `license/mit` for
+        `license: mit` or `ci/gitlab/pages/true` for `ci.gitlab.pages: true`.
+        """
+        value = lookup(config, key)
+        if value is None or isinstance(value, typing.Mapping):
+            raise RemoteError(f"'{key}' selects no template, it needs a value like 'license: mit'")
+        value = str(value).lower() if isinstance(value, bool) else str(value)
+        return "/".join(key.split(".") + [urllib.parse.quote(value)])
+
+    def render_key(self, key: str, config: typing.Mapping) -> str:
+        """
+        Fetch the fragment a config key selects and render it with the config, see :mod:`composo.templates`.
+        """
+        name = self.key_name(key, config)
+        return templates.get_engine().compile(self.text(name), self.url(name)).render(config)
+
+
+_pool = ConnectionPool()
+
+
+def get_pool() -> ConnectionPool:
+    return _pool
@@ -0,0 +1,326 @@
+import difflib
+import json
+import os
+import re
+import sys
+import typing
+from pathlib import Path
+
+from composo import tracing
+from composo.plugins import path_fingerprint, scan_plugins
+
+SCHEMA_GROUP = "composo.schemas"
+INDEX_FILE_NAME = "schemas.json"
+INDEX_FORMAT = 1
+
+_COUNT = {"type": "integer", "minimum": 0}
+_FLAG = {"type": "boolean"}
+_PATH = {"type": "string"}
+
+# the keys composo itself reads, the keys of a plugin are validated by the schema it publishes
+CORE_SCHEMA: typing.Dict[str, typing.Any] = {
+    "type": "object",
+    "properties": {
+        "plugin": {"type": "string"},
+        "app": {
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "object",
+                    "properties": {
+                        "class": {"type": "string", "pattern": r"^[A-Za-z_]\w*$"},
+                        "package": {"type": "string", "pattern": r"^[A-Za-z_][\w.]*$"},
+                        "project": {"type": "string"},
+                    },
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "author": {
+            "type": "object",
+            "properties": {"name": {"type": "string"}, "email": {"type": "string", "pattern": r"^[^@\s]+@[^@\s]+$"}},
+        },
+        "license": {"type": "string"},
+        "cache_dir": _PATH,
+        "conf_dir": _PATH,
+        "ci": {"type": "object"},
+        "vcs": {"type": "object"},
+        "dry_run": _FLAG,
+        "journal": _FLAG,
+        "journal_content": _FLAG,
+        "offline": _FLAG,
+        "templates": {"type": "object", "properties": {"url": {"type": "string", "pattern": r"^https?://"},
+                                                       "offline": _FLAG, "timeout": {"type": "number", "minimum": 0}},
+                      "additionalProperties": False},
+        "files": {"type": "object", "properties": {"max_buffer": _COUNT}, "additionalProperties": False},
+        "history": {"type": "object", "properties": {"enabled": _FLAG, "max_bytes": _COUNT, "backups": _COUNT},
+                    "additionalProperties": False},
+        "skeleton_cache": {"type": "object", "properties": {"enabled": _FLAG, "max_size": _COUNT, "hardlink": _FLAG},
+                           "additionalProperties": False},
+        "envs": {"type": "object", "properties": {"wheelhouse": _PATH, "offline": _FLAG, "max_envs": _COUNT,
+                                                  "hardlink": _FLAG},
+                 "additionalProperties": False},
+    },
+}
+
+_TYPES: typing.Dict[str, typing.Callable[[typing.Any], bool]] = {
+    "object": lambda value: isinstance(value, typing.Mapping),
+    "array": lambda value: isinstance(value, (list, tuple)),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+class ConfigIssue(typing.NamedTuple):
+    # the config file or project the issue was found in
+    source: str
+    # the dotted key, empty for the config as a whole
+    key: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.source}: {self.key}: {self.message}" if self.key else f"{self.source}: {self.message}"
+
+
+class ConfigError(Exception):
+    """
+    Configs do not match the schemas of composo and their plugins, raised with every issue found.
+    """
+
+    def __init__(self, issues: typing.Sequence[ConfigIssue]):
+        self.issues = list(issues)
+        super().__init__("\n".join(str(issue) for issue in self.issues))
+
+
+# checks a value found at the dotted key and appends the (key, message) of every mismatch
+Check = typing.Callable[[typing.Any, str, typing.List[typing.Tuple[str, str]]], None]
+
+
+class _Mismatch(Exception):
+    pass
+
+
+def _join(key: str, name: str) -> str:
+    return f"{key}.{name}" if key else str(name)
+
+
+def compile_schema(schema: typing.Mapping[str, typing.Any]) -> Check:
+    """
+    Compile a schema into a check, so a config is validated without interpreting the schema again.
+
+    The schemas are a subset of JSON Schema: `type`, `enum`, `pattern`, `minimum`, `maximum`, `properties`,
+    `required`, `additionalProperties` and `items`, other keywords like `description` are ignored. Unknown keys of a
+    mapping with `additionalProperties: false` are reported together with the closest known key.
+    """
+    checks: typing.List[Check] = []
+    types = schema.get("type")
+    if types is not None:
+        names = [types] if isinstance(types, str) else list(types)
+        unknown = [name for name in names if name not in _TYPES]
+        if unknown:
+            raise ValueError(f"unknown schema types {unknown}, supported are {sorted(_TYPES)}")
+        matchers = [_TYPES[name] for name in names]
+        expected = " or ".join(names)
+
+        def check_type(value, key, issues):
+            if not any(matches(value) for matches in matchers):
+                issues.append((key, f"expected {expected}, got {type(value).__name__} {value!r}"))
+                raise _Mismatch
+        checks.append(check_type)
+
+    if "enum" in schema:
+        choices = list(schema["enum"])
+
+        def check_enum(value, key, issues):
+            if value not in choices:
+                issues.append((key, f"expected one of {choices}, got {value!r}"))
+        checks.append(check_enum)
+
+    if "pattern" in schema:
+        pattern = re.compile(schema["pattern"])
+
+        def check_pattern(value, key, issues):
+            if isinstance(value, str) and not pattern.search(value):
+                issues.append((key, f"{value!r} does not match '{pattern.pattern}'"))
+        checks.append(check_pattern)
+
+    for keyword, fails, relation in (("minimum", lambda value, bound: value < bound, "at least"),
+                                     ("maximum", lambda value, bound: value > bound, "at most")):
+        if keyword in schema:
+            checks.append(_bound(schema[keyword], fails, relation))
+
+    properties = {name: compile_schema(sub) for name, sub in (schema.get("properties") or {}).items()}
+    required = list(schema.get("required") or [])
+    additional = schema.get("additionalProperties", True)
+    extra = compile_schema(additional) if isinstance(additional, typing.Mapping) else None
+    if properties or required or additional is not True:
+        def check_mapping(value, key, issues):
+            if not isinstance(value, typing.Mapping):
+                return
+            for name in required:
+                if name not in value:
+                    issues.append((_join(key, name), "is required"))
+            for name in value:
+                sub = properties.get(name, extra)
+                if sub is not None:
+                    sub(value[name], _join(key, name), issues)
+                elif additional is False:
+                    close = difflib.get_close_matches(str(name), list(properties), n=1)
+                    hint = f", did you mean '{close[0]}'?" if close else f", known are {sorted(properties)}"
+                    issues.append((_join(key, name), f"unknown key{hint}"))
+        checks.append(check_mapping)
+
+    if isinstance(schema.get("items"), typing.Mapping):
+        item = compile_schema(schema["items"])
+
+        def check_items(value, key, issues):
+            if isinstance(value, (list, tuple)):
+                for index, element in enumerate(value):
+                    item(element, f"{key}[{index}]", issues)
+        checks.append(check_items)
+
+    def check(value, key, issues):
+        try:
+            for step in checks:
+                step(value, key, issues)
+        except _Mismatch:
+            pass  # the value has the wrong type, its content is not checked any further
+    return check
+
+
+def _bound(bound, fails, relation) -> Check:
+    def check_bound(value, key, issues):
+        if _TYPES["number"](value) and fails(value, bound):
+            issues.append((key, f"expected {relation} {bound}, got {value!r}"))
+    return check_bound
+
+
+def scan_schemas(group: str = SCHEMA_GROUP, path: typing.Optional[typing.Iterable[str]] = None
+                 ) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    """
+    Load the schemas the installed plugins publish as entry points of the given group, e.g.
+
+        [tool.poetry.plugins."composo.schemas"]
+        python = "composo_python.schema:SCHEMA"
+
+    Only the modules holding the schemas are imported, a plugin keeps them free of its heavy imports. A schema that
+    cannot be loaded is skipped with a warning, a broken plugin does not break the runs of the others.
+    """
+    schemas = {}
+    for record in scan_plugins(group, path=path):
+        try:
+            schema = record.entry_point().load()
+            schema = schema() if callable(schema) else schema
+        except Exception as exc:
+            print(f"the schema of plugin '{record.name}' ({record.value}) cannot be loaded, its config is not "
+                  f"validated: {type(exc).__name__}: {exc}", file=sys.stderr)
+            continue
+        if not isinstance(schema, typing.Mapping):
+            print(f"the schema of plugin '{record.name}' ({record.value}) is no mapping, its config is not validated",
+                  file=sys.stderr)
+            continue
+        schemas[record.name] = schema
+    return schemas
+
+
+class SchemaRegistry:
+    """
+    The schemas configs are validated against: that of composo for its own keys and those plugins publish for
+    theirs, see :func:`scan_schemas`. Every schema is compiled once per process, see :func:`compile_schema`.
+
+    The published schemas are kept in an index under `cache_dir`, invalidated like the plugin index by
+    :func:`composo.plugins.path_fingerprint`, so a config is validated before any plugin module is imported.
+
+    :Example:
+
+        registry = SchemaRegistry(cache_dir, scan=scan_schemas)
+        registry.validate(config, plugin="python", source=".composo.yaml")
+    """
+
+    def __init__(self, cache_dir: typing.Optional[typing.Union[str, Path]] = None,
+                 schemas: typing.Optional[typing.Mapping[str, typing.Mapping[str, typing.Any]]] = None,
+                 scan: typing.Optional[typing.Callable[[], typing.Dict[str, typing.Dict[str, typing.Any]]]] = None,
+                 path: typing.Optional[typing.Iterable[str]] = None):
+        """
+        :param cache_dir: the directory of the schema index, none is kept without
+        :param schemas: the schemas of plugins that are not installed as distributions, e.g. of tests
+        :param scan: loads the schemas the installed plugins publish, only composo's own schema is used without
+        """
+        self.index_file = Path(cache_dir) / INDEX_FILE_NAME if cache_dir and scan is not None else None
+        self._builtin = dict(schemas or {})
+        self._scan = scan
+        self._path = path
+        self._published: typing.Optional[typing.Dict[str, typing.Dict[str, typing.Any]]] = None
+        self._checks: typing.Dict[typing.Optional[str], typing.List[Check]] = {}
+
+    def _read(self) -> typing.Optional[typing.Dict[str, typing.Dict[str, typing.Any]]]:
+        if self.index_file is None:
+            return None
+        try:
+            with open(self.index_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != INDEX_FORMAT or data.get("fingerprint") != path_fingerprint(self._path):
+            return None
+        return data["schemas"]
+
+    def _write(self, schemas: typing.Dict[str, typing.Dict[str, typing.Any]]):
+        if self.index_file is None:
+            return
+        data = {"format": INDEX_FORMAT, "fingerprint": path_fingerprint(self._path), "schemas": schemas}
+        tmp_file = self.index_file.with_name(f".{self.index_file.name}.{os.getpid()}")
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.index_file)
+        except (OSError, TypeError, ValueError):
+            # a read-only cache or a schema that is no JSON only costs the next run a rescan
+            tmp_file.unlink(missing_ok=True)
+
+    def published(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """
+        The schemas of the installed plugins by plugin name.
+        """
+        if self._published is None:
+            self._published = {} if self._scan is None else self._read()
+        if self._published is None:
+            with tracing.span("schemas.scan"):
+                self._published = self._scan()  # type: ignore[misc]
+            self._write(self._published)
+        return self._published
+
+    def schema(self, plugin: str) -> typing.Optional[typing.Mapping[str, typing.Any]]:
+        return self._builtin.get(plugin) or self.published().get(plugin)
+
+    def checks(self, plugin: typing.Optional[str] = None) -> typing.List[Check]:
+        """
+        The compiled checks of composo's schema and that of the plugin, if it publishes one.
+        """
+        if plugin not in self._checks:
+            schemas = [CORE_SCHEMA]
+            plugin_schema = self.schema(plugin) if plugin is not None else None
+            if plugin_schema is not None:
+                schemas.append(plugin_schema)
+            self._checks[plugin] = [compile_schema(schema) for schema in schemas]
+        return self._checks[plugin]
+
+    def validate(self, config: typing.Mapping[str, typing.Any], plugin: typing.Optional[str] = None,
+                 source: str = "config") -> typing.List[ConfigIssue]:
+        """
+        Every issue of the config with composo's schema and that of the plugin.
+
+        :param plugin: the plugin the config is for, by default that of the config
+        :param source: what the issues are reported for, e.g. the path of the config
+        """
+        if plugin is None and isinstance(config, typing.Mapping) and isinstance(config.get("plugin"), str):
+            plugin = config["plugin"]
+        found: typing.List[typing.Tuple[str, str]] = []
+        for check in self.checks(plugin):
+            check(config, "", found)
+        # keys checked by both schemas are reported once
+        return [ConfigIssue(source, key, message) for key, message in dict.fromkeys(found)]
@@ -3,4 +3,4 @@ from composo import ioc
 
 def init(config):
 
-    return ioc.Plugins.shell()
+    return ioc.Plugins.shell(config)
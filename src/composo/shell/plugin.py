@@ -1,8 +1,90 @@
+import os
+import shutil
+import sys
+import typing
+
+import yaml
+
+from composo import processes
+from composo.files import current_writer, lookup
+from composo.steps import Steps
+
+SCRIPT_TEMPLATE = """#!/usr/bin/env sh
+# {name} by {author}
+set -eu
+
+echo "{name}"
+"""
+
+# the config keys the rendered files depend on
+NAME_INPUTS = ["app.name.project", "author.name"]
+# the .composo.yaml of a project holds no name, init names a project by its directory, so projects of one flavour
+# share it from the skeleton cache
+CONFIG_INPUTS = ["plugin", "flavour"]
+
+README_TEMPLATE = """# {name}
+
+A shell project by {author}.
+
+    $ {script}
+"""
+
+# seconds
+GIT_TIMEOUT = 30.0
+
+
 class Shell:
+    """
+    Plugin for shell script projects, the generation is declared as :mod:`composo.steps`.
+
+    A new project becomes a git repository if `vcs.git` is configured and git is installed, the commands run on the
+    :class:`composo.processes.ProcessRunner` shared by all plugins once the files are committed, see
+    :meth:`composo.files.FileWriter.after_commit`.
+    """
+
+    def __init__(self, config: typing.Optional[typing.Mapping] = None,
+                 runner: typing.Optional[processes.ProcessRunner] = None):
+        self.config = config or {}
+        self.runner = processes.get_runner() if runner is None else runner
+
+    def new(self, name, flavour="bin") -> Steps:
+        flavour = lookup(self.config, "flavour", flavour)
+        steps = self.project_steps(name, flavour)
+        project_config = {"plugin": "shell", "flavour": flavour}
+        steps.add("config", lambda: current_writer().write(".composo.yaml", lambda: yaml.safe_dump(project_config),
+                                                           depends_on=CONFIG_INPUTS),
+                  inputs=CONFIG_INPUTS, outputs=[".composo.yaml"])
+        steps.add("git", self.git_init, inputs=["vcs.git"], after=[step.name for step in steps])
+        return steps
+
+    def git_init(self):
+        writer = current_writer()
+        if writer.dry_run or not writer.sink.commits_to_disk or not lookup(self.config, "vcs.git"):
+            return
+        if shutil.which("git") is None:
+            print("git is not installed, the project is not initialized as git repository", file=sys.stderr)
+            return
+        # after the commit, a new project is renamed into place as a whole and a failed run leaves no repository
+        writer.after_commit(lambda: self.runner.run(["git", "init", "--quiet"], name="git", cwd=writer.root,
+                                                    timeout=GIT_TIMEOUT))
+
+    def init(self, path) -> Steps:
+        name = lookup(self.config, "app.name.project") or os.path.basename(os.path.abspath(path))
+        return self.project_steps(name, lookup(self.config, "flavour", "bin"))
+
+    def project_steps(self, name: str, flavour: str) -> Steps:
+        author = lookup(self.config, "author.name", "")
+        script = f"{flavour}/{name}"
+        steps = Steps()
+
+        @steps.step(inputs=NAME_INPUTS, outputs=[script])
+        def render_script():
+            current_writer().write(script, lambda: SCRIPT_TEMPLATE.format(name=name, author=author),
+                                   depends_on=NAME_INPUTS, mode=0o755)
 
-    def __init__(self):
-        ...
+        @steps.step(inputs=NAME_INPUTS, outputs=["README.md"])
+        def readme():
+            content = README_TEMPLATE.format(name=name, author=author, script=script)
+            current_writer().write("README.md", content, depends_on=NAME_INPUTS)
 
-    def new(self, name, flavour="bin"):
-        print("execute shell plugin")
-        ...
+        return steps
@@ -0,0 +1,9 @@
+# The keys of `.composo.yaml` the shell plugin reads. The module imports nothing, composo loads it to validate a
+# config before the plugin itself is imported, see composo.schema.scan_schemas.
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        # the directory of the script
+        "flavour": {"type": "string", "pattern": r"^[\w.-]+$"},
+    },
+}
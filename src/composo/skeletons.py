@@ -0,0 +1,253 @@
+import contextlib
+import json
+import os
+import typing
+from pathlib import Path
+
+from composo import streams, tracing
+from composo.config import LayeredConfig
+from composo.files import RUN_FLAGS, WHOLE_CONFIG, FileWriter, value_digest
+from composo.staging import StagingTree
+
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None  # type: ignore[assignment]
+
+CACHE_FORMAT = 1
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+# the config key the name of a project is stored under, the only key skeletons of one cache entry differ in
+NAME_KEY = "app.name"
+# config keys that do not influence what a plugin renders
+TRANSIENT_KEYS = RUN_FLAGS
+
+
+class CacheStats(typing.NamedTuple):
+    path: Path
+    entries: int
+    objects: int
+    size: int
+    max_size: int
+
+
+def depends_on_name(inputs: typing.Iterable[str]) -> bool:
+    """
+    Whether a file rendered from the given config keys may differ between projects of different names.
+    """
+    return any(key in (WHOLE_CONFIG, NAME_KEY) or key.startswith(f"{NAME_KEY}.") or NAME_KEY.startswith(f"{key}.")
+               for key in inputs)
+
+
+def _without(config: typing.Dict[str, typing.Any], key: str) -> typing.Dict[str, typing.Any]:
+    head, _, rest = key.partition(".")
+    if head not in config:
+        return config
+    config = dict(config)
+    if not rest:
+        del config[head]
+    elif isinstance(config[head], dict):
+        config[head] = _without(config[head], rest)
+    return config
+
+
+class SkeletonCache:
+    """
+    Content-addressed cache of the files `composo new` renders, keyed by plugin, plugin version and the config
+    without the project name.
+
+    Only the files that do not depend on the name are cached, i.e. files written with a `depends_on` that does
+    not cover `app.name`. A later `new` with an equal key stages them from the cache, the plugin's writes of these
+    files are then skipped as up to date, so it only renders the name dependent files. On commit the cached files
+    are materialized by reflink, hardlink (if enabled) or copy_file_range, see :func:`composo.staging.materialize`.
+
+    The cache is bounded in size, the least recently used entries are evicted first.
+
+    The layout below the cache directory is `entries/<key>.json`, listing the files of a skeleton, and
+    `objects/<hash[:2]>/<hash>` holding the file contents. The workers of a batch store and prune concurrently, both
+    hold the `lock` file of the cache directory, so no worker removes the objects of an entry another one is storing.
+
+    :Example:
+
+        skeleton_cache:
+          max_size: 1073741824  # bytes
+          hardlink: false       # hardlinked files share their inode with the cache, editing them in place
+                                # changes the cache
+          enabled: true
+    """
+
+    def __init__(self, path: Path, max_size: int = DEFAULT_MAX_SIZE, hardlink: bool = False, enabled: bool = True):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.hardlink = hardlink
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, config: LayeredConfig) -> typing.Optional["SkeletonCache"]:
+        cache_dir = config.resolve("cache_dir")
+        if not cache_dir:
+            return None
+        return cls(Path(cache_dir) / "skeletons",
+                   max_size=int(config.resolve("skeleton_cache.max_size", DEFAULT_MAX_SIZE)),
+                   hardlink=bool(config.resolve("skeleton_cache.hardlink", False)),
+                   enabled=bool(config.resolve("skeleton_cache.enabled", True)))
+
+    @property
+    def _entries(self) -> Path:
+        return self.path / "entries"
+
+    @property
+    def _objects(self) -> Path:
+        return self.path / "objects"
+
+    def _object(self, content_hash: str) -> Path:
+        return self._objects / content_hash[:2] / content_hash
+
+    @contextlib.contextmanager
+    def _locked(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # released with the file
+            yield
+
+    def key(self, plugin: str, version: str, config: typing.Mapping) -> str:
+        """
+        The key of the skeletons the plugin renders for the config, whatever the project name.
+        """
+        plain = config.to_dict() if isinstance(config, LayeredConfig) else dict(config)
+        for key in (NAME_KEY,) + TRANSIENT_KEYS:
+            plain = _without(plain, key)
+        return value_digest({"format": CACHE_FORMAT, "plugin": plugin, "version": version, "config": plain})
+
+    def restore(self, key: str, writer: FileWriter) -> int:
+        """
+        Stage the cached files of a skeleton into a new project.
+
+        :return: the number of staged files, 0 on a cache miss
+        """
+        if not self.enabled or not isinstance(writer.sink, StagingTree):
+            return 0
+        with tracing.span("cache.restore", key=key):
+            entry_path = self._entries / f"{key}.json"
+            try:
+                with open(entry_path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return 0
+            files = entry.get("files", {})
+            if entry.get("format") != CACHE_FORMAT or not all(
+                    self._object(record["hash"]).exists() for record in files.values()):
+                return 0
+            os.utime(entry_path)  # least recently used
+            for relative, record in files.items():
+                writer.manifest.files[relative] = {"hash": record["hash"], "inputs": record["inputs"]}
+                writer.sink.link(relative, self._object(record["hash"]), record.get("mode"), self.hardlink)
+            return len(files)
+
+    def store(self, key: str, writer: FileWriter) -> int:
+        """
+        Cache the name independent files the writer rendered in this run, then evict entries beyond the size limit.
+
+        :return: the number of cached files
+        """
+        if not self.enabled or not isinstance(writer.sink, StagingTree):
+            return 0
+        seen, written, _, staged = writer.changes
+        files = {}
+        for relative in written:
+            record, content = seen.get(relative), staged.get(relative)
+            if record is not None and content is not None and content.data is not None and not depends_on_name(
+                    record["inputs"]):
+                files[relative] = record, content
+        if not files:
+            return 0
+        with tracing.span("cache.store", key=key), self._locked():
+            for record, content in files.values():
+                self._put(record["hash"], content.data)
+            self._entries.mkdir(parents=True, exist_ok=True)
+            entry = {relative: {"hash": record["hash"], "inputs": record["inputs"], "mode": content.mode}
+                     for relative, (record, content) in files.items()}
+            streams.atomic_write(self._entries / f"{key}.json",
+                                 json.dumps({"format": CACHE_FORMAT, "files": entry}, sort_keys=True).encode())
+            self._prune(self.max_size)
+            return len(files)
+
+    def _put(self, content_hash: str, data: bytes):
+        path = self._object(content_hash)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        streams.atomic_write(path, data)
+        # objects may be hardlinked into projects, a read-only object keeps them from being changed by accident
+        os.chmod(path, 0o444)
+
+    def _object_sizes(self) -> typing.Dict[str, int]:
+        sizes = {}
+        if self._objects.is_dir():
+            for prefix in os.scandir(self._objects):
+                if prefix.is_dir():
+                    for entry in os.scandir(prefix.path):
+                        if entry.is_file() and _is_digest(entry.name):
+                            sizes[entry.name] = entry.stat().st_size
+        return sizes
+
+    def _entry_files(self) -> typing.List[typing.Tuple[float, Path]]:
+        if not self._entries.is_dir():
+            return []
+        return sorted((entry.stat().st_mtime, Path(entry.path)) for entry in os.scandir(self._entries)
+                      if entry.name.endswith(".json"))
+
+    def stats(self) -> CacheStats:
+        sizes = self._object_sizes()
+        return CacheStats(self.path, len(self._entry_files()), len(sizes), sum(sizes.values()), self.max_size)
+
+    def prune(self, max_size: typing.Optional[int] = None) -> int:
+        """
+        Evict the least recently used entries until the objects still referenced fit into max_size, and remove the
+        objects no entry references anymore.
+
+        :param max_size: the size limit in bytes, that of the cache by default, 0 to clear the cache
+        :return: the number of bytes freed
+        """
+        with self._locked():
+            return self._prune(self.max_size if max_size is None else max_size)
+
+    def _prune(self, max_size: int) -> int:
+        sizes = self._object_sizes()
+        entries = []
+        references: typing.Dict[str, int] = {}
+        for _, path in self._entry_files():
+            try:
+                with open(path) as f:
+                    hashes = {record["hash"] for record in json.load(f).get("files", {}).values()}
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                path.unlink(missing_ok=True)  # unreadable, e.g. of another cache format
+                continue
+            entries.append((path, hashes))
+            for content_hash in hashes:
+                references[content_hash] = references.get(content_hash, 0) + 1
+
+        size = sum(sizes.get(content_hash, 0) for content_hash in references)
+        for path, hashes in entries:
+            if size <= max_size:
+                break
+            path.unlink(missing_ok=True)
+            for content_hash in hashes:
+                references[content_hash] -= 1
+                if not references[content_hash]:
+                    del references[content_hash]
+                    size -= sizes.get(content_hash, 0)
+
+        freed = 0
+        for content_hash, object_size in sizes.items():
+            if content_hash not in references:
+                try:
+                    self._object(content_hash).unlink()
+                except OSError:
+                    continue
+                freed += object_size
+        return freed
+
+
+def _is_digest(name: str) -> bool:
+    return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
@@ -0,0 +1,230 @@
+import io
+import os
+import shutil
+import threading
+import time
+import typing
+from pathlib import Path
+
+from composo import streams
+from composo.files import MANIFEST_FILE, Manifest
+
+
+class StagedFile(typing.NamedTuple):
+    # None for a file whose content on disk is kept and only the mode changes
+    data: typing.Optional[bytes]
+    mode: typing.Optional[int] = None
+    # a file whose content is materialized from another file, e.g. of the skeleton cache, instead of data
+    source: typing.Optional[str] = None
+    hardlink: bool = False
+
+    @property
+    def has_content(self) -> bool:
+        return self.data is not None or self.source is not None
+
+
+# from linux/fs.h, clones the extents of a file on copy-on-write filesystems like btrfs and xfs
+FICLONE = 0x40049409
+
+
+def materialize(source: typing.Union[str, Path], target: typing.Union[str, Path], hardlink: bool = False) -> str:
+    """
+    Create target with the content of source as cheaply as the filesystem allows: by reflink, by hardlink if
+    allowed, or by a copy within the kernel if possible, see :func:`composo.streams.copy_fd`.
+
+    A hardlinked target shares its inode with the source, changing one in place changes the other.
+
+    :return: the method used, one of `reflink`, `hardlink`, `copy_file_range`, `sendfile` and `copy`
+    """
+    if hardlink:
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except OSError:
+            pass
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            import fcntl
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except (ImportError, OSError):
+            pass
+        return streams.copy_fd(src.fileno(), dst.fileno())
+
+
+class _StagingFile(io.BytesIO):
+    def __init__(self, tree: "StagingTree", relative: str):
+        super().__init__()
+        self._tree = tree
+        self._relative = relative
+
+    def close(self):
+        if not self.closed:
+            self._tree.write(self._relative, self.getvalue())
+        super().close()
+
+
+class StagingTree:
+    """
+    In-memory tree of the files generated into a project, committed to disk in one pass.
+
+    :meth:`commit` creates all directories first, writes every file next to its target and renames the files into
+    place only once all of them have been written. A new project is built in a temporary sibling directory that is
+    renamed into place as a whole. An interrupted run therefore never leaves a half-generated project, and a dry run
+    simply never commits.
+
+    The tree is the sink of a :class:`composo.files.FileWriter`, and :meth:`open` makes it usable wherever composo
+    injects `fopen`. Nothing is on disk before the commit, so commands that need the files, like `git init`, a
+    formatter or an install, are run by :meth:`composo.files.FileWriter.after_commit` hooks.
+
+    :Example:
+
+        tree = StagingTree(Path("my-project"))
+        writer = FileWriter(tree.root, config, sink=tree)
+        ...
+        tree.commit()
+    """
+    staging = True
+    on_disk = False
+    commits_to_disk = True
+    buffers = True
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.files: typing.Dict[str, StagedFile] = {}
+        self._lock = threading.Lock()
+        self._mtime: typing.Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def exists(self, relative: str) -> bool:
+        staged = self.files.get(relative)
+        return (staged is not None and staged.has_content) or (self.root / relative).exists()
+
+    def write(self, relative: str, data: bytes, mode: typing.Optional[int] = None):
+        with self._lock:
+            previous = self.files.get(relative)
+            self.files[relative] = StagedFile(data, mode if mode is not None or previous is None else previous.mode)
+
+    def link(self, relative: str, source: typing.Union[str, Path], mode: typing.Optional[int] = None,
+             hardlink: bool = False):
+        """
+        Stage a file whose content is materialized from the source file on commit, see :func:`materialize`.
+        """
+        with self._lock:
+            self.files[relative] = StagedFile(None, mode, str(source), hardlink)
+
+    def chmod(self, relative: str, mode: int):
+        with self._lock:
+            previous = self.files.get(relative)
+            self.files[relative] = StagedFile(None, mode) if previous is None else previous._replace(mode=mode)
+
+    def read(self, relative: str) -> bytes:
+        staged = self.files.get(relative)
+        if staged is not None and staged.data is not None:
+            return staged.data
+        with open(self.root / relative if staged is None or staged.source is None else staged.source, "rb") as f:
+            return f.read()
+
+    def open(self, path: typing.Union[str, Path], mode: str = "r", encoding: typing.Optional[str] = None):
+        """
+        Open a file of the tree like :func:`open`: reads see the staged content, writes are staged.
+        """
+        path = Path(path)
+        relative = (path.relative_to(self.root) if path.is_absolute() else path).as_posix()
+        if "w" in mode:
+            staged = _StagingFile(self, relative)
+            return staged if "b" in mode else io.TextIOWrapper(staged, encoding=encoding or "utf-8")
+        if any(flag in mode for flag in "ax+"):
+            raise ValueError(f"the staging tree does not support mode '{mode}'")
+        data = io.BytesIO(self.read(relative))
+        return data if "b" in mode else io.TextIOWrapper(data, encoding=encoding or "utf-8")
+
+    def mtime(self, relative: str) -> typing.Optional[int]:
+        """
+        The modification time of a file once committed, staged files are committed with the time of the tree.
+        """
+        staged = self.files.get(relative)
+        if staged is not None and staged.hardlink:
+            return os.stat(staged.source).st_mtime_ns  # type: ignore[arg-type]
+        if staged is not None and staged.has_content:
+            return self._stamp()
+        try:
+            return os.stat(self.root / relative).st_mtime_ns
+        except OSError:
+            return None
+
+    def _stamp(self) -> int:
+        if self._mtime is None:
+            self._mtime = time.time_ns()
+        return self._mtime
+
+    def save_manifest(self, manifest: Manifest):
+        # committed together with the files
+        self.write(MANIFEST_FILE, manifest.dumps())
+
+    def staged(self) -> typing.Dict[str, StagedFile]:
+        with self._lock:
+            return dict(self.files)
+
+    def stage(self, files: typing.Mapping[str, StagedFile]):
+        """
+        Take over files staged by a copy of this tree, e.g. in a forked process.
+        """
+        with self._lock:
+            self.files.update(files)
+
+    def discard(self):
+        with self._lock:
+            self.files.clear()
+
+    def commit(self):
+        """
+        Write the staged files to disk and empty the tree.
+        """
+        with self._lock:
+            files, self.files = self.files, {}
+        if not files:
+            return
+        mtime = self._stamp()
+        fresh = not self.root.exists()
+        suffix = f".composo-{os.getpid()}"
+        target = self.root.with_name(f".{self.root.name}{suffix}") if fresh else self.root
+        renames: typing.List[typing.Tuple[Path, Path]] = []
+        try:
+            for directory in sorted({os.path.dirname(relative) for relative in files}):
+                os.makedirs(target / directory, exist_ok=True)
+            for relative, staged in files.items():
+                path = target / relative
+                if not staged.has_content:
+                    continue
+                tmp_path = path if fresh else path.with_name(f".{path.name}{suffix}")
+                renames.append((tmp_path, path))
+                if staged.source is not None:
+                    method = materialize(staged.source, tmp_path, staged.hardlink)
+                    if method == "hardlink":
+                        continue  # the mode and times belong to the source as well
+                else:
+                    with open(tmp_path, "wb") as f:
+                        f.write(staged.data)
+                if staged.mode is not None:
+                    os.chmod(tmp_path, staged.mode)
+                os.utime(tmp_path, ns=(mtime, mtime))
+        except BaseException:
+            if fresh:
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                for tmp_path, _ in renames:
+                    tmp_path.unlink(missing_ok=True)
+            raise
+
+        if fresh:
+            os.rename(target, self.root)
+        else:
+            for tmp_path, path in renames:
+                os.replace(tmp_path, path)
+        self._mtime = None
+        for relative, staged in files.items():
+            if not staged.has_content:
+                os.chmod(self.root / relative, staged.mode)
@@ -0,0 +1,308 @@
+import contextvars
+import multiprocessing
+import os
+import time
+import typing
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from composo import tracing
+from composo.batch import _fork_context
+from composo.files import FileWriter, current_writer
+
+RAN = "ran"
+SKIPPED = "skipped"
+
+
+class Step(typing.NamedTuple):
+    name: str
+    run: typing.Callable[[], typing.Any]
+    # the dotted config keys the step depends on, the whole config if None
+    inputs: typing.Optional[typing.Tuple[str, ...]] = None
+    # the paths the step produces, relative to the project root
+    outputs: typing.Tuple[str, ...] = ()
+    # the names of the steps that have to finish first
+    after: typing.Tuple[str, ...] = ()
+
+
+class StepResult(typing.NamedTuple):
+    name: str
+    status: str
+    start: float
+    duration: float
+
+
+class StepReport(typing.NamedTuple):
+    results: typing.List[StepResult]
+    critical_path: typing.List[str]
+    critical_time: float
+    wall_time: float
+
+    @property
+    def ran(self) -> typing.List[str]:
+        return [result.name for result in self.results if result.status == RAN]
+
+    @property
+    def skipped(self) -> typing.List[str]:
+        return [result.name for result in self.results if result.status == SKIPPED]
+
+
+class StepError(Exception):
+    """
+    A step failed, the steps depending on it have not been started.
+    """
+
+    def __init__(self, step: str, report: StepReport):
+        super().__init__(f"step '{step}' failed")
+        self.step = step
+        self.report = report
+
+
+class Steps:
+    """
+    The generation of a project declared as named steps with config inputs, file outputs and dependencies.
+
+    A plugin returns the steps from `new` or `init` instead of doing the work itself, composo then runs them with
+    :func:`run_steps`: independent steps run in parallel, and steps whose inputs are unchanged and whose outputs
+    still exist as they were left by the previous run are skipped.
+
+    :Example:
+
+        def init(self, path):
+            steps = Steps()
+
+            @steps.step(inputs=["app.name.project"], outputs=["README.md"])
+            def readme():
+                current_writer().write("README.md", render_readme(self.config))
+
+            steps.add("venv", lambda: venv.create(path / ".venv"), inputs=["python"], outputs=[".venv"])
+            steps.add("install", install, outputs=[".venv/lib"], after=["venv", "readme"])
+            return steps
+    """
+
+    def __init__(self, jobs: typing.Optional[int] = None, processes: bool = False):
+        """
+        :param jobs: the maximum number of concurrently running steps, the number of CPUs by default
+        :param processes: whether the steps run in forked processes instead of threads, for CPU bound steps
+        """
+        self.jobs = jobs
+        self.processes = processes
+        self._steps: typing.Dict[str, Step] = {}
+
+    def add(self, name: str, run: typing.Callable[[], typing.Any],
+            inputs: typing.Optional[typing.Iterable[str]] = None, outputs: typing.Iterable[str] = (),
+            after: typing.Iterable[str] = ()) -> Step:
+        """
+        Declare a step.
+
+        :param name: the unique name of the step
+        :param run: the callable doing the work of the step
+        :param inputs: the dotted config keys the step depends on, the whole config if not given
+        :param outputs: the paths the step produces, relative to the project root; a step without outputs always
+            runs
+        :param after: the names of the steps that have to finish first
+        """
+        if name in self._steps:
+            raise ValueError(f"step '{name}' is declared twice")
+        step = Step(name, run, None if inputs is None else tuple(inputs), tuple(outputs), tuple(after))
+        self._steps[name] = step
+        return step
+
+    def step(self, name: typing.Optional[str] = None, **kwargs):
+        """
+        Declare the decorated function as step, named like the function by default, see :meth:`add`.
+        """
+        def decorator(func):
+            self.add(name or func.__name__, func, **kwargs)
+            return func
+        return decorator
+
+    def __getitem__(self, name: str) -> Step:
+        return self._steps[name]
+
+    def __iter__(self) -> typing.Iterator[Step]:
+        return iter(self._steps.values())
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def order(self) -> typing.List[Step]:
+        """
+        The steps in an order that respects their dependencies.
+
+        :raises ValueError: if a step depends on an unknown step or the dependencies form a cycle
+        """
+        for step in self:
+            unknown = [name for name in step.after if name not in self._steps]
+            if unknown:
+                raise ValueError(f"step '{step.name}' depends on unknown steps {unknown}")
+        ordered: typing.List[Step] = []
+        state: typing.Dict[str, bool] = {}  # False while visiting, True when done
+
+        def visit(step: Step, path: typing.Tuple[str, ...]):
+            if state.get(step.name) is False:
+                raise ValueError(f"the steps depend on each other in a cycle: {' -> '.join(path + (step.name,))}")
+            if step.name not in state:
+                state[step.name] = False
+                for name in step.after:
+                    visit(self._steps[name], path + (step.name,))
+                state[step.name] = True
+                ordered.append(step)
+
+        for step in self:
+            visit(step, ())
+        return ordered
+
+
+def _is_current(step: Step, writer: FileWriter, inputs: typing.Dict[str, str]) -> bool:
+    if step.outputs and writer.resumed_step(step.name, inputs, step.outputs):
+        return True
+    record = writer.step(step.name)
+    if writer.force or not step.outputs or record is None or record.get("inputs") != inputs:
+        return False
+    return record.get("outputs") == writer.outputs_state(step.outputs)
+
+
+def _run_step(step: Step, context: contextvars.Context) -> float:
+    start = time.perf_counter()
+    with tracing.span("plugin.step", step=step.name):
+        context.run(step.run)
+    return time.perf_counter() - start
+
+
+_pool_steps: typing.Optional[Steps] = None
+_pool_context: typing.Optional[contextvars.Context] = None
+
+
+def _set_pool_steps(steps: Steps, context: contextvars.Context):
+    global _pool_steps, _pool_context
+    _pool_steps, _pool_context = steps, context
+
+
+def _run_pool_step(name: str):
+    # runs in a forked worker, the writer of the run is a copy whose changes are sent back
+    context = _pool_context.copy()
+    duration = _run_step(_pool_steps[name], context)
+    writer = context.run(_writer_or_none)
+    return duration, writer.changes if writer is not None else None
+
+
+def _writer_or_none() -> typing.Optional[FileWriter]:
+    try:
+        return current_writer()
+    except RuntimeError:
+        return None
+
+
+def critical_path(steps: Steps, durations: typing.Mapping[str, float]) -> typing.Tuple[typing.List[str], float]:
+    """
+    The chain of dependent steps that took longest, i.e. the steps that bound the run time even with unlimited
+    parallelism.
+
+    :return: the names of the steps on the path and their total duration
+    """
+    finish: typing.Dict[str, float] = {}
+    previous: typing.Dict[str, typing.Optional[str]] = {}
+    for step in steps.order():
+        before = max(step.after, key=lambda name: finish[name], default=None)
+        previous[step.name] = before
+        finish[step.name] = durations.get(step.name, 0.0) + (finish[before] if before is not None else 0.0)
+    end = max(finish, key=lambda name: finish[name], default=None)
+    path = []
+    while end is not None:
+        path.append(end)
+        end = previous[end]
+    return path[::-1], finish[path[0]] if path else 0.0
+
+
+def run_steps(steps: Steps, writer: typing.Optional[FileWriter] = None, jobs: typing.Optional[int] = None,
+              processes: typing.Optional[bool] = None) -> StepReport:
+    """
+    Run the steps in parallel as their dependencies allow.
+
+    With a writer, steps whose recorded inputs and outputs are unchanged are skipped unless the writer forces a
+    rewrite, and the steps that ran are recorded in the manifest of the writer. A step depending on a step that ran
+    always runs as well.
+
+    :param steps: the declared steps
+    :param writer: the writer of the current run, see :func:`composo.files.current_writer`
+    :param jobs: the maximum number of concurrently running steps, those of the steps by default
+    :param processes: whether the steps run in forked processes instead of threads, those of the steps by default;
+        falls back to threads where forking is not available, e.g. in the workers of :func:`composo.batch.run_many`
+    :return: the status and timing of every step and the critical path
+    :raises StepError: if a step failed, after the running steps finished
+    """
+    order = steps.order()
+    jobs = jobs or steps.jobs or os.cpu_count() or 1
+    started = time.perf_counter()
+    results: typing.Dict[str, StepResult] = {}
+    durations: typing.Dict[str, float] = {}
+    ran: typing.Set[str] = set()
+    inputs: typing.Dict[str, typing.Dict[str, str]] = {}
+    context = contextvars.copy_context()
+    fork = None
+    # the workers of a batch are daemonic processes, which cannot fork workers of their own
+    if (steps.processes if processes is None else processes) and not multiprocessing.current_process().daemon:
+        fork = _fork_context()
+
+    pool: Executor
+    if fork is not None:
+        pool = ProcessPoolExecutor(max_workers=jobs, mp_context=fork, initializer=_set_pool_steps,
+                                   initargs=(steps, context))
+    else:
+        pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="composo-step")
+
+    def finish(step: Step, status: str, start: float, duration: float):
+        results[step.name] = StepResult(step.name, status, start - started, duration)
+        durations[step.name] = duration if status == RAN else 0.0
+        if writer is not None and step.outputs:
+            writer.record_step(step.name, inputs[step.name], step.outputs)
+
+    running: typing.Dict[Future, typing.Tuple[Step, float]] = {}
+    pending = list(order)
+    failed: typing.Optional[str] = None
+    error: typing.Optional[BaseException] = None
+    with pool:
+        while pending or running:
+            ready = [step for step in pending if all(name in results for name in step.after)]
+            while ready and failed is None:
+                for step in ready:
+                    pending.remove(step)
+                    if writer is not None:
+                        inputs[step.name] = writer.inputs(step.inputs)
+                        if not ran.intersection(step.after) and _is_current(step, writer, inputs[step.name]):
+                            finish(step, SKIPPED, time.perf_counter(), 0.0)
+                            continue
+                    if fork is not None:
+                        future = pool.submit(_run_pool_step, step.name)
+                    else:
+                        future = pool.submit(_run_step, step, context.copy())
+                    running[future] = (step, time.perf_counter())
+                # skipped steps may have made further steps ready
+                ready = [step for step in pending if all(name in results for name in step.after)]
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step, start = running.pop(future)
+                try:
+                    outcome = future.result()
+                except BaseException as exc:
+                    if failed is None:
+                        failed, error = step.name, exc
+                    continue
+                if fork is not None:
+                    duration, changes = outcome
+                    if writer is not None and changes is not None:
+                        writer.merge(*changes)
+                else:
+                    duration = outcome
+                ran.add(step.name)
+                finish(step, RAN, start, duration)
+
+    path, critical_time = critical_path(steps, durations)
+    report = StepReport([results[step.name] for step in order if step.name in results], path, critical_time,
+                        time.perf_counter() - started)
+    if failed is not None:
+        raise StepError(failed, report) from error
+    return report
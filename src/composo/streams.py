@@ -0,0 +1,211 @@
+import hashlib
+import io
+import itertools
+import mmap
+import os
+import shutil
+import stat
+import threading
+import time
+import typing
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+# streamed content up to this size is held in memory like rendered content
+INLINE_LIMIT = 1 << 20
+# the staged content held in memory at once, the rest waits in spool files
+DEFAULT_MAX_BUFFER = 64 << 20
+
+Chunk = typing.Union[str, bytes]
+# content produced piece by piece: chunks from an iterator or generator, a file object, or the path of a file
+Source = typing.Union[typing.Iterable[Chunk], typing.IO, os.PathLike]
+
+
+class Spooled(typing.NamedTuple):
+    hash: str
+    size: int
+    # the content if it is held in memory, otherwise it is in the file at path
+    data: typing.Optional[bytes]
+    path: typing.Optional[str] = None
+    # whether the file at path is a spool file of the run, which can be linked into place instead of copied
+    owned: bool = False
+
+
+def is_source(content: typing.Any) -> bool:
+    """
+    Whether content is streamed from a :data:`Source` instead of given as str or bytes.
+    """
+    if isinstance(content, (str, bytes, bytearray, memoryview)):
+        return False
+    return isinstance(content, os.PathLike) or hasattr(content, "read") or hasattr(content, "__iter__")
+
+
+def copy_fd(source: int, target: int, count: typing.Optional[int] = None) -> str:
+    """
+    Copy from the current offset of the source descriptor to the target descriptor within the kernel if possible:
+    by copy_file_range, which shares the extents on copy-on-write filesystems, by sendfile, or by reads and writes
+    of bounded chunks.
+
+    :param count: the number of bytes to copy, up to the end of the source by default
+    :return: the method used, one of `copy_file_range`, `sendfile` and `copy`
+    """
+    if count is None:
+        count = max(os.fstat(source).st_size - os.lseek(source, 0, os.SEEK_CUR), 0)
+    for method in ("copy_file_range", "sendfile"):
+        if not hasattr(os, method):
+            continue
+        copied = 0
+        try:
+            while copied < count:
+                if method == "copy_file_range":
+                    sent = os.copy_file_range(source, target, count - copied)
+                else:
+                    sent = os.sendfile(target, source, None, count - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            if copied == 0:
+                continue  # e.g. across filesystems on older kernels, the next method is tried
+            raise
+        return method
+    while count > 0:
+        chunk = os.read(source, min(CHUNK_SIZE, count))
+        if not chunk:
+            break
+        os.write(target, chunk)
+        count -= len(chunk)
+    return "copy"
+
+
+def file_digest(path: typing.Union[str, os.PathLike]) -> str:
+    """
+    The sha256 of a file, hashed from its pages in the page cache instead of chunks copied into memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path: Path, data: bytes):
+    """
+    Write a file of a cache by a rename, so concurrent processes read either the old or the whole new content.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{time.monotonic_ns()}")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _chunks(source: typing.Union[typing.Iterable[Chunk], typing.IO]) -> typing.Iterator[bytes]:
+    if hasattr(source, "read"):
+        source = iter(lambda: source.read(CHUNK_SIZE), source.read(0))  # type: ignore[union-attr]
+    for chunk in source:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def _fileno(source: typing.Any) -> typing.Optional[int]:
+    # the descriptor of a binary regular file, whose content can be copied within the kernel
+    if isinstance(source, io.TextIOBase) or not hasattr(source, "fileno"):
+        return None
+    try:
+        fd = source.fileno()
+        return fd if stat.S_ISREG(os.fstat(fd).st_mode) else None
+    except (OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+class Spool:
+    """
+    Spill area of a run for the content that is not held in memory: streamed content beyond :data:`INLINE_LIMIT`,
+    and any content once the staged content in memory reaches `max_buffer`. It lives on the filesystem of the
+    project, so spooled files are linked into place by the commit.
+
+    The content of a plugin is streamed in chunks of :data:`CHUNK_SIZE`, a regular file source is copied within the
+    kernel, and a path source is neither read nor copied before the commit, it is only hashed.
+    """
+
+    def __init__(self, directory: Path, max_buffer: int = DEFAULT_MAX_BUFFER):
+        self.directory = Path(directory)
+        self.max_buffer = max_buffer
+        self.buffered = 0
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def reserve(self, size: int) -> bool:
+        """
+        Count content held in memory until the run ends, if it still fits into the buffer.
+        """
+        with self._lock:
+            if self.buffered + size > self.max_buffer:
+                return False
+            self.buffered += size
+            return True
+
+    def _create(self) -> typing.Tuple[str, int]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        while True:
+            # the spool of a resumed run still holds the files of the interrupted one
+            path = str(self.directory / f"{os.getpid()}-{next(self._counter)}")
+            try:
+                return path, os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                continue
+
+    def spill(self, data: bytes, content_hash: str) -> Spooled:
+        """
+        Move content out of memory into a spool file.
+        """
+        path, fd = self._create()
+        with open(fd, "wb") as f:
+            f.write(data)
+        return Spooled(content_hash, len(data), None, path, True)
+
+    def spool(self, source: Source) -> Spooled:
+        """
+        Take the content of a source, in memory up to :data:`INLINE_LIMIT`, in a spool file beyond. Content held in
+        memory is reserved by the sink that keeps it, see :meth:`reserve`.
+        """
+        if isinstance(source, os.PathLike):
+            size = os.stat(source).st_size
+            if size <= INLINE_LIMIT:
+                with open(source, "rb") as f:
+                    data = f.read()
+                return Spooled(hashlib.sha256(data).hexdigest(), len(data), data)
+            return Spooled(file_digest(source), size, None, os.fspath(source), False)
+
+        fd = _fileno(source)
+        if fd is not None and os.fstat(fd).st_size - os.lseek(fd, 0, os.SEEK_CUR) > INLINE_LIMIT:
+            path, target = self._create()
+            try:
+                copy_fd(fd, target)
+            finally:
+                os.close(target)
+            return Spooled(file_digest(path), os.stat(path).st_size, None, path, True)
+
+        digest = hashlib.sha256()
+        buffered: typing.List[bytes] = []
+        size = 0
+        chunks = _chunks(source)  # type: ignore[arg-type]
+        for chunk in chunks:
+            digest.update(chunk)
+            buffered.append(chunk)
+            size += len(chunk)
+            if size > INLINE_LIMIT:
+                break
+        else:
+            return Spooled(digest.hexdigest(), size, b"".join(buffered))
+        path, fd = self._create()
+        with open(fd, "wb") as f:
+            f.writelines(buffered)
+            buffered.clear()
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        return Spooled(digest.hexdigest(), size, None, path, True)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
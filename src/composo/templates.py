@@ -0,0 +1,230 @@
+import codecs
+import functools
+import os
+import re
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from composo import tracing
+from composo.config import LayeredConfig
+from composo.files import FileWriter, current_writer, lookup
+
+# {{ app.name.project }} or {{ app.name.project | snake | upper }}, a leading backslash keeps the braces literal,
+# e.g. for GitHub workflows; the pattern starts with the literal braces, so the regex engine searches for them
+# instead of trying a match at every position of the template
+PLACEHOLDER = re.compile(r"{{\s*([A-Za-z_][\w.-]*)\s*((?:\|\s*\w+\s*)*)}}")
+
+_WORDS = re.compile(r"[A-Za-z0-9]+")
+
+# the bytes of a file that tell a template from a binary file, which is then streamed instead of read
+SNIFF_SIZE = 8192
+
+FILTERS: typing.Dict[str, typing.Callable[[str], str]] = {
+    "upper": str.upper,
+    "lower": str.lower,
+    "title": str.title,
+    "snake": lambda value: "_".join(word.lower() for word in _WORDS.findall(value)),
+    "kebab": lambda value: "-".join(word.lower() for word in _WORDS.findall(value)),
+    "pascal": lambda value: "".join(word[:1].upper() + word[1:] for word in _WORDS.findall(value)),
+}
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class _Placeholder(typing.NamedTuple):
+    key: str
+    filters: typing.Tuple[str, ...]
+
+
+@functools.lru_cache(maxsize=1024)
+def _placeholder(key: str, filters: str) -> _Placeholder:
+    # the same few placeholders recur across the templates of a skeleton, they are parsed once
+    return _Placeholder(key, tuple(f.strip() for f in filters.split("|")[1:]))
+
+
+class Template:
+    """
+    A template compiled into its literal text and placeholders, rendering is a single join.
+    """
+    __slots__ = ("name", "keys", "_parts")
+
+    def __init__(self, source: str, name: str = "<string>"):
+        self.name = name
+        parts: typing.List[typing.Union[str, _Placeholder]] = []
+        keys = set()
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            start = match.start()
+            if start > position and source[start - 1] == "\\":
+                parts.append(source[position:start - 1])
+                parts.append(match.group(0))
+            else:
+                placeholder = _placeholder(match.group(1), match.group(2))
+                if placeholder.filters:
+                    unknown = [f for f in placeholder.filters if f not in FILTERS]
+                    if unknown:
+                        raise TemplateError(f"{name}: unknown filters {unknown}, available are {sorted(FILTERS)}")
+                parts.append(source[position:start])
+                parts.append(placeholder)
+                keys.add(placeholder.key)
+            position = match.end()
+        parts.append(source[position:])
+        self._parts = tuple(part for part in parts if part != "")
+        # the config keys the template depends on, e.g. for FileWriter.write(depends_on=...)
+        self.keys = tuple(sorted(keys))
+
+    def render(self, config: typing.Union[typing.Mapping, "Context"]) -> str:
+        context = config if isinstance(config, Context) else Context(config)
+        return "".join(part if isinstance(part, str) else context.value(part, self.name) for part in self._parts)
+
+
+class Context:
+    """
+    The config values of a rendering, resolved and filtered once for all templates rendered with it.
+    """
+
+    def __init__(self, config: typing.Mapping):
+        self.config = config
+        self._values: typing.Dict[_Placeholder, str] = {}
+
+    def value(self, placeholder: _Placeholder, name: str = "<string>") -> str:
+        try:
+            return self._values[placeholder]
+        except KeyError:
+            pass
+        value = self.config.resolve(placeholder.key) if isinstance(self.config, LayeredConfig) else lookup(
+            self.config, placeholder.key)
+        if value is None:
+            raise TemplateError(f"{name}: '{placeholder.key}' is not configured")
+        text = str(value)
+        for filter_name in placeholder.filters:
+            text = FILTERS[filter_name](text)
+        self._values[placeholder] = text
+        return text
+
+
+class RenderedFile(typing.NamedTuple):
+    path: str
+    written: bool
+
+
+class TemplateEngine:
+    """
+    Renders templates with the config of the current project, the template service of composo for plugins.
+
+    Templates are compiled once per process: strings are cached by content, files by path, modification time and
+    size. A one-shot run compiles every template once, about as fast as plain string replacement; warm processes,
+    e.g. the daemon or the workers of a batch, render from the compiled templates several times faster.
+
+    Placeholders look like `{{ app.name.project }}`, optionally with filters like `{{ app.name.project | snake }}`,
+    see :data:`FILTERS`; `\\{{ ... }}` is rendered literally.
+
+    :Example:
+
+        from composo import templates
+
+        engine = templates.get_engine()
+        engine.render("# {{ app.name.project }}\\n", config)
+        engine.render_tree(Path(__file__).parent / "skeleton")
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self._files: typing.Dict[str, typing.Tuple[int, int, typing.Optional[Template]]] = {}
+        self._lock = threading.Lock()
+        self.compile = functools.lru_cache(maxsize=cache_size)(self._compile)
+
+    @staticmethod
+    def _compile(source: str, name: str = "<string>") -> Template:
+        return Template(source, name)
+
+    def load(self, path: typing.Union[str, Path], stat: typing.Optional[os.stat_result] = None
+             ) -> typing.Optional[Template]:
+        """
+        The compiled template of a file, None for binary files, which are copied as they are.
+        """
+        key = str(path)
+        stat = os.stat(key) if stat is None else stat
+        cached = self._files.get(key)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        template: typing.Optional[Template] = None
+        with open(key, "rb") as f:
+            head = f.read(SNIFF_SIZE)
+            if not _is_binary(head):
+                try:
+                    template = Template((head + f.read()).decode("utf-8"), key)
+                except UnicodeDecodeError:
+                    pass
+        with self._lock:
+            self._files[key] = (stat.st_mtime_ns, stat.st_size, template)
+        return template
+
+    def render(self, source: str, config: typing.Union[typing.Mapping, Context]) -> str:
+        return self.compile(source).render(config)
+
+    def render_tree(self, source: typing.Union[str, Path], target: str = "",
+                    config: typing.Optional[typing.Mapping] = None, writer: typing.Optional[FileWriter] = None,
+                    jobs: typing.Optional[int] = None) -> typing.List[RenderedFile]:
+        """
+        Render a directory of templates into the project, file names may contain placeholders as well.
+
+        Every file is written through the writer with the keys of its templates as inputs, so a later run only
+        renders the files whose inputs changed. The files are read, compiled and rendered by a pool of threads, the
+        writer records them one at a time, see :class:`composo.files.FileWriter`.
+
+        :param source: the directory of templates
+        :param target: the directory within the project the files are rendered to
+        :param config: the config the templates are rendered with, that of the writer by default
+        :param writer: the writer of the project, that of the current run by default
+        :param jobs: the number of threads, a few more than CPUs by default
+        :return: the rendered paths and whether they have been written
+        """
+        writer = current_writer() if writer is None else writer
+        context = Context(writer.config if config is None else config)
+        source = Path(source)
+        files = []
+        for directory, _, names in os.walk(source):
+            files.extend(os.path.join(directory, name) for name in names)
+
+        def render_file(path: str) -> RenderedFile:
+            relative = os.path.relpath(path, source).replace(os.sep, "/")
+            path_template = self.compile(relative, relative)
+            rendered_path = "/".join(part for part in (target.strip("/"), path_template.render(context)) if part)
+            stat = os.stat(path)
+            template = self.load(path, stat)
+            mode = stat.st_mode & 0o777
+            executable = mode if mode & 0o111 else None
+            if template is None:  # streamed through the spool of the writer
+                return RenderedFile(rendered_path, writer.write(rendered_path, Path(path),
+                                                                depends_on=path_template.keys, mode=executable))
+            keys = sorted(set(path_template.keys) | set(template.keys))
+            return RenderedFile(rendered_path, writer.write(rendered_path, lambda: template.render(context),
+                                                            depends_on=keys, mode=executable))
+
+        with tracing.span("templates.render_tree", source=str(source), files=len(files)):
+            if len(files) <= 1 or jobs == 1:
+                return [render_file(path) for path in files]
+            with ThreadPoolExecutor(max_workers=jobs or min(32, (os.cpu_count() or 1) + 4),
+                                    thread_name_prefix="composo-render") as pool:
+                return list(pool.map(render_file, files))
+
+
+def _is_binary(head: bytes) -> bool:
+    if b"\0" in head:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head)  # a character may be cut at the end of the head
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+_engine = TemplateEngine()
+
+
+def get_engine() -> TemplateEngine:
+    return _engine
@@ -0,0 +1,110 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import typing
+from pathlib import Path
+
+
+class Span(typing.NamedTuple):
+    name: str
+    start: float
+    duration: float
+    pid: int
+    tid: int
+    args: typing.Dict[str, typing.Any]
+
+
+class PhaseSummary(typing.NamedTuple):
+    name: str
+    calls: int
+    total: float
+    longest: float
+
+
+class Tracer:
+    """
+    Records the time spent in named spans of a composo run.
+
+    A disabled tracer records nothing, so spans can stay in hot paths. Plugins open their own spans by
+    :func:`span`.
+
+    :Example:
+
+        from composo import tracing
+
+        with tracing.span("render templates", files=len(templates)):
+            ...
+    """
+
+    def __init__(self, enabled: bool = False, profiling: bool = False):
+        self.enabled = enabled
+        # whether the profile of the run is reported, spans are also recorded for the run history only
+        self.profiling = profiling
+        self.origin = time.perf_counter()
+        self.spans: typing.List[Span] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, /, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append(Span(name, start - self.origin, time.perf_counter() - start, os.getpid(),
+                                   threading.get_ident(), args))
+
+    def summary(self) -> typing.List[PhaseSummary]:
+        """
+        The spans aggregated by name, in the order they were first entered.
+        """
+        phases: typing.Dict[str, PhaseSummary] = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            calls, total, longest = phases.get(span.name, PhaseSummary(span.name, 0, 0.0, 0.0))[1:]
+            phases[span.name] = PhaseSummary(span.name, calls + 1, total + span.duration, max(longest, span.duration))
+        return list(phases.values())
+
+    def chrome_trace(self) -> typing.Dict[str, typing.Any]:
+        """
+        The spans in the Chrome trace event format, which can be loaded into Perfetto or chrome://tracing.
+        """
+        events: typing.List[typing.Dict[str, typing.Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": f"composo ({pid})"}}
+            for pid in sorted({span.pid for span in self.spans})
+        ]
+        events.extend({"name": span.name, "cat": "composo", "ph": "X", "ts": span.start * 1e6,
+                       "dur": span.duration * 1e6, "pid": span.pid, "tid": span.tid, "args": span.args}
+                      for span in self.spans)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: typing.Union[str, Path]):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def enable(profile: bool = True) -> Tracer:
+    """
+    Start recording spans in this process.
+
+    :param profile: whether the profile of the run is reported, or the spans are only kept for its history
+    """
+    _tracer.enabled = True
+    _tracer.profiling = _tracer.profiling or profile
+    return _tracer
+
+
+def span(name: str, /, **args):
+    """
+    Time the enclosed block as a span named `name` of the current run, if profiling is enabled.
+    """
+    return _tracer.span(name, **args)
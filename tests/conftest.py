@@ -0,0 +1,62 @@
+import typing
+
+import pytest
+
+from composo.app import Composo
+
+
+class MockTyperApp:
+
+    def callback(self, **kwargs):
+        ...
+
+    def command(self, **kwargs):
+        ...
+
+
+class PluginLoader:
+    """
+    Loader of a plugin defined by a test, counting how often the plugin is loaded.
+    """
+
+    def __init__(self, plugin: typing.Callable[[dict], typing.Any]):
+        """
+        :param plugin: builds the plugin from its config, e.g. the plugin class
+        """
+        self.plugin = plugin
+        self.loaded = 0
+        self.instance = None
+
+    def load(self):
+        self.loaded += 1
+        return self
+
+    def init(self, config):
+        self.instance = self.plugin(config)
+        return self.instance
+
+
+@pytest.fixture
+def plugin_loader():
+    """
+    The :class:`PluginLoader` class, for tests that inspect the loader or the plugin it built.
+    """
+    return PluginLoader
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    Build an app working in tmp_path, e.g. `make_app({"touch": TouchPlugin}, config=CONFIG)`.
+
+    Plugins are given as loaders or as the callables building them, which are wrapped in a :class:`PluginLoader`.
+    Further keyword arguments are passed on to :class:`Composo`.
+    """
+    def make_app(plugins: typing.Mapping[str, typing.Any], config: typing.Optional[dict] = None, **kwargs):
+        loaders = {name: plugin if isinstance(plugin, PluginLoader) else PluginLoader(plugin)
+                   for name, plugin in plugins.items()}
+        kwargs.setdefault("app", MockTyperApp())
+        kwargs.setdefault("fopen", open)
+        kwargs.setdefault("getcwd", lambda: str(tmp_path))
+        return Composo(plugins=loaders, config={} if config is None else config, **kwargs)
+    return make_app
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from composo import aio
+from composo.files import current_writer
+
+
+class AsyncPlugin:
+
+    def __init__(self, config):
+        self.config = config
+        self.events = []
+
+    async def wait_for(self, name, other):
+        self.events.append(f"{name} started")
+        # deadlocks unless both steps run concurrently
+        await asyncio.wait_for(other.wait(), timeout=5)
+        self.events.append(f"{name} done")
+
+    async def new(self, name):
+        ready = {"git": asyncio.Event(), "venv": asyncio.Event()}
+
+        async def step(step_name, other):
+            ready[step_name].set()
+            await self.wait_for(step_name, ready[other])
+            return step_name.upper()
+
+        self.results = await aio.gather({"git": step("git", "venv"), "venv": step("venv", "git")})
+
+    async def init(self, path):
+        def render():
+            current_writer().write("README.md", f"# {self.config['name']}\n", depends_on=["name"])
+            return threading.get_ident()
+
+        self.render_thread = await aio.run_blocking(render)
+
+
+def test_resolve_passes_synchronous_results_through():
+    assert aio.resolve(42) == 42
+
+
+def test_async_plugin_steps_run_concurrently(tmp_path, make_app, plugin_loader):
+    loader = plugin_loader(AsyncPlugin)
+    app = make_app({"async": loader}, config={"name": "test-proj"})
+
+    app.new("test-proj", plugin="async", init=True)
+
+    plugin = loader.instance
+    assert plugin.results == {"git": "GIT", "venv": "VENV"}
+    assert plugin.events[:2] == ["git started", "venv started"]
+    assert plugin.render_thread != threading.get_ident()
+    assert (tmp_path / "test-proj" / "README.md").read_text() == "# test-proj\n"
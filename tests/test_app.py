@@ -174,3 +174,19 @@ def test_composo_init_proper_argument_and_config_forwarding():
                 }
     assert plugin.init_call_data == expected
     assert plugin.new_call_data is None
+
+
+def test_composo_init_merges_nested_config_keys():
+    loader = MockPluginLoader()
+    project_config = "plugin: test\nvcs:\n  git:\n    url: git@example.com:arand/test-proj.git\n"
+    fopener = MockFileOpener(test_files={'/home/arand/projects/test-proj/.composo.yaml': project_config})
+    app = Composo(
+        plugins={"test": loader}, config={"vcs": {"git": {"github": {"name": "ARand"}}}}, app=MockTyperApp(),
+        fopen=fopener.open, getcwd=lambda: "/home/arand/projects/test-proj"
+    )
+
+    app.init()
+
+    plugin = loader.initializer.plugin
+    assert plugin.init_call_data["vcs"] == {"git": {"github": {"name": "ARand"},
+                                                    "url": "git@example.com:arand/test-proj.git"}}
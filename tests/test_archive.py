@@ -0,0 +1,119 @@
+import io
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+from composo.archive import ArchiveError
+from composo.files import MANIFEST_FILE, current_writer
+from composo.shell.plugin import Shell
+
+CONFIG = {"author": {"name": "A. Rand Developer"}, "license": "mit"}
+
+
+class BrokenPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        print("rendering")
+        current_writer().write("README.md", f"# {name}\n")
+        raise RuntimeError("plugin failed")
+
+
+class ConfiguringPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        current_writer().write(".composo.yaml", "plugin: configuring\n")
+
+    def init(self, path):
+        current_writer().write(".composo.yaml", "plugin: configuring\ninitialized: true\n")
+
+
+class OpeningPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        current_writer().write("README.md", f"# {name}\n")
+        root = current_writer().root
+        os.makedirs(root, exist_ok=True)
+        with open(root / "LICENSE", "w") as f:
+            f.write("MIT\n")
+
+
+PLUGINS = {"shell": Shell, "broken": BrokenPlugin, "configuring": ConfiguringPlugin, "opening": OpeningPlugin}
+
+
+def test_new_streams_the_project_into_a_tar_gz(tmp_path, make_app):
+    target = tmp_path / "out" / "test-proj.tar.gz"
+    target.parent.mkdir()
+
+    make_app(PLUGINS, CONFIG).new("test-proj", plugin="shell", init=True, output_archive=str(target))
+
+    assert not (tmp_path / "test-proj").exists()
+    with tarfile.open(target) as tar:
+        names = tar.getnames()
+        script = tar.getmember("test-proj/bin/test-proj")
+        readme = tar.extractfile("test-proj/README.md").read().decode()
+    assert f"test-proj/{MANIFEST_FILE}" in names
+    assert "test-proj/.composo.yaml" in names
+    assert script.mode == 0o755
+    assert "A. Rand Developer" in readme
+
+
+def test_new_streams_a_zip_to_stdout(tmp_path, monkeypatch, make_app):
+    stdout = io.TextIOWrapper(io.BytesIO())
+    monkeypatch.setattr(sys, "stdout", stdout)
+
+    make_app(PLUGINS, CONFIG).new("test-proj", plugin="shell", output_archive="-", archive_format="zip")
+
+    with zipfile.ZipFile(io.BytesIO(stdout.buffer.getvalue())) as archive:
+        assert sorted(archive.namelist()) == [f"test-proj/{MANIFEST_FILE}", "test-proj/.composo.yaml",
+                                              "test-proj/README.md", "test-proj/bin/test-proj"]
+        assert archive.getinfo("test-proj/bin/test-proj").external_attr >> 16 & 0o777 == 0o755
+
+
+def test_failing_plugin_leaves_no_archive(tmp_path, capsys, make_app):
+    target = tmp_path / "test-proj.zip"
+
+    with pytest.raises(RuntimeError):
+        make_app(PLUGINS, CONFIG).new("test-proj", plugin="broken", output_archive=str(target))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_plugin_output_goes_to_stderr_when_archiving_to_stdout(tmp_path, monkeypatch, capsys, make_app):
+    stdout = io.TextIOWrapper(io.BytesIO())
+    monkeypatch.setattr(sys, "stdout", stdout)
+
+    with pytest.raises(RuntimeError):
+        make_app(PLUGINS, CONFIG).new("test-proj", plugin="broken", output_archive="-")
+
+    assert "rendering" in capsys.readouterr().err
+    assert b"rendering" not in stdout.buffer.getvalue()
+
+
+def test_a_rewritten_file_replaces_its_member(tmp_path, make_app):
+    target = tmp_path / "test-proj.tar.gz"
+
+    make_app(PLUGINS, CONFIG).new("test-proj", plugin="configuring", init=True, output_archive=str(target))
+
+    with tarfile.open(target) as tar:
+        assert tar.getnames().count("test-proj/.composo.yaml") == 1
+        assert tar.extractfile("test-proj/.composo.yaml").read() == b"plugin: configuring\ninitialized: true\n"
+
+
+def test_writes_around_the_writer_fail_the_archive(tmp_path, make_app):
+    target = tmp_path / "test-proj.zip"
+
+    with pytest.raises(ArchiveError, match="test-proj"):
+        make_app(PLUGINS, CONFIG).new("test-proj", plugin="opening", output_archive=str(target))
+
+    assert os.listdir(tmp_path) == []
+    with open(tmp_path / "LICENSE", "w"):  # the guard ends with the run
+        pass
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+from pathlib import Path
+
+import pytest
+
+from composo import processes
+from composo.batch import find_projects, map_many, run_many
+
+MANIFEST = """
+defaults:
+  plugin: touch
+projects:
+  - name: service-a
+  - name: service-b
+    license: apache
+  - name: broken
+"""
+
+
+class TouchPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name, **kwargs):
+        if name == "broken":
+            raise RuntimeError("cannot create broken")
+        Path(self.config["root"], name).write_text(f"{self.config.get('license')} {os.getpid()}")
+
+    def init(self, path):
+        (Path(path) / "initialized").write_text(self.config["plugin"])
+
+
+def fail_on_odd(item):
+    if item % 2:
+        raise ValueError(f"odd {item}")
+
+
+def test_run_many_reports_every_item():
+    for jobs in (1, 3):
+        results = run_many(fail_on_odd, [0, 1, 2, 3], names=["a", "b", "c", "d"], jobs=jobs)
+
+        assert [result.name for result in results] == ["a", "b", "c", "d"]
+        assert [result.ok for result in results] == [True, False, True, False]
+        assert results[1].error == "ValueError: odd 1"
+        assert all(result.duration >= 0 for result in results)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers are not forked")
+def test_workers_share_the_command_limit(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+
+    runners = [processes.get_runner(), processes.ProcessRunner(jobs=3)]
+    assert [runner.jobs for runner in runners] == [8, 3]
+    # four workers, only a given limit is kept as it is
+    assert map_many(lambda index: runners[index].jobs, [0, 1, 0, 1], jobs=4) == [2, 3, 2, 3]
+
+
+def test_ctrl_c_stops_the_batch():
+    ran = []
+
+    def task(item):
+        ran.append(item)
+        if item == "exit":
+            raise SystemExit(2)
+        if item == "interrupt":
+            raise KeyboardInterrupt
+
+    results = run_many(task, ["exit", "next"], names=["exit", "next"])
+    assert [result.ok for result in results] == [False, True]
+
+    with pytest.raises(KeyboardInterrupt):
+        run_many(task, ["interrupt", "never"], names=["interrupt", "never"])
+    assert ran == ["exit", "next", "interrupt"]
+
+
+def test_new_many_creates_projects_in_parallel(tmp_path, make_app):
+    (tmp_path / "projects.yaml").write_text(MANIFEST)
+    app = make_app({"touch": TouchPlugin}, config={"license": "mit", "root": str(tmp_path)})
+
+    results = app.new_many(app.load_manifest(Path("projects.yaml")), jobs=2)
+
+    assert [(result.name, result.ok) for result in results] == [
+        ("service-a", True), ("service-b", True), ("broken", False)]
+    assert (tmp_path / "service-a").read_text().startswith("mit ")
+    assert (tmp_path / "service-b").read_text().startswith("apache ")
+    assert not (tmp_path / "broken").exists()
+
+
+def make_monorepo(root: Path):
+    for project, plugin in [(".", "touch"), ("libs/a", "touch"), ("libs/b", "other"), ("node_modules/x", "touch"),
+                            (".venv/y", "touch"), ("libs/a/.git/z", "touch")]:
+        (root / project).mkdir(parents=True, exist_ok=True)
+        (root / project / ".composo.yaml").write_text(f"plugin: {plugin}\n")
+
+
+def test_find_projects_prunes_vendored_dirs(tmp_path):
+    make_monorepo(tmp_path)
+
+    assert find_projects(tmp_path) == [tmp_path, tmp_path / "libs" / "a", tmp_path / "libs" / "b"]
+
+
+def test_init_recursive_initializes_every_project(tmp_path, make_app):
+    make_monorepo(tmp_path)
+    app = make_app({"touch": TouchPlugin, "other": TouchPlugin})
+
+    results = app.init_recursive(Path("."), jobs=2)
+
+    assert sorted((result.name, result.ok) for result in results) == [(".", True), ("libs/a", True), ("libs/b", True)]
+    assert (tmp_path / "libs" / "b" / "initialized").read_text() == "other"
+    assert not (tmp_path / "node_modules" / "x" / "initialized").exists()
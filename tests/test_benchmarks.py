@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+RUN = Path(__file__).parents[1] / "benchmarks" / "run.py"
+
+
+def _run(*args):
+    return subprocess.run([sys.executable, str(RUN), *args], capture_output=True, text=True)
+
+
+def test_benchmark_results_are_stored_and_compared(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    result = _run("run", "--quick", "--repeat", "2", "-k", "config.parse.small", "-o", str(baseline))
+    assert result.returncode == 0, result.stderr
+
+    report = json.loads(baseline.read_text())
+    assert list(report["results"]) == ["config.parse.small"]
+    assert report["results"]["config.parse.small"]["median"] > 0
+
+    slower = json.loads(baseline.read_text())
+    slower["results"]["config.parse.small"]["median"] *= 2
+    current = tmp_path / "current.json"
+    current.write_text(json.dumps(slower))
+
+    assert _run("compare", str(baseline), str(baseline)).returncode == 0
+    regression = _run("compare", str(baseline), str(current), "--threshold", "1.5")
+    assert regression.returncode == 1
+    assert "REGRESSION" in regression.stdout
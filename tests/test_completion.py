@@ -0,0 +1,118 @@
+import io
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import typer
+
+from composo import completion
+from composo.app import Composo
+
+SRC_DIR = Path(__file__).parents[1] / "src"
+
+# The time a completion may take on top of a bare interpreter start, in seconds.
+COMPLETION_BUDGET = float(os.environ.get("COMPOSO_COMPLETION_BUDGET", "0.03"))
+
+HEAVY_MODULES = ("typer", "rich", "click", "yaml", "dependency_injector", "importlib.metadata")
+
+
+class PluginLoader:
+    def load(self):
+        raise AssertionError("completion must not import plugins")
+
+
+@pytest.fixture
+def index(tmp_path):
+    app = Composo(plugins={"shell": PluginLoader(), "python": PluginLoader()}, config={}, app=typer.Typer(),
+                  fopen=open, getcwd=lambda: str(tmp_path))
+    app.load_commands()
+    path = str(tmp_path / "cache" / completion.INDEX_FILE_NAME)
+    app.save_completion_index(path)
+    return path
+
+
+def complete(index, line, shell="bash", **environ):
+    out = io.StringIO()
+    if shell == "bash":
+        words = line.split()
+        environ.update(COMP_WORDS=line, COMP_CWORD=str(len(words) - (0 if line.endswith(" ") else 1)))
+    else:
+        environ.update(_TYPER_COMPLETE_ARGS=line)
+    code = completion.respond(f"complete_{shell}", environ, out, index)
+    return code, out.getvalue()
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("composo ", ["cache", "daemon", "init", "new", "new-batch", "plugins", "stats"]),
+    ("composo new", ["new", "new-batch"]),
+    ("composo new my-project --plugin ", ["shell", "python"]),
+    ("composo new my-project --plugin p", ["python"]),
+    ("composo new my-project --init --a", ["--archive-format"]),
+    ("composo new my-project --archive-format ", ["tar.gz", "zip"]),
+    ("composo --t", ["--trace-file"]),
+])
+def test_candidates_from_the_index(index, line, expected):
+    assert complete(index, line) == (0, "\n".join(expected) + "\n")
+
+
+def test_path_arguments_complete_directories(index, tmp_path, monkeypatch):
+    (tmp_path / "project-a").mkdir()
+    (tmp_path / "project-b.txt").write_text("")
+    monkeypatch.chdir(tmp_path)
+
+    assert complete(index, "composo init proj") == (0, "project-a/\n")
+
+
+def test_shell_formats(index):
+    assert complete(index, "composo ini", shell="zsh")[1] == (
+        "_arguments '*: :((\"init\":\"Initialize the project in the given PATH or the current working directory\"))'\n")
+    assert complete(index, "composo new x --plugin s", shell="fish", _TYPER_COMPLETE_FISH_ACTION="get-args") == (
+        0, "shell\n")
+    assert complete(index, "composo new x ", shell="fish", _TYPER_COMPLETE_FISH_ACTION="is-args") == (1, "")
+
+
+def test_stale_or_missing_index_falls_back_to_the_cli(index, tmp_path, monkeypatch):
+    assert completion.respond("source_bash", {}, io.StringIO(), index) is None
+    assert completion.respond("complete_bash", {}, io.StringIO(), str(tmp_path / "missing.json")) is None
+
+    monkeypatch.setattr(sys, "path", sys.path + [str(tmp_path / "site-packages")])
+    (tmp_path / "site-packages").mkdir()
+    assert completion.respond("complete_bash", {"COMP_WORDS": "composo ", "COMP_CWORD": "1"}, io.StringIO(),
+                              index) is None
+
+
+def _run_completion(cache_home, code="pass"):
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR), "XDG_CACHE_HOME": str(cache_home),
+           "_COMPOSO_COMPLETE": "complete_bash", "COMP_WORDS": "composo new x --", "COMP_CWORD": "3"}
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # as installed, with bytecode
+    main = "import sys; sys.argv[0] = 'composo'; from composo.main import main; main(); "
+    return subprocess.run([sys.executable, "-c", main + code], env=env, capture_output=True, text=True, check=True)
+
+
+def test_completion_is_answered_without_heavy_modules(tmp_path):
+    first = _run_completion(tmp_path)  # the cli answers and writes the index
+    second = _run_completion(tmp_path, f"print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+    assert (tmp_path / "composo" / completion.INDEX_FILE_NAME).exists()
+    assert "--plugin" in first.stdout.split()
+    assert second.stdout.splitlines()[:-1] == first.stdout.splitlines()
+    assert second.stdout.splitlines()[-1] == "[]"
+
+
+def test_completion_budget(tmp_path):
+    def best(run, repeat=5):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    _run_completion(tmp_path)  # writes the index and the bytecode
+    baseline = best(lambda: subprocess.run([sys.executable, "-c", "pass"], check=True))
+    elapsed = best(lambda: _run_completion(tmp_path))
+
+    assert elapsed - baseline < COMPLETION_BUDGET
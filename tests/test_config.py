@@ -0,0 +1,102 @@
+import os
+
+import yaml
+
+from composo.config import ConfigCache, LayeredConfig, safe_load
+
+
+class CountingOpener:
+    def __init__(self):
+        self.opened = 0
+
+    def __call__(self, path, *args, **kwargs):
+        self.opened += 1
+        return open(path, *args, **kwargs)
+
+
+def test_safe_load_matches_pyyaml():
+    document = "app:\n  name:\n    project: test-proj\nci: {gitlab: {pages: true}}\nitems: [1, 2.5, null]\n"
+
+    assert safe_load(document) == yaml.safe_load(document)
+
+
+def test_config_cache_skips_reparsing_unchanged_files(tmp_path):
+    path = tmp_path / ".composo.yaml"
+    path.write_text("plugin: python\nvcs: {git: {github: {name: ARand}}}\n")
+    opener = CountingOpener()
+    cache = ConfigCache()
+
+    first = cache.load(path, opener)
+    first["vcs"]["git"]["github"]["name"] = "changed by a plugin"
+    second = cache.load(path, opener)
+
+    assert opener.opened == 1
+    assert second == {"plugin": "python", "vcs": {"git": {"github": {"name": "ARand"}}}}
+
+
+def test_config_cache_reparses_modified_files(tmp_path):
+    path = tmp_path / ".composo.yaml"
+    path.write_text("plugin: python\n")
+    cache = ConfigCache()
+    cache.load(path)
+
+    path.write_text("plugin: shell\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert cache.load(path) == {"plugin": "shell"}
+
+
+DEFAULTS = {"author": {"name": "A. Rand Developer", "email": "a.rand@email.com"}, "license": "mit"}
+USER = {"vcs": {"git": {"github": {"name": "ARand"}}}, "author": {"name": "Jan"}}
+PROJECT = {"vcs": {"git": {"url": "git@example.com:arand/test-proj.git"}}, "plugin": "python"}
+
+
+def layered():
+    return LayeredConfig([("defaults", DEFAULTS), ("user", USER)]).with_layer("project", PROJECT)
+
+
+def test_layered_config_merges_nested_keys():
+    config = layered()
+
+    assert config.resolve("vcs.git.github.name") == "ARand"
+    assert config.resolve("vcs.git.url") == "git@example.com:arand/test-proj.git"
+    assert config["author"] == {"name": "Jan", "email": "a.rand@email.com"}
+    assert config.resolve("vcs.git.missing", "default") == "default"
+    assert {**config}.keys() == {"author", "license", "vcs", "plugin"}
+
+
+def test_layered_config_records_provenance():
+    config = layered().with_layer("cli", {"license": "apache"})
+
+    assert config.provenance("author.name") == "user"
+    assert config.provenance("author.email") == "defaults"
+    assert config.provenance("vcs.git.url") == "project"
+    assert config.provenance("license") == "cli"
+    assert config.provenance("missing") is None
+
+
+def test_layered_config_memoizes_and_shares_layers():
+    base = LayeredConfig([("defaults", DEFAULTS), ("user", USER)])
+    project = base.with_layer("project", PROJECT)
+
+    assert project.resolve("vcs.git") is project.resolve("vcs.git")
+    assert project.layers[:2] == base.layers
+    assert base.resolve("vcs.git.url") is None
+
+
+def test_scalar_layers_shadow_mappings_below():
+    config = LayeredConfig([("user", {"ci": {"gitlab": {"pages": True}}}), ("project", {"ci": False})])
+
+    assert config["ci"] is False
+
+
+def test_layered_config_dumps_as_plain_yaml():
+    dumped = yaml.safe_dump(layered())
+
+    assert yaml.safe_load(dumped) == {
+        "author": {"name": "Jan", "email": "a.rand@email.com"},
+        "license": "mit",
+        "plugin": "python",
+        "vcs": {"git": {"github": {"name": "ARand"}, "url": "git@example.com:arand/test-proj.git"}},
+    }
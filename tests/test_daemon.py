@@ -0,0 +1,119 @@
+import os
+import socket
+import stat
+import threading
+import time
+from pathlib import Path
+
+import typer
+
+from composo import daemon
+from composo.app import Composo
+
+
+class TouchPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        print(f"creating {name} in {os.getpid()}")
+        Path(name).write_text(self.config["plugin"])
+
+
+class TouchPluginLoader:
+    loads = 0
+
+    def load(self):
+        TouchPluginLoader.loads += 1
+        return self
+
+    def init(self, config):
+        return TouchPlugin(config)
+
+
+class Fingerprint:
+    def __init__(self):
+        self.value = "installed"
+
+    def __call__(self):
+        return self.value
+
+
+def start_daemon(socket_path: Path, fingerprint: Fingerprint, monkeypatch) -> threading.Thread:
+    monkeypatch.setattr(daemon, "installation_fingerprint", fingerprint)
+    app = Composo(plugins={"touch": TouchPluginLoader()}, config={}, app=typer.Typer(), fopen=open, getcwd=os.getcwd)
+    app.load_commands()
+    thread = threading.Thread(target=app.serve, args=(socket_path,), kwargs={"idle_timeout": 10}, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if daemon.is_running(socket_path):
+            break
+        time.sleep(0.05)
+    return thread
+
+
+def test_forward_without_daemon_falls_back(tmp_path):
+    assert daemon.forward(["new", "x"], tmp_path / "missing.sock") is None
+
+
+def test_daemon_runs_forwarded_commands(tmp_path, monkeypatch, capsys):
+    socket_path = tmp_path / "d.sock"
+    thread = start_daemon(socket_path, Fingerprint(), monkeypatch)
+    monkeypatch.chdir(tmp_path)
+
+    try:
+        assert daemon.forward(["new", "first", "--plugin", "touch"], socket_path) == 0
+        assert daemon.forward(["new", "second", "--plugin", "missing"], socket_path) == 2
+    finally:
+        assert daemon.stop(socket_path)
+        thread.join(5)
+
+    assert (tmp_path / "first").read_text() == "touch"
+    assert "creating first" in capsys.readouterr().out
+    assert TouchPluginLoader.loads == 1
+    assert not thread.is_alive()
+    assert not socket_path.exists()
+
+
+def test_daemon_invalidates_itself_when_plugins_change(tmp_path, monkeypatch):
+    socket_path = tmp_path / "d.sock"
+    fingerprint = Fingerprint()
+    thread = start_daemon(socket_path, fingerprint, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+
+    fingerprint.value = "upgraded"
+    assert daemon.forward(["new", "first", "--plugin", "touch"], socket_path) is None
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert not (tmp_path / "first").exists()
+
+
+def test_a_stalled_client_does_not_block_others(tmp_path, monkeypatch):
+    socket_path = tmp_path / "d.sock"
+    thread = start_daemon(socket_path, Fingerprint(), monkeypatch)
+    monkeypatch.chdir(tmp_path)
+
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        stalled.connect(str(socket_path))
+        started = time.monotonic()
+        assert daemon.forward(["new", "first", "--plugin", "touch"], socket_path) == 0
+        assert time.monotonic() - started < 4
+    finally:
+        stalled.close()
+        assert daemon.stop(socket_path)
+        thread.join(5)
+
+    assert not thread.is_alive()
+
+
+def test_only_the_user_can_connect(tmp_path, monkeypatch):
+    socket_path = tmp_path / "d.sock"
+    thread = start_daemon(socket_path, Fingerprint(), monkeypatch)
+
+    try:
+        assert stat.S_IMODE(socket_path.stat().st_mode) == 0o600
+    finally:
+        assert daemon.stop(socket_path)
+        thread.join(5)
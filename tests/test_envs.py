@@ -0,0 +1,60 @@
+import io
+import subprocess
+import zipfile
+
+import pytest
+
+from composo.envs import BIN_DIR, EnvironmentPool, env_python
+from composo.processes import ProcessError, ProcessRunner
+
+
+@pytest.fixture
+def wheelhouse(tmp_path):
+    wheelhouse = tmp_path / "wheels"
+    wheelhouse.mkdir()
+    info = "composo_demo-1.0.dist-info"
+    with zipfile.ZipFile(wheelhouse / "composo_demo-1.0-py3-none-any.whl", "w") as wheel:
+        wheel.writestr("composo_demo/__init__.py", "VERSION = '1.0'\n")
+        wheel.writestr(f"{info}/METADATA", "Metadata-Version: 2.1\nName: composo-demo\nVersion: 1.0\n")
+        wheel.writestr(f"{info}/WHEEL", "Wheel-Version: 1.0\nGenerator: composo\nRoot-Is-Purelib: true\n"
+                                        "Tag: py3-none-any\n")
+        wheel.writestr(f"{info}/RECORD", f"composo_demo/__init__.py,,\n{info}/METADATA,,\n{info}/WHEEL,,\n"
+                                         f"{info}/RECORD,,\n")
+    return wheelhouse
+
+
+@pytest.fixture
+def pool(tmp_path, wheelhouse):
+    return EnvironmentPool(tmp_path / "envs", wheelhouse=wheelhouse, offline=True,
+                           runner=ProcessRunner(out=io.StringIO()))
+
+
+def test_environments_are_built_once_and_cloned(tmp_path, pool):
+    lockfile = tmp_path / "requirements.lock"
+    lockfile.write_text("composo-demo==1.0\n")
+
+    first = pool.seed(tmp_path / "first" / ".venv", lockfile)
+    second = pool.seed(tmp_path / "second" / ".venv", lockfile)
+
+    assert (first.method, second.method) == ("build", "clone")
+    assert first.key == second.key
+    for result in (first, second):
+        output = subprocess.run([env_python(result.path), "-c", "import composo_demo, sys; print(sys.prefix)"],
+                                capture_output=True, text=True, check=True).stdout
+        assert output.strip() == str(result.path)
+    activate = (second.path / BIN_DIR / "activate").read_text()
+    assert str(second.path) in activate
+    assert str(pool.path) not in activate
+    assert len(pool.entries()) == 1
+
+    assert pool.prune(0) == 1
+    assert pool.entries() == [] and list(pool.path.iterdir()) == []
+
+
+def test_missing_wheels_fail_offline_without_a_pooled_environment(tmp_path, pool):
+    lockfile = tmp_path / "requirements.lock"
+    lockfile.write_text("composo-missing==1.0\n")
+
+    with pytest.raises(ProcessError):
+        pool.seed(tmp_path / "project" / ".venv", lockfile)
+    assert pool.entries() == [] and list(pool.path.iterdir()) == []
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from composo.config import LayeredConfig
+from composo.files import MANIFEST_FILE, FileWriter, current_writer
+
+CONFIG = {"app": {"name": {"project": "test-proj"}}, "author": {"name": "A. Rand Developer"}, "license": "mit"}
+
+
+class ReadmePlugin:
+    renders = 0
+
+    def __init__(self, config):
+        self.config = config
+
+    def render(self, key):
+        ReadmePlugin.renders += 1
+        return f"{key}: {self.config.get(key)}\n"
+
+    def init(self, path):
+        writer = current_writer()
+        writer.write("README.md", lambda: self.render("app"), depends_on=["app.name.project"])
+        writer.write("LICENSE", lambda: self.render("license"), depends_on=["license"])
+
+
+def generate(root, config, force=False):
+    writer = FileWriter(root, config, force=force)
+    with writer.activate():
+        ReadmePlugin(config).init(root)
+    return writer
+
+
+def test_unchanged_inputs_are_not_rendered_again(tmp_path):
+    generate(tmp_path, CONFIG)
+    renders = ReadmePlugin.renders
+    writer = generate(tmp_path, CONFIG)
+
+    assert ReadmePlugin.renders == renders
+    assert writer.written == []
+    assert sorted(writer.skipped) == ["LICENSE", "README.md"]
+
+
+def test_only_files_with_changed_inputs_are_rewritten(tmp_path):
+    generate(tmp_path, CONFIG)
+    writer = generate(tmp_path, {**CONFIG, "license": "apache", "author": {"name": "B. Rand"}})
+
+    assert writer.written == ["LICENSE"]
+    assert (tmp_path / "LICENSE").read_text().startswith("license: apache")
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert sorted(manifest["files"]) == ["LICENSE", "README.md"]
+
+
+def test_force_rewrites_everything(tmp_path):
+    generate(tmp_path, CONFIG)
+    writer = generate(tmp_path, CONFIG, force=True)
+
+    assert sorted(writer.written) == ["LICENSE", "README.md"]
+
+
+def test_run_flags_are_no_input_of_files(tmp_path):
+    renders = []
+
+    def generate_notes(config):
+        writer = FileWriter(tmp_path, LayeredConfig([("user", CONFIG), ("cli", config)]))
+        with writer.activate():
+            # rendered from the whole config
+            writer.write("NOTES.md", lambda: renders.append(config) or f"{writer.config['license']}\n")
+
+    generate_notes({"offline": False})
+    generate_notes({"offline": True, "dry_run": False, "resume": True})
+    generate_notes({"license": "apache"})
+
+    assert renders == [{"offline": False}, {"license": "apache"}]
+
+
+def test_deleted_files_are_restored(tmp_path):
+    generate(tmp_path, CONFIG)
+    (tmp_path / "LICENSE").unlink()
+    writer = generate(tmp_path, CONFIG)
+
+    assert writer.written == ["LICENSE"]
+
+
+def test_writer_is_only_available_during_generation():
+    with pytest.raises(RuntimeError):
+        current_writer()
+
+
+def test_composo_init_records_manifest(tmp_path, make_app):
+    (tmp_path / ".composo.yaml").write_text("plugin: readme\nlicense: mit\n")
+    app = make_app({"readme": ReadmePlugin})
+
+    app.init(Path("."))
+    (tmp_path / ".composo.yaml").write_text("plugin: readme\nlicense: apache\n")
+    renders = ReadmePlugin.renders
+    app.init(Path("."))
+
+    assert ReadmePlugin.renders == renders + 1
+    assert (tmp_path / "LICENSE").read_text() == "license: apache\n"
@@ -0,0 +1,72 @@
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from composo import helpcache
+
+SRC_DIR = Path(__file__).parents[1] / "src"
+
+HEAVY_MODULES = ("typer", "rich", "click", "yaml", "dependency_injector")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return str(tmp_path / helpcache.CACHE_FILE_NAME)
+
+
+def test_pages_are_cached_per_command_line_and_terminal(cache):
+    helpcache.store(["new", "--help"], "Usage: composo new\n", {"COLUMNS": "100"}, io.StringIO(), cache)
+
+    out = io.StringIO()
+    assert helpcache.lookup(["new", "--help"], {"COLUMNS": "100"}, out, cache)
+    assert out.getvalue() == "Usage: composo new\n"
+    assert not helpcache.lookup(["new", "--help"], {"COLUMNS": "60"}, io.StringIO(), cache)
+    assert not helpcache.lookup(["new", "--help"], {"COLUMNS": "100", "NO_COLOR": "1"}, io.StringIO(), cache)
+    assert not helpcache.lookup(["init", "--help"], {"COLUMNS": "100"}, io.StringIO(), cache)
+
+
+@pytest.mark.parametrize("args, cacheable", [
+    (["--help"], True),
+    (["new", "--help"], True),
+    (["new", "my-project", "--help"], False),
+    (["--profile", "--help"], False),
+    (["new"], False),
+])
+def test_only_plain_help_is_cached(args, cacheable):
+    assert helpcache.cacheable(args) is cacheable
+
+
+def test_recording_keeps_the_help_of_successful_runs(cache, capsys):
+    with pytest.raises(SystemExit):
+        with helpcache.recording(["new", "--help"], cache):
+            print("Usage: composo new")
+            sys.exit(0)
+    with pytest.raises(SystemExit):
+        with helpcache.recording(["init", "--help"], cache):
+            print("Error: no such option")
+            sys.exit(2)
+
+    assert capsys.readouterr().out == "Usage: composo new\nError: no such option\n"
+    assert helpcache.lookup(["new", "--help"], os.environ, io.StringIO(), cache)
+    assert not helpcache.lookup(["init", "--help"], os.environ, io.StringIO(), cache)
+
+
+def test_cached_help_is_printed_without_the_cli_stack(tmp_path):
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR), "XDG_CACHE_HOME": str(tmp_path / "cache"),
+           "XDG_CONFIG_HOME": str(tmp_path / "config"), "COLUMNS": "100"}
+    code = ("import sys; sys.argv = ['composo', 'init', '--help']; from composo.main import main\n"
+            "try:\n    main()\nfinally:\n"
+            f"    print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules), file=sys.stderr)")
+
+    def run():
+        return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+
+    rendered, cached = run(), run()
+
+    assert "Initialize the project" in rendered.stdout
+    assert cached.stdout == rendered.stdout
+    assert cached.stderr.strip() == "[]"
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+import typer
+
+from composo import history
+from composo.app import Composo
+from composo.files import current_writer
+from composo.history import Regression, RunHistory
+
+
+class ReadmePlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        current_writer().write("README.md", f"# {name}\n")
+
+
+class ReadmePluginLoader:
+    def load(self):
+        return self
+
+    def init(self, config):
+        return ReadmePlugin(config)
+
+
+def record(duration, command="new", plugin="python", version="1.0", exit_code=0):
+    return {"command": command, "plugin": plugin, "plugin_version": version, "exit_code": exit_code,
+            "duration": duration}
+
+
+def test_the_log_is_rotated_and_read_oldest_first(tmp_path):
+    log = RunHistory(tmp_path / history.HISTORY_FILE_NAME, max_bytes=300, backups=2)
+    for i in range(40):
+        log.append(record(i))
+
+    durations = [entry["duration"] for entry in log.records()]
+    assert durations == list(range(40 - len(durations), 40))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["history.jsonl", "history.jsonl.1",
+                                                                "history.jsonl.2"]
+    assert all(path.stat().st_size <= 300 for path in tmp_path.iterdir())
+
+
+def test_percentiles_per_group():
+    records = [record(i / 100, command="new" if i % 2 else "init", exit_code=int(i == 1)) for i in range(1, 101)]
+
+    stats = {stats.group: stats for stats in history.latencies(records, lambda entry: entry["command"])}
+
+    assert stats["new"].runs == 50 and stats["new"].failures == 1
+    assert stats["new"].p50 == pytest.approx(0.5)
+    assert stats["init"].p95 == pytest.approx(0.951)
+    assert history.percentile([0.2], 99) == 0.2
+
+
+def test_regressions_after_plugin_upgrades():
+    records = [record(0.1, version="1.0") for _ in range(3)] + [record(0.2, version="2.0") for _ in range(3)]
+    records += [record(0.1, plugin="shell", version="1.0") for _ in range(3)]
+    records += [record(0.11, plugin="shell", version="1.1") for _ in range(3)]
+    records += [record(0.1, plugin="go", version="1.0") for _ in range(3)]
+    records += [record(0.5, plugin="go", version="2.0") for _ in range(2)]
+
+    assert history.regressions(records) == [Regression("python", "new", "1.0", "2.0", 0.1, 0.2)]
+    assert [regression.plugin for regression in history.regressions(records, min_runs=2)] == ["go", "python"]
+    # a downgrade back to the fast version is no regression
+    assert history.regressions(records + [record(0.1, version="1.0")]) == []
+
+
+def test_runs_are_recorded_and_reported(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    log = RunHistory(tmp_path / "cache" / history.HISTORY_FILE_NAME)
+    app = Composo(plugins={"readme": ReadmePluginLoader()}, config={}, app=typer.Typer(), fopen=open,
+                  getcwd=lambda: str(tmp_path), run_history=log)
+    app.load_commands()
+
+    for args in (["new", "first", "--plugin", "readme"], ["new", "second", "--plugin", "missing"], ["stats"]):
+        with pytest.raises(SystemExit):
+            app.dispatch(args)
+
+    first, second = log.records()
+    assert {key: first[key] for key in ("command", "plugin", "exit_code", "files", "bytes")} == {
+        "command": "new", "plugin": "readme", "exit_code": 0, "files": 1, "bytes": len("# first\n")}
+    assert "plugin.new" in first["phases"]
+    assert second["exit_code"] == 2 and second["plugin"] is None
+    assert "latency by command" in capsys.readouterr().out
+    assert json.loads((tmp_path / "cache" / history.HISTORY_FILE_NAME).read_text().splitlines()[0]) == first
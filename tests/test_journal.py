@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+
+import pytest
+
+from composo.files import current_writer
+from composo.journal import JOURNAL_DIR, Journal, JournalError
+from composo.steps import Steps
+
+CONFIG = {"app": {"name": {"project": "test-proj"}}, "license": "mit"}
+
+
+class SlowPlugin:
+    # the run is killed before the last file, as by a CI timeout
+    killed = False
+    rendered = []
+
+    def __init__(self, config):
+        self.config = config
+
+    @staticmethod
+    def render(relative):
+        SlowPlugin.rendered.append(relative)
+        return f"{relative}\n"
+
+    def new(self, name):
+        current_writer().write(".composo.yaml", "plugin: slow\n")
+
+    def init(self, path):
+        steps = Steps(jobs=1)
+
+        @steps.step(inputs=["license"], outputs=["LICENSE"])
+        def license():
+            current_writer().write("LICENSE", lambda: self.render("LICENSE"), depends_on=["license"])
+
+        @steps.step(after=["license"])
+        def docs():
+            writer = current_writer()
+            writer.write("docs/index.md", lambda: self.render("docs/index.md"))
+            if SlowPlugin.killed:
+                os._exit(9)
+            writer.write("docs/usage.md", lambda: self.render("docs/usage.md"))
+
+        return steps
+
+
+def killed_init(app):
+    SlowPlugin.killed = True
+    process = multiprocessing.get_context("fork").Process(target=app.init, args=("test-proj",))
+    process.start()
+    process.join(30)
+    SlowPlugin.killed = False
+    SlowPlugin.rendered = []
+    assert process.exitcode == 9
+
+
+@pytest.fixture
+def project(tmp_path, make_app):
+    make_app({"slow": SlowPlugin}, CONFIG).new("test-proj", plugin="slow")
+    return tmp_path / "test-proj"
+
+
+def test_a_killed_init_is_resumed(tmp_path, project, make_app):
+    config = {**CONFIG, "journal_content": True}
+    killed_init(make_app({"slow": SlowPlugin}, config))
+    assert not (project / "LICENSE").exists()
+    assert (project / JOURNAL_DIR).is_dir()
+
+    make_app({"slow": SlowPlugin}, config).init("test-proj", resume=True)
+
+    assert SlowPlugin.rendered == ["docs/usage.md"]
+    assert (project / "LICENSE").read_text() == "LICENSE\n"
+    assert (project / "docs" / "index.md").read_text() == "docs/index.md\n"
+    assert (project / "docs" / "usage.md").exists()
+    assert not (project / JOURNAL_DIR).exists()
+
+
+def test_the_journal_keeps_no_content_by_default(tmp_path, project, make_app):
+    killed_init(make_app({"slow": SlowPlugin}, CONFIG))
+    assert b"docs/index.md\n" not in (project / JOURNAL_DIR / "journal").read_bytes()
+
+    make_app({"slow": SlowPlugin}, CONFIG).init("test-proj", resume=True)
+
+    # the content staged in memory is rendered again, the finished steps are not skipped without their files
+    assert SlowPlugin.rendered == ["LICENSE", "docs/index.md", "docs/usage.md"]
+    assert (project / "docs" / "index.md").read_text() == "docs/index.md\n"
+    assert not (project / JOURNAL_DIR).exists()
+
+
+def test_without_resume_a_killed_init_starts_over(tmp_path, project, make_app):
+    killed_init(make_app({"slow": SlowPlugin}, CONFIG))
+
+    make_app({"slow": SlowPlugin}, CONFIG).init("test-proj")
+
+    assert SlowPlugin.rendered == ["LICENSE", "docs/index.md", "docs/usage.md"]
+    assert not (project / JOURNAL_DIR).exists()
+
+
+def test_an_interrupted_commit_is_rolled_back(tmp_path, project, make_app):
+    (project / "LICENSE").write_text("old\n")
+    journal = Journal(project)
+    journal.begin("init")
+    journal.file("LICENSE", {}, b"new\n")
+    journal.commit(["LICENSE", "docs/index.md"])
+    # killed halfway through the renames
+    (project / "LICENSE.tmp").write_text("new\n")
+    os.replace(project / "LICENSE.tmp", project / "LICENSE")
+    (project / "docs").mkdir()
+    (project / "docs" / "index.md").write_text("index\n")
+    (project / "docs" / ".index.md.composo-1").write_text("index\n")
+
+    with pytest.raises(JournalError, match="--resume"):
+        make_app({"slow": SlowPlugin}, CONFIG).init("test-proj")
+    assert make_app({"slow": SlowPlugin}, CONFIG).rollback("test-proj")
+
+    assert (project / "LICENSE").read_text() == "old\n"
+    assert not (project / "docs").exists()
+    assert not (project / JOURNAL_DIR).exists()
+    assert not make_app({"slow": SlowPlugin}, CONFIG).rollback("test-proj")
+
+
+def test_an_interrupted_new_is_rolled_back(tmp_path, make_app):
+    journal = Journal(tmp_path / "other-proj")
+    journal.begin("new")
+    (tmp_path / ".other-proj.composo-1").mkdir()
+
+    assert make_app({"slow": SlowPlugin}, CONFIG).rollback("other-proj")
+    assert os.listdir(tmp_path) == []
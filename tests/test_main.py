@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import dependency_injector.providers as providers
+import pytest
+
+from composo import ioc
+from composo import main as composo_main
+
+SRC_DIR = Path(__file__).parents[1] / "src"
+
+# The time composo may take on top of a bare interpreter start to answer `--version`, in seconds.
+STARTUP_BUDGET = float(os.environ.get("COMPOSO_STARTUP_BUDGET", "0.15"))
+
+HEAVY_MODULES = ("typer", "rich", "click", "yaml", "dependency_injector")
+
+
+def _run_python(code, *args):
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR)}
+    env.pop(composo_main.COMPLETION_ENV, None)
+    return subprocess.run([sys.executable, "-c", code, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def _best_time(code, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run_python(code, *args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def test_version_does_not_import_heavy_modules():
+    code = ("import sys; sys.argv = ['composo', '--version']; "
+            "from composo.main import main; main(); "
+            f"print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = _run_python(code)
+
+    assert result.stdout.splitlines()[0].startswith("composo ")
+    assert result.stdout.splitlines()[-1] == "[]"
+
+
+def test_the_cli_imports_the_modules_of_features_when_used():
+    feature_modules = ("tarfile", "http.client", "composo.archive", "composo.remote", "composo.envs",
+                       "composo.templates", "composo.main")
+    code = ("import sys; from composo import ioc; ioc.App.app(plugins={}).load_commands(); "
+            f"print(sorted(m for m in {feature_modules!r} if m in sys.modules))")
+
+    assert _run_python(code).stdout.splitlines()[-1] == "['composo.archive']"
+
+
+def test_version_startup_budget():
+    baseline = _best_time("pass")
+    elapsed = _best_time("import sys; from composo.main import main; sys.argv[0] = 'composo'; main()", "--version")
+
+    assert elapsed - baseline < STARTUP_BUDGET
+
+
+@pytest.mark.parametrize("args, plugins, config", [
+    ([], False, False),
+    (["--help"], False, False),
+    (["init", "--help"], False, False),
+    (["new", "--help"], True, False),
+    (["new", "my-project"], True, True),
+    (["init"], True, True),
+])
+def test_startup_mode_selection(args, plugins, config):
+    assert composo_main.needs_plugins(args) is plugins
+    assert composo_main.needs_config(args) is config
+
+
+def test_root_help_skips_plugin_discovery(monkeypatch, capsys, tmp_path):
+    def discover():
+        raise AssertionError("plugins must not be discovered for the root help")
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))  # renders the help instead of printing a cached one
+    monkeypatch.setattr(sys, "argv", ["composo", "--help"])
+    with ioc.App.plugins.override(providers.Callable(discover)):
+        with pytest.raises(SystemExit) as exc:
+            composo_main.main()
+
+    assert exc.value.code == 0
+    assert "new" in capsys.readouterr().out
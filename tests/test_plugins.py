@@ -0,0 +1,64 @@
+from pathlib import Path
+
+from composo.plugins import PluginIndex, PluginRecord, scan_plugins
+
+
+def make_dist(site_packages: Path, name: str, plugins: dict):
+    dist_info = site_packages / f"{name}-1.0.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n")
+    entries = "".join(f"{plugin} = {value}\n" for plugin, value in plugins.items())
+    (dist_info / "entry_points.txt").write_text(f"[composo.plugins]\n{entries}")
+    return dist_info
+
+
+class CountingScan:
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def __call__(self, group):
+        self.calls += 1
+        return scan_plugins(group, path=self.path)
+
+
+def test_scan_plugins_reads_entry_points(tmp_path):
+    make_dist(tmp_path, "composo-python", {"python": "composo_python:init"})
+
+    assert scan_plugins(path=[str(tmp_path)]) == [
+        PluginRecord("python", "composo_python:init", "composo.plugins", "composo-python", "1.0")]
+
+
+def test_index_is_reused_across_runs(tmp_path):
+    site_packages = tmp_path / "site-packages"
+    make_dist(site_packages, "composo-python", {"python": "composo_python:init"})
+    scan = CountingScan([str(site_packages)])
+
+    first = PluginIndex(tmp_path / "cache", scan=scan, path=[str(site_packages)]).plugins()
+    second = PluginIndex(tmp_path / "cache", scan=scan, path=[str(site_packages)]).plugins()
+
+    assert scan.calls == 1
+    assert first == second
+    assert second["python"].value == "composo_python:init"
+
+
+def test_index_is_invalidated_by_installs(tmp_path):
+    site_packages = tmp_path / "site-packages"
+    make_dist(site_packages, "composo-python", {"python": "composo_python:init"})
+    scan = CountingScan([str(site_packages)])
+    PluginIndex(tmp_path / "cache", scan=scan, path=[str(site_packages)]).plugins()
+
+    make_dist(site_packages, "composo-shell", {"shell": "composo.shell:init"})
+    plugins = PluginIndex(tmp_path / "cache", scan=scan, path=[str(site_packages)]).plugins()
+
+    assert scan.calls == 2
+    assert sorted(plugins) == ["python", "shell"]
+
+
+def test_rebuild_rescans(tmp_path):
+    scan = CountingScan([str(tmp_path)])
+    index = PluginIndex(tmp_path / "cache", scan=scan, path=[str(tmp_path)])
+    index.records()
+    index.rebuild()
+
+    assert scan.calls == 2
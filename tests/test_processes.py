@@ -0,0 +1,90 @@
+import io
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+from composo.processes import NOT_FOUND, ProcessError, ProcessRunner
+from composo.shell.plugin import Shell
+
+CONFIG = {"author": {"name": "A. Rand Developer"}, "license": "mit", "vcs": {"git": {"github": {"name": "ARand"}}}}
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_output_is_streamed_with_the_name_as_prefix():
+    out = io.StringIO()
+    result = ProcessRunner(out=out).run(python("print('one'); print('two')"), name="count")
+
+    assert result.ok and result.returncode == 0
+    assert result.output == "one\ntwo\n"
+    assert out.getvalue() == "[count] one\n[count] two\n"
+    assert result.duration > 0
+
+
+def test_failures_raise_or_are_returned():
+    runner = ProcessRunner(out=io.StringIO())
+
+    with pytest.raises(ProcessError, match="'fail' exited with 3") as exc:
+        runner.run(python("import sys; print('broken'); sys.exit(3)"), name="fail")
+    assert exc.value.result.output == "broken\n"
+
+    assert runner.run(["composo-no-such-command"], check=False).returncode == NOT_FOUND
+
+
+def test_commands_are_killed_after_their_timeout():
+    result = ProcessRunner(out=io.StringIO()).run(python("import time; time.sleep(10)"), timeout=0.2, check=False)
+
+    assert result.timed_out and not result.ok
+    assert result.duration < 5
+
+
+def test_independent_commands_run_concurrently_within_the_limit():
+    sleep = python("import time; time.sleep(0.5)")
+    runner = ProcessRunner(jobs=2, out=io.StringIO())
+
+    start = time.perf_counter()
+    results = runner.run_all({"a": sleep, "b": sleep})
+    assert time.perf_counter() - start < 0.9
+    assert [result.name for result in results] == ["a", "b"]
+
+    start = time.perf_counter()
+    runner.run_all({"a": sleep, "b": sleep, "c": sleep})
+    assert time.perf_counter() - start >= 1.0
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_shell_projects_are_git_repositories(tmp_path, make_app):
+    app = make_app({"shell": lambda config: Shell(config, runner=ProcessRunner(out=io.StringIO()))}, CONFIG)
+
+    app.new("test-proj", plugin="shell")
+    app.new("dry-proj", plugin="shell", dry_run=True)
+
+    assert (tmp_path / "test-proj" / ".git").is_dir()
+    assert (tmp_path / "test-proj" / "bin" / "test-proj").exists()
+    assert not (tmp_path / "dry-proj").exists()
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_git_runs_after_the_commit(tmp_path, make_app, monkeypatch):
+    app = make_app({"shell": lambda config: Shell(config, runner=ProcessRunner(out=io.StringIO()))}, CONFIG)
+    renames = []
+    rename = os.rename
+    monkeypatch.setattr(os, "rename", lambda source, target: renames.append(target) or rename(source, target))
+
+    app.new("test-proj", plugin="shell")
+
+    # the new project is renamed into place as a whole, git found no directory to initialize before
+    assert renames == [tmp_path / "test-proj"]
+    assert (tmp_path / "test-proj" / ".git").is_dir()
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "utime", fail)
+    with pytest.raises(OSError, match="disk full"):
+        app.new("failed-proj", plugin="shell")
+    assert not (tmp_path / "failed-proj").exists()
@@ -0,0 +1,151 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from composo.files import current_writer
+from composo.remote import ConnectionPool, FetchCache, OfflineError, RemoteError, RemoteSource
+
+FRAGMENTS = {
+    "/license/mit": b"MIT License\n\nCopyright (c) {{ author.name }}\n",
+    "/license/expat": b"MIT License\n\nCopyright (c) {{ author.name }}\n",
+    "/ci/gitlab/pages/true": b"pages:\n  script: make docs\n",
+}
+
+
+class FragmentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        self.server.peers.add(self.client_address)
+        data = FRAGMENTS.get(self.path)
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.server.truncate:  # the connection breaks off before the announced length
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FragmentHandler)
+    server.requests = []
+    server.peers = set()
+    server.truncate = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def source(server, tmp_path, **kwargs) -> RemoteSource:
+    return RemoteSource(url(server), FetchCache(tmp_path / "templates"), pool=ConnectionPool(), **kwargs)
+
+
+def test_fragments_are_revalidated_by_etag(server, tmp_path):
+    first = source(server, tmp_path)
+    assert first.fetch("license/mit") == FRAGMENTS["/license/mit"]
+    assert first.fetch("license/expat") == FRAGMENTS["/license/expat"]
+    assert first.fetch("license/mit") == FRAGMENTS["/license/mit"]  # from memory
+    # one connection for both fragments, one object for both URLs
+    assert len(server.peers) == 1 and first.pool.created == 1
+    assert len(list((tmp_path / "templates" / "objects").glob("*/*"))) == 1
+
+    second = source(server, tmp_path)
+    assert second.fetch("license/mit") == FRAGMENTS["/license/mit"]
+
+    assert [(path, etag is not None) for path, etag in server.requests] == [
+        ("/license/mit", False), ("/license/expat", False), ("/license/mit", True)]
+
+
+def test_offline_only_cached_fragments_are_used(server, tmp_path):
+    source(server, tmp_path).fetch("license/mit")
+
+    offline = source(server, tmp_path, offline=True)
+    assert offline.fetch("license/mit") == FRAGMENTS["/license/mit"]
+    with pytest.raises(OfflineError, match="license/expat"):
+        offline.fetch("license/expat")
+    assert len(server.requests) == 1
+
+
+def test_an_unreachable_server_falls_back_to_the_cache(server, tmp_path, capsys):
+    source(server, tmp_path).fetch("license/mit")
+    server.shutdown()
+    server.server_close()
+
+    assert source(server, tmp_path).fetch("license/mit") == FRAGMENTS["/license/mit"]
+    assert "using the cached copy" in capsys.readouterr().err
+    with pytest.raises(RemoteError, match="cannot be fetched"):
+        source(server, tmp_path).fetch("license/expat")
+
+
+def test_a_truncated_response_falls_back_to_the_cache(server, tmp_path, capsys):
+    source(server, tmp_path).fetch("license/mit")
+    server.truncate = True
+
+    assert source(server, tmp_path).fetch("license/mit") == FRAGMENTS["/license/mit"]
+    assert "using the cached copy: IncompleteRead" in capsys.readouterr().err
+    with pytest.raises(RemoteError, match="cannot be fetched: IncompleteRead"):
+        source(server, tmp_path).fetch("license/expat")
+
+
+def test_missing_fragments_are_errors(server, tmp_path):
+    with pytest.raises(RemoteError, match="HTTP 404"):
+        source(server, tmp_path).fetch("license/unknown")
+
+
+class RemotePlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        fragments = RemoteSource.from_config(self.config)
+        writer = current_writer()
+        writer.write("LICENSE", lambda: fragments.render_key("license", self.config), depends_on=["license"])
+        writer.write(".gitlab-ci.yml", lambda: fragments.text(fragments.key_name("ci.gitlab.pages", self.config)))
+
+
+def test_new_renders_remote_fragments_offline(server, tmp_path, make_app):
+    config = {"author": {"name": "A. Rand Developer"}, "license": "mit", "ci": {"gitlab": {"pages": True}},
+              "cache_dir": str(tmp_path / "cache"), "templates": {"url": url(server)}}
+    app = make_app({"remote": RemotePlugin}, config)
+
+    app.new("online", plugin="remote")
+    server.shutdown()
+    app.new("offline", plugin="remote", offline=True)
+
+    for project in ("online", "offline"):
+        assert (tmp_path / project / "LICENSE").read_text() == "MIT License\n\nCopyright (c) A. Rand Developer\n"
+        assert (tmp_path / project / ".gitlab-ci.yml").read_bytes() == FRAGMENTS["/ci/gitlab/pages/true"]
+    with pytest.raises(OfflineError):
+        app.new("apache", plugin="remote", offline=True, license="apache")
+    assert not (tmp_path / "apache").exists()
@@ -0,0 +1,157 @@
+from pathlib import Path
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from composo.schema import ConfigError, ConfigIssue, SchemaRegistry, compile_schema, scan_schemas
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "flavour": {"enum": ["bin", "lib"]},
+        "ci": {
+            "type": "object",
+            "properties": {
+                "gitlab": {"type": "object", "properties": {"pages": {"type": "boolean"}},
+                           "additionalProperties": False},
+            },
+        },
+        "tags": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["flavour"],
+}
+
+
+class TouchPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        ...
+
+    def init(self, path):
+        (Path(path) / "initialized").write_text(self.config["flavour"])
+
+
+@pytest.fixture
+def touch_app(make_app):
+    def touch_app(loader):
+        return make_app({"touch": loader}, config={"author": {"name": "A. Rand Developer"}},
+                        schemas=SchemaRegistry(schemas={"touch": SCHEMA}))
+    return touch_app
+
+
+def test_every_issue_is_reported():
+    issues = []
+    compile_schema(SCHEMA)({"ci": {"gitlab": {"pagse": True}}, "flavour": "app", "tags": ["a", 1]}, "", issues)
+
+    assert issues == [("ci.gitlab.pagse", "unknown key, did you mean 'pages'?"),
+                      ("flavour", "expected one of ['bin', 'lib'], got 'app'"),
+                      ("tags[1]", "expected string, got int 1")]
+
+
+def test_core_keys_are_validated_with_those_of_the_plugin():
+    registry = SchemaRegistry(schemas={"touch": SCHEMA})
+
+    issues = registry.validate({"plugin": "touch", "history": {"max_bytes": -1, "backup": 3}}, source="config")
+
+    assert [str(issue) for issue in issues] == [
+        "config: history.max_bytes: expected at least 0, got -1",
+        "config: history.backup: unknown key, did you mean 'backups'?",
+        "config: flavour: is required"]
+
+
+def test_init_fails_before_the_plugin_is_imported(tmp_path, touch_app, plugin_loader):
+    (tmp_path / ".composo.yaml").write_text("plugin: touch\nflavour: lib\napp: {name: {pakage: x}}\n")
+    loader = plugin_loader(TouchPlugin)
+
+    with pytest.raises(ConfigError) as info:
+        touch_app(loader).init(Path("."))
+
+    assert info.value.issues == [ConfigIssue(str(tmp_path / ".composo.yaml"), "app.name.pakage",
+                                             "unknown key, did you mean 'package'?")]
+    assert loader.loaded == 0
+
+
+def test_cli_init_fails_on_an_invalid_config(tmp_path, make_app, plugin_loader):
+    (tmp_path / ".composo.yaml").write_text("plugin: touch\nflavour: lib\napp: {name: {pakage: x}}\n")
+    cli = typer.Typer()
+    make_app({"touch": plugin_loader(TouchPlugin)}, app=cli,
+             schemas=SchemaRegistry(schemas={"touch": SCHEMA})).load_commands()
+
+    result = CliRunner().invoke(cli, ["init", str(tmp_path)])
+
+    assert result.exit_code == 1
+    assert "did you mean 'package'?" in result.output
+    assert not (tmp_path / "initialized").exists()
+
+
+def test_invalid_yaml_is_a_config_error(tmp_path, touch_app, plugin_loader):
+    (tmp_path / ".composo.yaml").write_text("plugin: [touch\n")
+
+    with pytest.raises(ConfigError, match="invalid YAML"):
+        touch_app(plugin_loader(TouchPlugin)).init(Path("."))
+
+
+def test_all_projects_are_validated_before_any_is_initialized(tmp_path, touch_app, plugin_loader):
+    for project, config in [("a", "plugin: touch\nflavour: bin\n"), ("b", "plugin: touch\nflavour: 1\n"),
+                            ("c", "plugin: other\n"), ("d", "plugin: touch\nflavour: lib\n")]:
+        (tmp_path / project).mkdir()
+        (tmp_path / project / ".composo.yaml").write_text(config)
+    loader = plugin_loader(TouchPlugin)
+
+    with pytest.raises(ConfigError) as info:
+        touch_app(loader).init_recursive(Path("."), jobs=2)
+
+    found = [(Path(issue.source).parent.name, issue.key) for issue in info.value.issues]
+    assert found == [("b", "flavour"), ("c", "plugin")]
+    assert loader.loaded == 0
+    assert not list(tmp_path.glob("*/initialized"))
+
+    (tmp_path / "b" / ".composo.yaml").write_text("plugin: touch\nflavour: lib\n")
+    (tmp_path / "c" / ".composo.yaml").write_text("plugin: touch\nflavour: lib\n")
+    results = touch_app(loader).init_recursive(Path("."), jobs=2)
+    assert all(result.ok for result in results) and loader.loaded == 1
+
+
+def test_batch_projects_are_validated(tmp_path, touch_app, plugin_loader):
+    loader = plugin_loader(TouchPlugin)
+
+    with pytest.raises(ConfigError, match="project 'b': flavour"):
+        touch_app(loader).new_many([{"name": "a", "plugin": "touch", "flavour": "bin"},
+                                    {"name": "b", "plugin": "touch", "flavour": "app"}])
+    assert loader.loaded == 0
+
+
+def test_published_schemas_are_kept_in_an_index(tmp_path):
+    dist_info = tmp_path / "site-packages" / "composo_shell-1.0.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: composo-shell\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text("[composo.schemas]\nshell = composo.shell.schema:SCHEMA\n")
+    path = [str(tmp_path / "site-packages")]
+    scans = []
+
+    def scan():
+        scans.append(path)
+        return scan_schemas(path=path)
+
+    for _ in range(2):
+        registry = SchemaRegistry(tmp_path / "cache", scan=scan, path=path)
+        assert registry.validate({"plugin": "shell", "flavour": "a b"})[0].key == "flavour"
+    assert len(scans) == 1
+
+
+def test_a_broken_schema_is_skipped(tmp_path, capsys):
+    dist_info = tmp_path / "site-packages" / "composo_plugins-1.0.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: composo-plugins\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text("[composo.schemas]\nshell = composo.shell.schema:SCHEMA\n"
+                                                "broken = composo_no_such_module.schema:SCHEMA\n")
+    path = [str(tmp_path / "site-packages")]
+
+    registry = SchemaRegistry(tmp_path / "cache", scan=lambda: scan_schemas(path=path), path=path)
+
+    assert list(registry.published()) == ["shell"]
+    assert registry.validate({"plugin": "broken", "flavour": "any"}) == []
+    assert "the schema of plugin 'broken'" in capsys.readouterr().err
@@ -0,0 +1,123 @@
+import os
+import threading
+
+import pytest
+
+from composo.files import current_writer
+from composo.shell.plugin import Shell
+from composo.skeletons import SkeletonCache, depends_on_name
+from composo.staging import materialize
+
+CONFIG = {"author": {"name": "A. Rand Developer"}, "license": "mit"}
+
+
+class SkeletonPlugin:
+    renders = []
+
+    def __init__(self, config):
+        self.config = config
+
+    def render(self, path, content):
+        def render():
+            SkeletonPlugin.renders.append(path)
+            return content
+        return render
+
+    def new(self, name):
+        writer = current_writer()
+        writer.write("LICENSE", self.render("LICENSE", f"{self.config['license']}\n"), depends_on=["license"])
+        writer.write("bin/run", self.render("bin/run", "#!/bin/sh\n"), depends_on=[], mode=0o755)
+        writer.write("README.md", self.render("README.md", f"# {name}\n"), depends_on=["app.name.project"])
+
+
+@pytest.fixture
+def skeleton_app(tmp_path, make_app):
+    def skeleton_app(config=CONFIG, cache=None):
+        cache = cache or SkeletonCache(tmp_path / "cache")
+        return make_app({"skeleton": SkeletonPlugin}, config, skeleton_cache=cache), cache
+    return skeleton_app
+
+
+def test_name_independent_files_are_materialized_from_the_cache(tmp_path, skeleton_app):
+    app, cache = skeleton_app()
+    app.new("service-a", plugin="skeleton")
+    SkeletonPlugin.renders = []
+
+    app.new("service-b", plugin="skeleton")
+
+    root = tmp_path / "service-b"
+    assert SkeletonPlugin.renders == ["README.md"]
+    assert (root / "LICENSE").read_text() == "mit\n"
+    assert (root / "README.md").read_text() == "# service-b\n"
+    assert os.access(root / "bin" / "run", os.X_OK)
+    assert cache.stats()[1:4] == (1, 2, len("mit\n") + len("#!/bin/sh\n"))
+
+
+def test_other_config_misses_the_cache(tmp_path, skeleton_app):
+    app, cache = skeleton_app()
+    app.new("service-a", plugin="skeleton")
+    SkeletonPlugin.renders = []
+
+    skeleton_app(config={**CONFIG, "license": "apache"}, cache=cache)[0].new("service-b", plugin="skeleton")
+
+    assert sorted(SkeletonPlugin.renders) == ["LICENSE", "README.md", "bin/run"]
+    assert (tmp_path / "service-b" / "LICENSE").read_text() == "apache\n"
+    assert cache.stats().entries == 2
+
+
+def test_prune_evicts_the_least_recently_used_entries(tmp_path, skeleton_app):
+    app, cache = skeleton_app()
+    app.new("service-a", plugin="skeleton")
+    skeleton_app(config={**CONFIG, "license": "apache"}, cache=cache)[0].new("service-b", plugin="skeleton")
+    entries = sorted((tmp_path / "cache" / "entries").iterdir(), key=lambda path: path.stat().st_mtime)
+    os.utime(entries[0], (0, 0))
+
+    freed = cache.prune(len("apache\n") + len("#!/bin/sh\n"))
+
+    assert freed == len("mit\n")
+    assert cache.stats().entries == 1
+    assert cache.prune(0) == len("apache\n") + len("#!/bin/sh\n")
+    assert cache.stats()[1:4] == (0, 0, 0)
+
+
+def test_shell_projects_share_their_config(tmp_path, make_app):
+    cache = SkeletonCache(tmp_path / "cache")
+    app = make_app({"shell": Shell}, CONFIG, skeleton_cache=cache)
+    app.new("service-a", plugin="shell")
+    app.new("service-b", plugin="shell")
+
+    assert cache.stats()[1:3] == (1, 1)
+    assert (tmp_path / "service-b" / ".composo.yaml").read_text() == "flavour: bin\nplugin: shell\n"
+    assert (tmp_path / "service-b" / "bin" / "service-b").exists()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="the cache is locked by flock")
+def test_prune_waits_for_the_lock(tmp_path):
+    import fcntl
+    cache = SkeletonCache(tmp_path / "cache")
+    cache.path.mkdir()
+    with open(cache.path / "lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # as a worker storing an entry
+        pruning = threading.Thread(target=cache.prune)
+        pruning.start()
+        pruning.join(0.2)
+        assert pruning.is_alive()
+    pruning.join(5)
+    assert not pruning.is_alive()
+
+
+def test_name_dependence():
+    assert depends_on_name(["app.name.project"])
+    assert depends_on_name(["app"])
+    assert depends_on_name(["*"])
+    assert not depends_on_name(["license", "app.flavour"])
+
+
+def test_materialize_copies_or_links(tmp_path):
+    source = tmp_path / "source"
+    source.write_bytes(b"content" * 1000)
+
+    assert materialize(source, tmp_path / "copy") in ("reflink", "copy_file_range", "sendfile", "copy")
+    assert (tmp_path / "copy").read_bytes() == source.read_bytes()
+    assert materialize(source, tmp_path / "link", hardlink=True) == "hardlink"
+    assert (tmp_path / "link").stat().st_ino == source.stat().st_ino
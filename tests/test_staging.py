@@ -0,0 +1,105 @@
+import builtins
+import os
+
+import pytest
+
+from composo.files import MANIFEST_FILE, current_writer
+from composo.staging import StagingTree
+
+CONFIG = {"app": {"name": {"project": "test-proj"}}, "license": "mit"}
+
+
+class FilesPlugin:
+    fail = False
+
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        writer = current_writer()
+        writer.write(".composo.yaml", "plugin: files\n")
+        writer.write("src/main.sh", "echo main\n", mode=0o755)
+        if FilesPlugin.fail:
+            raise RuntimeError("plugin failed")
+        writer.write("docs/README.md", f"# {name}\n")
+
+
+def test_new_project_is_committed_at_once(tmp_path, make_app):
+    make_app({"files": FilesPlugin}, CONFIG).new("test-proj", plugin="files")
+
+    root = tmp_path / "test-proj"
+    assert (root / "docs" / "README.md").read_text() == "# test-proj\n"
+    assert os.access(root / "src" / "main.sh", os.X_OK)
+    assert (root / MANIFEST_FILE).exists()
+    assert sorted(os.listdir(tmp_path)) == ["test-proj"]
+
+
+def test_failing_plugin_leaves_no_files(tmp_path, monkeypatch, make_app):
+    monkeypatch.setattr(FilesPlugin, "fail", True)
+
+    with pytest.raises(RuntimeError):
+        make_app({"files": FilesPlugin}, CONFIG).new("test-proj", plugin="files")
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_commands_run_once_the_files_are_committed(tmp_path, make_app):
+    seen = []
+
+    class CommandPlugin(FilesPlugin):
+        def new(self, name):
+            super().new(name)
+            writer = current_writer()
+            seen.append(writer.sink.on_disk)
+            writer.after_commit(lambda: seen.append(os.access(writer.root / "src" / "main.sh", os.X_OK)))
+
+    make_app({"files": CommandPlugin}, CONFIG).new("test-proj", plugin="files")
+    make_app({"files": CommandPlugin}, CONFIG).new("dry-proj", plugin="files", dry_run=True)
+
+    assert seen == [False, True, False]
+
+
+def test_dry_run_stages_without_committing(tmp_path, capsys, make_app):
+    make_app({"files": FilesPlugin}, CONFIG).new("test-proj", plugin="files", dry_run=True)
+
+    assert os.listdir(tmp_path) == []
+    assert "src/main.sh" in capsys.readouterr().out
+
+
+def test_interrupted_commit_keeps_the_previous_files(tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_text("old a")
+    (tmp_path / "b.txt").write_text("old b")
+    tree = StagingTree(tmp_path)
+    tree.write("a.txt", b"new a")
+    tree.write("b.txt", b"new b")
+
+    real_open = builtins.open
+    written = []
+
+    def failing_open(path, *args, **kwargs):
+        if written:
+            raise OSError("disk full")
+        written.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", failing_open)
+    with pytest.raises(OSError):
+        tree.commit()
+    monkeypatch.undo()
+
+    assert (tmp_path / "a.txt").read_text() == "old a"
+    assert (tmp_path / "b.txt").read_text() == "old b"
+    assert sorted(os.listdir(tmp_path)) == ["a.txt", "b.txt"]
+
+
+def test_open_reads_staged_and_disk_files(tmp_path):
+    (tmp_path / "on-disk.txt").write_text("disk")
+    tree = StagingTree(tmp_path)
+    with tree.open(tmp_path / "staged.txt", "w") as f:
+        f.write("staged")
+
+    with tree.open("staged.txt") as f:
+        assert f.read() == "staged"
+    with tree.open(tmp_path / "on-disk.txt", "rb") as f:
+        assert f.read() == b"disk"
+    assert not (tmp_path / "staged.txt").exists()
@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+
+import pytest
+
+from composo.files import FileWriter, Manifest, current_writer
+from composo.journal import Journal
+from composo.staging import StagingTree
+from composo.shell.plugin import Shell
+from composo.steps import StepError, Steps, critical_path, run_steps
+
+CONFIG = {"app": {"name": {"project": "test-proj"}}, "author": {"name": "A. Rand Developer"}, "license": "mit"}
+
+
+def project_steps(calls, barrier=None):
+    steps = Steps(jobs=4)
+
+    def write(path, key):
+        def run():
+            calls.append(path)
+            if barrier is not None:
+                barrier.wait(timeout=5)  # breaks unless both independent steps run at once
+            current_writer().write(path, lambda: f"{current_writer().config[key]}\n", depends_on=[key])
+        return run
+
+    steps.add("license", write("LICENSE", "license"), inputs=["license"], outputs=["LICENSE"])
+    steps.add("readme", write("README.md", "author"), inputs=["author.name"], outputs=["README.md"])
+    steps.add("package", lambda: calls.append("package"), inputs=[], outputs=["README.md"], after=["readme"])
+    return steps
+
+
+def generate(root, config, calls, barrier=None, force=False, **kwargs):
+    writer = FileWriter(root, config, force=force)
+    with writer.activate():
+        report = run_steps(project_steps(calls, barrier), writer, **kwargs)
+    return report
+
+
+def test_independent_steps_run_in_parallel_and_dependencies_first(tmp_path):
+    calls = []
+    report = generate(tmp_path, CONFIG, calls, barrier=threading.Barrier(2))
+
+    assert sorted(report.ran) == ["license", "package", "readme"]
+    assert calls.index("package") > calls.index("README.md")
+    assert (tmp_path / "LICENSE").read_text() == "mit\n"
+
+
+def test_up_to_date_steps_are_skipped(tmp_path):
+    generate(tmp_path, CONFIG, [])
+    calls = []
+    report = generate(tmp_path, CONFIG, calls)
+
+    assert calls == []
+    assert sorted(report.skipped) == ["license", "package", "readme"]
+
+
+def test_changed_inputs_rerun_the_step_and_its_dependents(tmp_path):
+    generate(tmp_path, CONFIG, [])
+    calls = []
+    report = generate(tmp_path, {**CONFIG, "author": {"name": "B. Rand"}}, calls)
+
+    assert sorted(calls) == ["README.md", "package"]
+    assert report.skipped == ["license"]
+
+
+def test_missing_outputs_and_force_rerun_steps(tmp_path):
+    generate(tmp_path, CONFIG, [])
+    os.remove(tmp_path / "LICENSE")
+    calls = []
+    generate(tmp_path, CONFIG, calls)
+    assert calls == ["LICENSE"]
+
+    calls = []
+    generate(tmp_path, CONFIG, calls, force=True)
+    assert sorted(calls) == ["LICENSE", "README.md", "package"]
+
+
+def test_steps_in_processes_are_recorded_in_the_manifest(tmp_path):
+    generate(tmp_path, CONFIG, [], processes=True)
+    calls = []
+    report = generate(tmp_path, CONFIG, calls)
+
+    assert (tmp_path / "README.md").read_text() == "{'name': 'A. Rand Developer'}\n"
+    assert calls == []
+    assert len(report.skipped) == 3
+
+
+class ExclusiveSink(StagingTree):
+    """
+    Staging tree that counts the writes entered while another one is in progress.
+    """
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.active = 0
+        self.overlaps = 0
+
+    def _enter(self):
+        self.active += 1
+        self.overlaps += self.active > 1
+        time.sleep(0.001)
+
+    def write(self, relative, data, mode=None):
+        self._enter()
+        super().write(relative, data, mode)
+        self.active -= 1
+
+    def link(self, relative, source, mode=None, hardlink=False):
+        self._enter()
+        super().link(relative, source, mode, hardlink)
+        self.active -= 1
+
+
+def test_concurrent_steps_share_the_writer(tmp_path):
+    root = tmp_path / "test-proj"
+    steps = Steps(jobs=8)
+    for index in range(32):
+        def write(index=index):
+            for part in range(16):
+                current_writer().write(f"part{index}/{part}.txt", f"{index}.{part}\n" * (index + 1), depends_on=[])
+        steps.add(f"part{index}", write, inputs=[], outputs=[f"part{index}"])
+    journal = Journal(root)
+    journal.begin("new")
+    # a small buffer spills most of the content to the spool
+    sink = ExclusiveSink(root)
+    writer = FileWriter(root, {"files": {"max_buffer": 1024}}, sink=sink, journal=journal)
+
+    with writer.activate():
+        run_steps(steps, writer, processes=False)
+        journaled = Journal(root)
+        journaled.load()
+
+    expected = {f"part{index}/{part}.txt": f"{index}.{part}\n" * (index + 1)
+                for index in range(32) for part in range(16)}
+    assert sink.overlaps == 0
+    assert sorted(writer.written) == sorted(expected)
+    assert writer.bytes_written == sum(len(content) for content in expected.values())
+    assert sorted(journaled.files) == sorted(expected) and len(journaled.steps) == 32
+    assert sorted(Manifest.load(root).files) == sorted(expected)
+    assert all((root / relative).read_text() == content for relative, content in expected.items())
+
+
+def test_failing_step_stops_its_dependents():
+    calls = []
+    steps = Steps()
+    steps.add("broken", lambda: 1 / 0)
+    steps.add("after", lambda: calls.append("after"), after=["broken"])
+
+    with pytest.raises(StepError) as exc_info:
+        run_steps(steps)
+
+    assert exc_info.value.step == "broken"
+    assert isinstance(exc_info.value.__cause__, ZeroDivisionError)
+    assert calls == []
+
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    steps = Steps()
+    steps.add("a", lambda: None, after=["b"])
+    steps.add("b", lambda: None, after=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        run_steps(steps)
+
+    steps = Steps()
+    steps.add("a", lambda: None, after=["missing"])
+    with pytest.raises(ValueError, match="unknown"):
+        steps.order()
+
+
+def test_critical_path_is_the_longest_dependency_chain():
+    steps = Steps()
+    for name, after in [("config", []), ("venv", []), ("render", ["config"]), ("install", ["venv", "render"])]:
+        steps.add(name, lambda: None, after=after)
+
+    path, duration = critical_path(steps, {"config": 0.1, "venv": 1.0, "render": 0.5, "install": 0.2})
+
+    assert path == ["venv", "install"]
+    assert duration == pytest.approx(1.2)
+
+
+def test_shell_plugin_skips_its_steps_on_reinit(tmp_path, make_app):
+    app = make_app({"shell": Shell}, CONFIG)
+
+    app.new("test-proj", plugin="shell", init=True)
+    script = tmp_path / "test-proj" / "bin" / "test-proj"
+    assert os.access(script, os.X_OK)
+    mtime = script.stat().st_mtime_ns
+
+    app.init("test-proj")
+    assert script.stat().st_mtime_ns == mtime
+    assert "A. Rand Developer" in (tmp_path / "test-proj" / "README.md").read_text()
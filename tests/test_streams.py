@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import tarfile
+
+from composo import streams
+from composo.files import MANIFEST_FILE, FileWriter, Manifest, current_writer
+from composo.journal import Journal
+from composo.staging import StagingTree
+
+CONFIG = {"app": {"name": {"project": "test-proj"}}}
+CHUNK = b"0123456789abcdef" * 4096
+CHUNKS = 3 * streams.INLINE_LIMIT // len(CHUNK)
+
+
+class AssetsPlugin:
+    def __init__(self, config):
+        self.config = config
+
+    def new(self, name):
+        writer = current_writer()
+        writer.write("README.md", (f"# {part}\n" for part in (name, "assets")))
+        writer.write("data/rows.bin", (CHUNK for _ in range(CHUNKS)), depends_on=[])
+        dataset = writer.root.parent / "dataset.bin"
+        with open(writer.root.parent / "fixture.bin", "rb") as f:
+            writer.write("data/fixture.bin", f, depends_on=[])
+        writer.write("data/dataset.bin", dataset, depends_on=[], mode=0o600)
+
+
+def assets(tmp_path):
+    (tmp_path / "fixture.bin").write_bytes(os.urandom(2 * streams.INLINE_LIMIT))
+    (tmp_path / "dataset.bin").write_bytes(os.urandom(3 * streams.INLINE_LIMIT))
+
+
+def test_new_streams_large_content_into_the_project(tmp_path, make_app):
+    assets(tmp_path)
+
+    make_app({"assets": AssetsPlugin}, CONFIG).new("test-proj", plugin="assets")
+
+    project = tmp_path / "test-proj"
+    assert (project / "README.md").read_text() == "# test-proj\n# assets\n"
+    assert (project / "data" / "rows.bin").read_bytes() == CHUNK * CHUNKS
+    assert (project / "data" / "fixture.bin").read_bytes() == (tmp_path / "fixture.bin").read_bytes()
+    assert (project / "data" / "dataset.bin").read_bytes() == (tmp_path / "dataset.bin").read_bytes()
+    assert (project / "data" / "dataset.bin").stat().st_mode & 0o777 == 0o600
+    files = json.loads((project / MANIFEST_FILE).read_text())["files"]
+    assert files["data/rows.bin"]["hash"] == hashlib.sha256(CHUNK * CHUNKS).hexdigest()
+    # the spool is gone with the journal
+    assert sorted(os.listdir(tmp_path)) == ["dataset.bin", "fixture.bin", "test-proj"]
+
+
+def test_staged_content_beyond_the_buffer_is_spilled(tmp_path):
+    tree = StagingTree(tmp_path / "test-proj")
+    writer = FileWriter(tree.root, {"files": {"max_buffer": 10}}, manifest=Manifest(), sink=tree)
+
+    with writer.activate():
+        writer.write("small.txt", b"fits")
+        writer.write("large.txt", "does not fit\n")
+        writer.write("rows.txt", iter(["a\n", "b\n"]))
+        assert tree.files["small.txt"].data == b"fits"
+        assert tree.files["large.txt"].data is None and tree.files["large.txt"].hardlink
+        assert writer.spool.buffered == len(b"fits") + len(b"a\nb\n")
+        assert writer.bytes_written == 21
+
+    assert (tree.root / "large.txt").read_text() == "does not fit\n"
+    assert (tree.root / "rows.txt").read_text() == "a\nb\n"
+    assert not writer.spool.directory.exists()
+
+
+def test_streamed_content_goes_into_an_archive(tmp_path, make_app):
+    assets(tmp_path)
+    target = tmp_path / "test-proj.tar.gz"
+
+    make_app({"assets": AssetsPlugin}, CONFIG).new("test-proj", plugin="assets", output_archive=str(target))
+
+    with tarfile.open(target) as tar:
+        assert tar.extractfile("test-proj/data/rows.bin").read() == CHUNK * CHUNKS
+        assert tar.getmember("test-proj/data/dataset.bin").mode == 0o600
+    assert not (tmp_path / "test-proj").exists()
+
+
+def test_a_resumed_run_takes_over_spooled_files(tmp_path):
+    spool = streams.Spool(tmp_path / "spool")
+    spooled = spool.spool(CHUNK for _ in range(CHUNKS))
+    journal = Journal(tmp_path)
+    journal.begin("init")
+    journal.file("rows.bin", {}, None, content_hash=spooled.hash, source=spooled.path, hardlink=True)
+
+    resumed = Journal(tmp_path)
+    resumed.begin("init", resume=True)
+    assert resumed.verified("rows.bin").spooled == spooled
+
+    with open(spooled.path, "ab") as f:
+        f.write(b"changed")
+    assert resumed.verified("rows.bin") is None
+
+
+def test_copy_fd(tmp_path):
+    (tmp_path / "source").write_bytes(b"header" + CHUNK)
+    with open(tmp_path / "source", "rb") as source, open(tmp_path / "target", "wb") as target:
+        source.seek(len(b"header"))
+        assert streams.copy_fd(source.fileno(), target.fileno()) in ("copy_file_range", "sendfile", "copy")
+    assert (tmp_path / "target").read_bytes() == CHUNK
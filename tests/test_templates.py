@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from composo.config import LayeredConfig
+from composo.files import FileWriter, Manifest
+from composo.journal import Journal
+from composo.staging import StagingTree
+from composo.streams import INLINE_LIMIT
+from composo.templates import SNIFF_SIZE, Template, TemplateEngine, TemplateError
+
+CONFIG = LayeredConfig([("user", {"author": {"name": "A. Rand Developer"}, "license": "mit"}),
+                        ("project", {"app": {"name": {"project": "test-proj"}}})])
+
+
+def test_placeholders_are_rendered_with_filters():
+    template = Template("# {{ app.name.project }}\n{{app.name.project|snake|upper}} by {{ author.name }}\n")
+
+    assert template.render(CONFIG) == "# test-proj\nTEST_PROJ by A. Rand Developer\n"
+    assert template.keys == ("app.name.project", "author.name")
+
+
+def test_escaped_placeholders_stay_literal():
+    assert Template("run: \\{{ secrets.TOKEN }} {{ license }}").render(CONFIG) == "run: {{ secrets.TOKEN }} mit"
+
+
+def test_unknown_keys_and_filters_are_errors():
+    with pytest.raises(TemplateError, match="vcs.git"):
+        Template("{{ vcs.git }}").render(CONFIG)
+    with pytest.raises(TemplateError, match="shout"):
+        Template("{{ license | shout }}")
+
+
+def test_templates_are_compiled_once():
+    engine = TemplateEngine()
+    assert engine.compile("{{ license }}") is engine.compile("{{ license }}")
+
+
+def test_render_tree_renders_paths_and_contents(tmp_path):
+    skeleton = tmp_path / "skeleton"
+    (skeleton / "src" / "{{ app.name.project | snake }}").mkdir(parents=True)
+    (skeleton / "src" / "{{ app.name.project | snake }}" / "__init__.py").write_text('"""{{ app.name.project }}"""\n')
+    (skeleton / "LICENSE").write_text("{{ license | upper }}\n")
+    (skeleton / "run.sh").write_text("#!/bin/sh\n")
+    os.chmod(skeleton / "run.sh", 0o755)
+    (skeleton / "logo.png").write_bytes(b"\x89PNG\xff\xfe")
+    root = tmp_path / "project"
+
+    with FileWriter(root, CONFIG).activate() as writer:
+        rendered = TemplateEngine().render_tree(skeleton, writer=writer)
+
+    assert sorted(file.path for file in rendered) == ["LICENSE", "logo.png", "run.sh", "src/test_proj/__init__.py"]
+    assert (root / "src" / "test_proj" / "__init__.py").read_text() == '"""test-proj"""\n'
+    assert (root / "LICENSE").read_text() == "MIT\n"
+    assert (root / "logo.png").read_bytes() == b"\x89PNG\xff\xfe"
+    assert os.access(root / "run.sh", os.X_OK)
+
+    with FileWriter(root, CONFIG.with_layer("cli", {"license": "apache"})).activate():
+        rendered = TemplateEngine().render_tree(skeleton)
+    assert [file.path for file in rendered if file.written] == ["LICENSE"]
+
+
+def test_render_tree_streams_binary_files(tmp_path):
+    skeleton = tmp_path / "skeleton"
+    skeleton.mkdir()
+    image = b"\x89PNG\0" + os.urandom(2 * INLINE_LIMIT)
+    (skeleton / "logo.png").write_bytes(image)
+    # a character cut at the end of the sniffed head is no sign of a binary file
+    (skeleton / "NOTES.md").write_text("x" * (SNIFF_SIZE - 1) + "\u00e9 {{ license }}\n")
+    root = tmp_path / "project"
+    writer = FileWriter(root, CONFIG, sink=StagingTree(root))
+
+    with writer.activate():
+        TemplateEngine().render_tree(skeleton)
+        staged = writer.sink.staged()
+
+    assert staged["logo.png"].data is None  # in a spool file instead of memory
+    assert (root / "logo.png").read_bytes() == image
+    assert (root / "NOTES.md").read_text().endswith("\u00e9 mit\n")
+
+
+def test_render_tree_threads_share_the_writer(tmp_path):
+    skeleton = tmp_path / "skeleton"
+    for index in range(200):
+        (skeleton / f"pkg{index % 8}").mkdir(parents=True, exist_ok=True)
+        (skeleton / f"pkg{index % 8}" / f"module{index}.py").write_text(f"# {{{{ app.name.project }}}} {index}\n")
+    root = tmp_path / "project"
+    journal = Journal(root)
+    journal.begin("new")
+    writer = FileWriter(root, CONFIG, sink=StagingTree(root), journal=journal)
+
+    with writer.activate():
+        rendered = TemplateEngine().render_tree(skeleton, jobs=8)
+        journaled = Journal(root)
+        journaled.load()
+
+    assert len(rendered) == len(writer.written) == len(journaled.files) == 200
+    assert writer.bytes_written == sum(len(f"# test-proj {index}\n") for index in range(200))
+    assert len(Manifest.load(root).files) == 200
+    assert (root / "pkg3" / "module11.py").read_text() == "# test-proj 11\n"
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from composo import main as composo_main
+from composo.tracing import Tracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span("plugin.import"):
+        pass
+
+    assert tracer.spans == []
+
+
+def test_summary_aggregates_spans_by_name():
+    tracer = Tracer(enabled=True)
+    for plugin in ("python", "shell"):
+        with tracer.span("plugin.import", plugin=plugin):
+            with tracer.span("render"):
+                pass
+
+    summary = tracer.summary()
+
+    assert [(phase.name, phase.calls) for phase in summary] == [("plugin.import", 2), ("render", 2)]
+    assert summary[0].total >= summary[0].longest >= 0
+
+
+def test_chrome_trace_contains_complete_events(tmp_path):
+    tracer = Tracer(enabled=True)
+    with tracer.span("config.load", path=".composo.yaml"):
+        pass
+    tracer.write_chrome_trace(tmp_path / "trace.json")
+
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+
+    assert [event["ph"] for event in events] == ["M", "X"]
+    assert events[1]["name"] == "config.load"
+    assert events[1]["args"] == {"path": ".composo.yaml"}
+
+
+@pytest.mark.parametrize("args, env, expected", [
+    (["new", "x"], {}, (False, None)),
+    (["--profile", "new", "x"], {}, (True, None)),
+    (["--trace-file", "trace.json", "new", "x"], {}, (True, "trace.json")),
+    (["--trace-file=trace.json", "init"], {}, (True, "trace.json")),
+    (["init"], {"COMPOSO_PROFILE": "1"}, (True, None)),
+    (["init"], {"COMPOSO_TRACE_FILE": "trace.json"}, (True, "trace.json")),
+])
+def test_profiling_options(monkeypatch, args, env, expected):
+    monkeypatch.delenv("COMPOSO_PROFILE", raising=False)
+    monkeypatch.delenv("COMPOSO_TRACE_FILE", raising=False)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+
+    assert composo_main.profiling(args) == expected
+    assert composo_main.needs_plugins(args)